@@ -66,3 +66,45 @@ var myPieChart = new Chart(pieChart, {
     },
   },
 });
+
+// Drill-down: clicking a topic in the pie chart shows the cumulative publications of that
+// topic, summed from the aggregate cube (assets/cube.json, see src/cube.py); clicking the
+// same topic again shows all papers
+var cube = null;
+var allPublications = myBarChart.data.datasets[0].data;
+var selectedTopic = null;
+fetch("assets/cube.json")
+  .then(function (response) { return response.json(); })
+  .then(function (data) { cube = data; });
+
+function cumulativeByYear(keep) {
+  var number = {};
+  var columns = cube.columns;
+  for (var i = 0; i < columns.count.length; i++) {
+    if (keep(columns, i)) {
+      var year = cube.labels.year[columns.year[i]];
+      number[year] = (number[year] || 0) + columns.count[i];
+    }
+  }
+  var total = 0;
+  return myBarChart.data.labels.map(function (year) {
+    total += number[year] || 0;
+    return total;
+  });
+}
+
+myPieChart.options.onClick = function (event, elements) {
+  if (!cube || !elements.length) return;
+  var topic = myPieChart.data.labels[elements[0].index];
+  selectedTopic = selectedTopic === topic ? null : topic;
+  var dataset = myBarChart.data.datasets[0];
+  if (selectedTopic === null) {
+    dataset.data = allPublications;
+    dataset.label = "# Publications";
+  } else {
+    var code = cube.labels.topic.indexOf(selectedTopic);
+    dataset.data = cumulativeByYear(function (columns, i) { return columns.topic[i] === code; });
+    dataset.label = "# Publications (" + selectedTopic + ")";
+  }
+  myBarChart.update();
+};
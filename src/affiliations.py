@@ -0,0 +1,204 @@
+"""
+Derive scholar institutions and countries from data/paper_affiliations.csv.
+* Affiliations are joined to canonical authors through the paper DOI and the co-author
+  mapping, using hash lookups rather than rescanning the lists for each row
+* Empty institution/country fields of data/scholar.csv are filled in (manual values are kept)
+* Per-institution and per-country aggregates are written to assets/affiliation-stats.json
+
+Institution names and countries are taken from data/institutions.csv (institution_id, name,
+country) when available, and otherwise inferred from the raw affiliation strings.
+"""
+import csv
+import html
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from database import SCHOLAR_FIELDS
+from datastore import write_csv, write_text
+from generate_coauthor_preview import is_same_name, norm, split_authors, surname_key
+from importers import open_text
+
+LIST_FILE = 'data/list.csv'
+SCHOLAR_FILE = 'data/scholar.csv'
+MAPPING_FILE = 'data/coauthor_mapping.csv'
+AFFILIATION_FILE = 'data/paper_affiliations.csv'
+INSTITUTION_FILE = 'data/institutions.csv'
+OUT_JSON = 'assets/affiliation-stats.json'
+
+# country spellings found in raw affiliation strings -> country name
+COUNTRY_ALIASES = {
+  'china': 'China', 'p.r. china': 'China', 'pr china': 'China', 'hong kong': 'Hong Kong',
+  'taiwan': 'Taiwan', 'japan': 'Japan', 'korea': 'South Korea', 'south korea': 'South Korea',
+  'republic of korea': 'South Korea', 'singapore': 'Singapore', 'india': 'India', 'iran': 'Iran',
+  'pakistan': 'Pakistan', 'vietnam': 'Vietnam', 'viet nam': 'Vietnam', 'malaysia': 'Malaysia',
+  'indonesia': 'Indonesia', 'thailand': 'Thailand', 'saudi arabia': 'Saudi Arabia', 'israel': 'Israel',
+  'turkey': 'Turkey', 'egypt': 'Egypt', 'usa': 'United States', 'u.s.a.': 'United States',
+  'united states': 'United States', 'united states of america': 'United States', 'canada': 'Canada',
+  'mexico': 'Mexico', 'brazil': 'Brazil', 'brasil': 'Brazil', 'argentina': 'Argentina', 'chile': 'Chile',
+  'colombia': 'Colombia', 'italy': 'Italy', 'italia': 'Italy', 'germany': 'Germany', 'france': 'France',
+  'spain': 'Spain', 'portugal': 'Portugal', 'greece': 'Greece', 'uk': 'United Kingdom',
+  'united kingdom': 'United Kingdom', 'england': 'United Kingdom', 'scotland': 'United Kingdom',
+  'ireland': 'Ireland', 'netherlands': 'Netherlands', 'the netherlands': 'Netherlands',
+  'belgium': 'Belgium', 'switzerland': 'Switzerland', 'austria': 'Austria', 'sweden': 'Sweden',
+  'norway': 'Norway', 'denmark': 'Denmark', 'finland': 'Finland', 'poland': 'Poland',
+  'czech republic': 'Czech Republic', 'hungary': 'Hungary', 'romania': 'Romania', 'russia': 'Russia',
+  'australia': 'Australia', 'new zealand': 'New Zealand', 'south africa': 'South Africa',
+}
+COUNTRY_RE = re.compile(r'\b(' + '|'.join(sorted((re.escape(c) for c in COUNTRY_ALIASES), key=len, reverse=True)) + r')\b',
+                        re.IGNORECASE)
+# words that mark the institution part of a raw affiliation, in order of preference
+# (a university is preferred over one of its schools or laboratories)
+INSTITUTION_WORDS = ('universi', 'institut', 'academy', 'college', 'corporation', 'company', 'inc.', 'ltd',
+                     'gmbh', 'laborator', 'centre', 'center', 'research', 'school')
+
+
+def read_rows(filename) -> list:
+  if not os.path.exists(filename):
+    return []
+  with open_text(filename) as file:
+    return list(csv.DictReader(file))
+
+
+def guess_country(text) -> str:
+  found = COUNTRY_RE.findall(text or '')
+  return COUNTRY_ALIASES[found[-1].lower()] if found else ''
+
+
+def guess_institution(text) -> str:
+  parts = [' '.join(p.split()) for p in html.unescape(text or '').split(',')]
+  for word in INSTITUTION_WORDS:
+    for part in parts:
+      if word in part.lower():
+        return part
+  return ''
+
+
+class AffiliationPipeline:
+  def __init__(self):
+    self.papers = read_rows(LIST_FILE)
+    self.scholars = read_rows(SCHOLAR_FILE)
+    self.mapping = read_rows(MAPPING_FILE)
+    self.affiliations = [a for a in read_rows(AFFILIATION_FILE)
+                         if a.get('review_status', '') != 'rejected' and a.get('institution_id')]
+    self.registry = {r['institution_id']: r for r in read_rows(INSTITUTION_FILE)}
+    print('[affiliations] load {} affiliations, {} papers, {} mapped names, {} scholars'.format(
+      len(self.affiliations), len(self.papers), len(self.mapping), len(self.scholars)))
+
+  def canonical_authors(self) -> dict:
+    """
+    Join each affiliation row to a canonical author id. Return {row index: canonical id}.
+    Rows whose name is a variant of several authors of the paper are not joined.
+    """
+    # hash tables: DOI -> author names of the paper, raw name -> canonical id
+    authors_by_doi = {p.get('doi', '').strip().lower(): [norm(a) for a in split_authors(p.get('author', ''))]
+                      for p in self.papers if p.get('doi')}
+    canonical_by_name = {m['original_name']: m['canonical_id'] for m in self.mapping}
+
+    joined = {}
+    ambiguous = 0
+    for i, a in enumerate(self.affiliations):
+      name = norm(a.get('author_name', ''))
+      authors = authors_by_doi.get(a.get('doi', '').strip().lower(), [])
+      # 1) exact name on the paper, 2) name variants on the paper, 3) exact name anywhere
+      matches = [name] if name in authors else [n for n in authors if is_same_name(n, name)] or [name]
+      cids = {canonical_by_name[n] for n in matches if canonical_by_name.get(n)}
+      if len(cids) > 1:
+        ambiguous += 1
+      elif cids:
+        joined[i] = cids.pop()
+    print('[affiliations] joined {} of {} affiliations to canonical authors ({} skipped: name matches '
+          'several authors)'.format(len(joined), len(self.affiliations), ambiguous))
+    return joined
+
+  def institutions(self) -> dict:
+    """
+    Name and country of each institution id: registry entries first, then the most common
+    values inferred from all raw affiliation strings of the institution.
+    """
+    names, countries = defaultdict(Counter), defaultdict(Counter)
+    for a in self.affiliations:
+      iid, raw = a['institution_id'], a.get('raw_affiliation', '')
+      names[iid][guess_institution(raw)] += 1
+      countries[iid][guess_country(raw)] += 1
+    info = {}
+    for iid in names:
+      reg = self.registry.get(iid, {})
+      name = reg.get('name') or next((n for n, _ in names[iid].most_common() if n), '')
+      country = reg.get('country') or next((c for c, _ in countries[iid].most_common() if c), '')
+      info[iid] = {'id': iid, 'name': name, 'country': country}
+    return info
+
+  def run(self, write=True) -> dict:
+    joined = self.canonical_authors()
+    institutions = self.institutions()
+
+    # canonical author -> institution votes; institution / country -> papers and authors
+    author_institutions = defaultdict(Counter)
+    inst_papers, inst_authors = defaultdict(set), defaultdict(set)
+    country_papers, country_authors, country_insts = defaultdict(set), defaultdict(set), defaultdict(set)
+    for i, a in enumerate(self.affiliations):
+      iid, doi = a['institution_id'], a.get('doi', '').lower()
+      country = institutions[iid]['country'] or 'Unknown'
+      author = joined.get(i, 'name:' + norm(a.get('author_name', '')))
+      if i in joined:
+        author_institutions[author][iid] += 1
+      inst_papers[iid].add(doi)
+      inst_authors[iid].add(author)
+      country_papers[country].add(doi)
+      country_authors[country].add(author)
+      country_insts[country].add(iid)
+
+    stats = {
+      'institutions': sorted(({**institutions[iid], 'papers': len(inst_papers[iid]), 'authors': len(inst_authors[iid])}
+                              for iid in inst_papers), key=lambda r: (-r['papers'], r['name'])),
+      'countries': sorted(({'country': c, 'papers': len(country_papers[c]), 'authors': len(country_authors[c]),
+                            'institutions': len(country_insts[c])} for c in country_papers),
+                          key=lambda r: (-r['papers'], r['country'])),
+    }
+
+    filled, ambiguous = self.fill_scholars(author_institutions, institutions)
+    if write:
+      write_text(OUT_JSON, json.dumps(stats, ensure_ascii=False, indent=2) + '\n')
+      if filled:
+        write_csv(SCHOLAR_FILE, SCHOLAR_FIELDS, self.scholars, key='id', backup=True)
+    print('[affiliations] {} institutions in {} countries; filled {} scholars, skipped {} matching several '
+          'authors'.format(len(stats['institutions']), len(stats['countries']), filled, ambiguous))
+    return stats
+
+  def fill_scholars(self, author_institutions, institutions) -> tuple:
+    """
+    Fill empty institution/country fields of scholars from their most frequent institution.
+    Scholars are matched to canonical authors by surname lookup and is_same_name; a
+    scholar matching several canonical authors is skipped. Return (filled, skipped).
+    """
+    canonical_names = defaultdict(list)   # surname -> [(canonical name, canonical id)]
+    for m in self.mapping:
+      canonical_names[surname_key(m['original_name'])].append((m['original_name'], m['canonical_id']))
+
+    filled = ambiguous = 0
+    for s in self.scholars:
+      if s.get('institution') and s.get('country'):
+        continue
+      name = s.get('name', '')
+      cids = {c for n, c in canonical_names.get(surname_key(name), []) if is_same_name(n, name)}
+      if len(cids) > 1:
+        ambiguous += 1
+        continue
+      cid = cids.pop() if cids else None
+      if cid is None or not author_institutions.get(cid):
+        continue
+      inst = institutions[author_institutions[cid].most_common(1)[0][0]]
+      changed = False
+      if not s.get('institution') and inst['name']:
+        s['institution'] = inst['name']
+        changed = True
+      if not s.get('country') and inst['country']:
+        s['country'] = inst['country']
+        changed = True
+      filled += changed
+    return filled, ambiguous
+
+
+if __name__ == '__main__':
+  AffiliationPipeline().run()
@@ -0,0 +1,155 @@
+"""
+Per-author JSON shards for the author profile page (components/author.html).
+* A canonical-author -> paper index is built in a single pass over the paper corpus,
+  using the raw-to-canonical mapping of data/coauthor_mapping.csv
+* Each author is written to assets/authors/<canonical id>.json; assets/authors/index.json
+  lists all authors for the directory view
+* Shards are rendered in parallel and only for authors whose input changed since the last
+  run (tracked by a digest per author in assets/authors/manifest.json)
+"""
+import csv
+import hashlib
+import json
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datastore import atomic_write, read_text
+from generate_coauthor_preview import norm, split_authors
+from importers import open_text
+
+MAPPING_CSV = 'data/coauthor_mapping.csv'
+AUTHOR_DIR = 'assets/authors'
+INDEX_JSON = os.path.join(AUTHOR_DIR, 'index.json')
+MANIFEST_JSON = os.path.join(AUTHOR_DIR, 'manifest.json')
+
+
+def load_mapping(filename=MAPPING_CSV) -> dict:
+  """
+  Return {raw author name: (canonical id, canonical name)}.
+  """
+  mapping = {}
+  if os.path.exists(filename):
+    with open_text(filename) as file:
+      for r in csv.DictReader(file):
+        mapping[r['original_name']] = (int(r['canonical_id']), r['canonical_name'])
+  return mapping
+
+
+def build_author_index(corpus, mapping) -> tuple:
+  """
+  Single pass over the author column. Return (index, paper_authors) where index maps
+  canonical id -> {name, variants, papers (indices)} and paper_authors lists the
+  canonical ids of each paper.
+  """
+  index = {}
+  paper_authors = []
+  for i, author_field in enumerate(corpus.column('author')):
+    seen = []
+    for raw in split_authors(author_field):
+      raw = norm(raw)
+      if raw not in mapping:
+        continue
+      cid, cname = mapping[raw]
+      entry = index.get(cid)
+      if entry is None:
+        entry = index[cid] = {'name': cname, 'variants': set(), 'papers': []}
+      entry['variants'].add(raw)
+      if cid not in seen:
+        entry['papers'].append(i)
+        seen.append(cid)
+    paper_authors.append(seen)
+  return index, paper_authors
+
+
+class AuthorShards:
+  def __init__(self, corpus, paper_tags, mapping=None):
+    """
+    :param corpus: papers.PaperCorpus
+    :param paper_tags: (category name, css class) of each paper, see Generator.paper_tags()
+    """
+    self.corpus = corpus
+    self.paper_tags = paper_tags
+    self.mapping = load_mapping() if mapping is None else mapping
+    self.index, self.paper_authors = build_author_index(corpus, self.mapping)
+
+  def paper_record(self, i) -> dict:
+    p = self.corpus[i]
+    return {'year': p.year, 'title': p.title, 'author': p.author, 'venue': p.venue_str(),
+            'doi': p.doi, 'tag': self.paper_tags[i][0]}
+
+  def shard(self, cid) -> dict:
+    entry = self.index[cid]
+    coauthors = Counter()
+    for i in entry['papers']:
+      for other in self.paper_authors[i]:
+        if other != cid:
+          coauthors[other] += 1
+    papers = sorted((self.paper_record(i) for i in entry['papers']), key=lambda r: (r['year'], r['title']), reverse=True)
+    return {
+      'id': cid,
+      'name': entry['name'],
+      'variants': sorted(entry['variants']),
+      'papers': papers,
+      'coauthors': [{'id': o, 'name': self.index[o]['name'], 'count': c}
+                    for o, c in sorted(coauthors.items(), key=lambda x: (-x[1], self.index[x[0]]['name']))],
+    }
+
+  def digest(self, cid) -> str:
+    """
+    Digest of everything a shard is rendered from: the author's id and names, the full
+    rows and tags of their papers and the ids and names of their co-authors. Canonical
+    ids follow the order of first appearance, so a new paper can renumber the
+    co-authors of an author whose papers did not change.
+    """
+    entry = self.index[cid]
+    h = hashlib.sha1()
+    h.update('{}\x1e{}'.format(cid, entry['name']).encode('utf-8'))
+    h.update('\x1e'.join(sorted(entry['variants'])).encode('utf-8'))
+    fields = list(self.corpus.columns)
+    for i in entry['papers']:
+      h.update('\x1f'.join(self.corpus.columns[f][i] for f in fields).encode('utf-8'))
+      h.update(self.paper_tags[i][0].encode('utf-8'))
+      for other in self.paper_authors[i]:
+        h.update('\x1e{}\x1f{}'.format(other, self.index[other]['name']).encode('utf-8'))
+    return h.hexdigest()
+
+  def write(self, workers=4, force=False) -> dict:
+    """
+    Write shards of new or changed authors, remove shards of authors that disappeared,
+    and update the index and manifest. Return counts of written/unchanged/removed shards.
+    """
+    os.makedirs(AUTHOR_DIR, exist_ok=True)
+    try:
+      manifest = json.loads(read_text(MANIFEST_JSON) or '{}')
+    except ValueError:
+      manifest = {}
+
+    digests = {str(cid): self.digest(cid) for cid in self.index}
+    changed = [int(cid) for cid, d in digests.items()
+               if force or manifest.get(cid) != d or not os.path.exists(self.path(cid))]
+
+    def render(cid):
+      atomic_write(self.path(cid), json.dumps(self.shard(cid), ensure_ascii=False, separators=(',', ':')))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+      list(pool.map(render, changed))
+
+    removed = [cid for cid in manifest if cid not in digests]
+    for cid in removed:
+      if os.path.exists(self.path(cid)):
+        os.remove(self.path(cid))
+
+    authors = sorted(({'id': cid, 'name': e['name'], 'papers': len(e['papers'])} for cid, e in self.index.items()),
+                     key=lambda a: a['name'].lower())
+    index_text = json.dumps(authors, ensure_ascii=False, separators=(',', ':'))
+    if read_text(INDEX_JSON) != index_text:
+      atomic_write(INDEX_JSON, index_text)
+    atomic_write(MANIFEST_JSON, json.dumps(digests, indent=0, sort_keys=True))
+
+    result = {'written': len(changed), 'unchanged': len(digests) - len(changed), 'removed': len(removed)}
+    print('[INFO] author shards in "{}": {written} written, {unchanged} unchanged, {removed} removed'.format(
+      AUTHOR_DIR, **result))
+    return result
+
+  def path(self, cid) -> str:
+    return os.path.join(AUTHOR_DIR, '{}.json'.format(cid))
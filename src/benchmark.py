@@ -0,0 +1,253 @@
+"""
+Benchmark of the build pipeline on synthetic corpora (see synthetic.py).
+* Each size runs in a temporary copy of the site layout (pages/, components/_sidebar.html)
+  with a generated data/list.csv and data/scholar.csv, so the repository data is untouched
+* Stages are timed separately with perf_counter; the fastest of --repeat runs is reported
+* Peak memory per stage is measured in one extra run under tracemalloc (not timed, since
+  tracing slows Python down)
+* Stages with a time budget (BUDGETS, in seconds per 1000 papers) fail the run when their
+  fastest time exceeds it, so a return to the quadratic co-author layout is caught
+* --startup measures the start-up time of the CLI and the import time of the main modules,
+  each in a fresh interpreter
+* Results are written as JSON together with the commit, Python version and platform, and
+  --compare prints the time ratio of every stage against an earlier result file
+
+Usage: python src/benchmark.py --sizes 1000 5000 --output benchmark.json [--compare old.json]
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from generate_coauthor_preview import build_edges, choose_canonical, cluster_authors, compute_layout, load_author_lists
+from generate_html import Generator
+from librarian import Librarian
+from papers import PaperCorpus
+from synthetic import SyntheticCorpus, load_vocab
+
+STAGES = ['generator_init', 'csv_load', 'classification', 'list_render', 'author_lists',
+          'coauthor_clustering', 'edge_build', 'coauthor_layout', 'scholar_dedupe']
+# stages whose results a stage needs
+DEPENDS = {'classification': ['generator_init', 'csv_load'], 'list_render': ['generator_init'],
+           'coauthor_clustering': ['author_lists'], 'edge_build': ['author_lists', 'coauthor_clustering'],
+           'coauthor_layout': ['author_lists', 'coauthor_clustering', 'edge_build']}
+# maximum seconds per 1000 papers of a stage (fastest run)
+BUDGETS = {'coauthor_layout': 3.0}
+SITE_FILES = ['pages', 'components/_sidebar.html', 'data/excluded']
+# start-up measurements: name -> interpreter arguments (run from the repository root)
+STARTUP = {
+  'python': ['-c', 'pass'],
+  'sar --help': ['src/sar.py', '--help'],
+  'import librarian': ['-c', 'import librarian'],
+  'import generate_html': ['-c', 'import generate_html'],
+  'import generate_coauthor_preview': ['-c', 'import generate_coauthor_preview'],
+  'import database': ['-c', 'import database'],
+}
+
+
+def git_commit() -> str:
+  try:
+    return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                          check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return ''
+
+
+def make_site(root, size, seed, vocab) -> tuple:
+  """
+  Create a temporary site directory with the templates of root and a synthetic corpus.
+  Return (directory, corpus counts).
+  """
+  directory = tempfile.mkdtemp(prefix='sar-bench-{}-'.format(size))
+  for name in SITE_FILES:
+    src, dst = os.path.join(root, name), os.path.join(directory, name)
+    if os.path.isdir(src):
+      shutil.copytree(src, dst)
+    elif os.path.exists(src):
+      os.makedirs(os.path.dirname(dst), exist_ok=True)
+      shutil.copy(src, dst)
+  os.makedirs(os.path.join(directory, 'assets'), exist_ok=True)
+  counts = SyntheticCorpus(size, seed, vocab).write(directory)
+  return directory, counts
+
+
+def run_stages(stages, measure) -> dict:
+  """
+  Run the selected pipeline stages in order in the current directory. Stages that are not
+  selected still run when a selected stage needs their result, but are not measured.
+  measure(func) runs func and returns (result, measurement).
+  """
+  needed = set(stages).union(*(DEPENDS.get(s, []) for s in stages))
+  results = {}
+  state = {}
+
+  def stage(name, func):
+    if name in stages:
+      state[name], results[name] = measure(func)
+    elif name in needed:
+      state[name] = func()
+
+  stage('generator_init', Generator)
+  stage('csv_load', lambda: PaperCorpus.from_csv('data/list.csv'))
+  stage('classification', lambda: state['csv_load'].by_tag(state['generator_init'].classify_tag))
+  stage('list_render', lambda: state['generator_init'].generate_list())
+  stage('author_lists', load_author_lists)
+  stage('coauthor_clustering', lambda: choose_canonical(cluster_authors(state['author_lists'])))
+  stage('edge_build', lambda: build_edges(state['author_lists'], state['coauthor_clustering'][1]))
+  stage('coauthor_layout', lambda: compute_layout(
+    [c['id'] for c in state['coauthor_clustering'][0]],
+    [{'source': s, 'target': t, 'weight': w} for (s, t), w in state['edge_build'].items()]))
+  if 'scholar_dedupe' in stages:
+    # load both CSV files first, which is not part of the dedupe
+    librarian = Librarian()
+    librarian.papers, librarian.scholar
+    stage('scholar_dedupe', librarian.update_scholar)
+  return results
+
+
+def timed(func) -> tuple:
+  start = time.perf_counter()
+  result = func()
+  return result, time.perf_counter() - start
+
+
+def traced(func) -> tuple:
+  tracemalloc.reset_peak()
+  base = tracemalloc.get_traced_memory()[0]
+  result = func()
+  return result, tracemalloc.get_traced_memory()[1] - base
+
+
+def bench_size(root, size, seed, stages, repeat, vocab, memory=True) -> dict:
+  """
+  Benchmark one corpus size: `repeat` timed runs and (if memory) one traced run, each on
+  a fresh site.
+  """
+  runs, peaks, counts = [], {}, {}
+  for measure in [timed] * repeat + ([traced] if memory else []):
+    directory, counts = make_site(root, size, seed, vocab)
+    os.chdir(directory)
+    try:
+      if measure is traced:
+        tracemalloc.start()
+      # the pipeline logs every step; keep the benchmark output readable
+      with contextlib.redirect_stdout(io.StringIO()):
+        result = run_stages(stages, measure)
+      if measure is traced:
+        peaks = result
+      else:
+        runs.append(result)
+    finally:
+      tracemalloc.stop()
+      os.chdir(root)
+      shutil.rmtree(directory, ignore_errors=True)
+  return {
+    'size': size,
+    **counts,
+    'stages': {s: {'seconds': min(r[s] for r in runs), 'runs': [r[s] for r in runs], 'peak_bytes': peaks.get(s)}
+               for s in STAGES if s in stages},
+  }
+
+
+def bench_startup(root, repeat) -> dict:
+  """
+  Fastest wall time of each STARTUP command over `repeat` runs, in seconds.
+  """
+  env = dict(os.environ, PYTHONPATH=os.path.join(root, 'src'))
+  result = {}
+  for name, argv in STARTUP.items():
+    runs = []
+    for _ in range(repeat):
+      start = time.perf_counter()
+      subprocess.run([sys.executable] + argv, cwd=root, env=env, check=True, stdout=subprocess.DEVNULL)
+      runs.append(time.perf_counter() - start)
+    result[name] = min(runs)
+  return result
+
+
+def over_budget(result) -> list:
+  """
+  (size, stage, seconds, budget) of every measured stage slower than its BUDGETS entry.
+  """
+  over = []
+  for r in result['results']:
+    for stage, m in r['stages'].items():
+      if stage in BUDGETS and m['seconds'] > BUDGETS[stage] * r['size'] / 1000:
+        over.append((r['size'], stage, m['seconds'], BUDGETS[stage] * r['size'] / 1000))
+  return over
+
+
+def compare(result, previous) -> None:
+  old = {r['size']: r['stages'] for r in previous.get('results', [])}
+  print('[benchmark] compared with commit {} ({})'.format(previous.get('commit') or '?', previous.get('timestamp', '')))
+  for r in result['results']:
+    for stage, m in r['stages'].items():
+      before = old.get(r['size'], {}).get(stage)
+      if before and before['seconds'] > 0:
+        print('  {:>7} {:<20} {:9.3f}s -> {:9.3f}s  x{:.2f}'.format(
+          r['size'], stage, before['seconds'], m['seconds'], m['seconds'] / before['seconds']))
+  for name, seconds in result.get('startup', {}).items():
+    before = previous.get('startup', {}).get(name)
+    if before:
+      print('  {:<36} {:9.3f}s -> {:9.3f}s  x{:.2f}'.format(name, before, seconds, seconds / before))
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Benchmark the build pipeline on synthetic corpora.')
+  parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 2000, 5000],
+                      help='numbers of papers (none to only measure start-up)')
+  parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+  parser.add_argument('--repeat', type=int, default=3, help='timed runs per size (the fastest is reported)')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--startup', action='store_true', help='also measure CLI start-up and import times')
+  parser.add_argument('--no-memory', action='store_true', help='skip the (slow) tracemalloc run')
+  parser.add_argument('--output', help='write the results as JSON to this file')
+  parser.add_argument('--compare', help='JSON result file of an earlier run to compare with')
+  args = parser.parse_args()
+
+  root = os.getcwd()
+  vocab = load_vocab()
+  result = {
+    'commit': git_commit(),
+    'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'seed': args.seed,
+    'repeat': args.repeat,
+    'results': [],
+  }
+  for size in args.sizes:
+    r = bench_size(root, size, args.seed, args.stages, args.repeat, vocab, not args.no_memory)
+    result['results'].append(r)
+    print('[benchmark] {size} papers, {author_names} author names, {scholars} scholars'.format(**r))
+    for stage, m in r['stages'].items():
+      peak = '' if m['peak_bytes'] is None else '  peak {:8.1f} MB'.format(m['peak_bytes'] / 2 ** 20)
+      print('  {:<20} {:9.3f}s{}'.format(stage, m['seconds'], peak))
+
+  if args.startup:
+    result['startup'] = bench_startup(root, max(args.repeat, 5))
+    print('[benchmark] start-up (fastest of {} runs)'.format(max(args.repeat, 5)))
+    for name, seconds in result['startup'].items():
+      print('  {:<36} {:9.3f}s'.format(name, seconds))
+
+  if args.output:
+    with open(args.output, 'w', encoding='utf-8') as file:
+      json.dump(result, file, indent=2)
+      file.write('\n')
+    print('[benchmark] results written to "{}"'.format(args.output))
+  if args.compare:
+    with open(args.compare, 'r', encoding='utf-8') as file:
+      compare(result, json.load(file))
+  over = over_budget(result)
+  for size, stage, seconds, budget in over:
+    print('[benchmark] {} papers: {} took {:.3f}s, over its budget of {:.3f}s'.format(size, stage, seconds, budget))
+  if over:
+    sys.exit(1)
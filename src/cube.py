@@ -0,0 +1,71 @@
+"""
+Aggregate cube of the paper list for the dashboard.
+* Every paper is counted in one cell of year x topic x venue x system type, where the
+  topic is the dashboard classification of repo_analysis_tags, the venue the curated
+  repo_venue_tags label and the system type the system_type_tag
+* The cells are computed in a single pandas groupby over the integer codes of the four
+  dimensions; empty cells are not stored
+* assets/cube.json holds the labels of each dimension and the cells as parallel integer
+  columns (one code array per dimension plus a count array), so the dashboard can slice
+  and drill down in the browser by summing counts, without regenerating any page
+
+Usage: python src/cube.py  (also run by generate_html.py and pipeline.py)
+"""
+from datastore import write_text
+from instrument import traced
+
+CUBE_JSON = 'assets/cube.json'
+DIMENSIONS = ['year', 'topic', 'venue', 'system']
+
+
+@traced('cube.build')
+def build_cube(years, topics, venues, systems) -> dict:
+  """
+  The cube of the given columns (one value per paper). Years that are not numbers are
+  counted as year 0; venues that differ only in case are one venue.
+  """
+  import pandas as pd
+  df = pd.DataFrame({
+    'year': pd.to_numeric(pd.Series(years, dtype=object), errors='coerce').fillna(0).astype(int),
+    'topic': [str(t) for t in topics],
+    'venue': [str(v or '').strip() for v in venues],
+    'system': [str(s or '').strip() for s in systems],
+  })
+  # one spelling (the most frequent) per case-insensitive venue
+  folded = df['venue'].str.casefold()
+  spelling = df.groupby([folded, df['venue']]).size().sort_values(ascending=False, kind='stable')
+  spelling = spelling[~spelling.index.get_level_values(0).duplicated()]
+  df['venue'] = folded.map(dict(zip(spelling.index.get_level_values(0), spelling.index.get_level_values(1))))
+
+  labels, codes = {}, {}
+  for dim in DIMENSIONS:
+    if dim == 'year':
+      values = sorted(df[dim].unique().tolist())
+    else:
+      # most frequent first, so drill-down lists start with the largest groups
+      values = df[dim].value_counts().sort_index().sort_values(ascending=False, kind='stable').index.tolist()
+    labels[dim] = values
+    codes[dim] = pd.Categorical(df[dim], categories=values).codes
+  cells = pd.DataFrame(codes).groupby(DIMENSIONS, sort=True).size()
+  columns = {dim: cells.index.get_level_values(dim).tolist() for dim in DIMENSIONS}
+  columns['count'] = cells.tolist()
+  print('[cube] {} papers in {} cells ({})'.format(
+    len(df), len(cells), ' x '.join('{} {}s'.format(len(labels[d]), d) for d in DIMENSIONS)))
+  return {'dimensions': DIMENSIONS, 'labels': labels, 'columns': columns}
+
+
+def write_cube(corpus, topics, filename=CUBE_JSON) -> bool:
+  """
+  Write the cube of a papers.PaperCorpus, given the topic of every paper, unless it is
+  unchanged.
+  """
+  import json
+  cube = build_cube(corpus.column('year'), topics, corpus.column('repo_venue_tags'),
+                    corpus.column('system_type_tag'))
+  return write_text(filename, json.dumps(cube, ensure_ascii=False, separators=(',', ':')))
+
+
+if __name__ == '__main__':
+  from generate_html import Generator
+  g = Generator(sort=False)
+  g.generate_cube()
@@ -1,30 +1,195 @@
-import pandas as pd
-
-def strip_formater(text):
-  text = str(text).strip()
-  if text == 'not found' or text == 'nan' or text == 'In press':
-    text = ''
-  return text
-
-def type_formater(text):
-  text = text.strip()
-  if text in {'inbook', 'incollection'}:
-    text = 'inproceedings'
-  assert text in {'article', 'inproceedings', 'phdthesis', 'techreport', 'book'}
-  return text
-
-def author_formater(text):
-  text = text.strip().split(',')
-  text = [i.strip() for i in text]
-  return ', '.join(text)
-
-csv_filename = 'data/list.csv'
-df = pd.read_csv(csv_filename, sep=',', header=0)
-print(df.dtypes)
-
-# df['type'] = df['type'].map(type_formater)
-# df['author'] = df['author'].map(author_formater)
-# df['booktitle'] = df['booktitle'].map(venue_formater)
-# df['pages'] = df['pages'].map(lambda x: str(x).replace('--', '-'))
-
-df.to_csv(csv_filename, sep=',', encoding='utf-8', index=False, header=True)
+"""
+Clean the paper list with a registry of vectorized rules.
+* A rule is a function from a column (pandas Series of strings) to its cleaned column,
+  registered with @rule for the columns it applies to; rules run in registration order
+  and use vectorized .str operations. Low-cardinality columns are read as categoricals,
+  so their rules run once per distinct value
+* The file is read and cleaned in chunks of --chunk-size rows, so the pandas working set
+  stays bounded for large files
+* A report lists, per rule, the cells it changed (with a few examples) and values it
+  only flags (e.g. unknown entry types); with --dry-run nothing is written
+* The file is only rewritten (through datastore.write_csv_text) when a rule changed a
+  cell; cleaning an already clean file leaves it untouched
+
+Usage: python src/data_clean.py [data/list.csv] [--dry-run] [--rules strip pages ...] [--list]
+"""
+import io
+from datastore import write_csv_text
+from importers import sniff_encoding
+from instrument import count, traced
+
+LIST_FILE = 'data/list.csv'
+CHUNK_SIZE = 50000
+EXAMPLES = 3   # examples per rule in the report
+
+# columns read as categoricals (few distinct values)
+CATEGORICAL = ['type', 'year', 'issue', 'volume', 'publisher', 'place', 'repo_venue_tags',
+               'repo_analysis_tags', 'system_type_tag']
+PLACEHOLDERS = ['not found', 'nan', 'In press']
+TYPE_ALIASES = {'inbook': 'inproceedings', 'incollection': 'inproceedings'}
+KNOWN_TYPES = {'article', 'inproceedings', 'phdthesis', 'techreport', 'book',
+               'journal', 'proceedings-article'}
+
+
+class Rule:
+  def __init__(self, name, columns, fn, description, check=None):
+    self.name = name
+    self.columns = columns     # None: every column
+    self.fn = fn
+    self.description = description
+    self.check = check         # optional column -> boolean mask of values to flag
+
+  def applies_to(self, column) -> bool:
+    return self.columns is None or column in self.columns
+
+
+RULES = []
+
+
+def rule(name, columns=None, check=None):
+  """
+  Register a cleaning rule (the function's docstring is its description).
+  """
+  def register(fn):
+    RULES.append(Rule(name, columns, fn, ' '.join((fn.__doc__ or '').split()), check))
+    return fn
+  return register
+
+
+@rule('strip')
+def strip(s):
+  """Remove leading and trailing whitespace."""
+  return s.str.strip()
+
+
+@rule('placeholders')
+def placeholders(s):
+  """Empty placeholder values such as "not found", "nan" and "In press"."""
+  return s.mask(s.isin(PLACEHOLDERS), '')
+
+
+@rule('entry-type', ['type'], check=lambda s: ~s.isin(KNOWN_TYPES) & (s != ''))
+def entry_type(s):
+  """Lower-case entry types and map inbook/incollection to inproceedings."""
+  s = s.str.lower()
+  return s.mask(s.isin(TYPE_ALIASES), s.map(TYPE_ALIASES))
+
+
+@rule('authors', ['author'])
+def authors(s):
+  """Separate authors with "; " and collapse repeated spaces in names."""
+  return s.str.replace(r'\s*;\s*', '; ', regex=True).str.replace(r'\s{2,}', ' ', regex=True).str.strip('; ')
+
+
+@rule('pages', ['pages'])
+def pages(s):
+  """Write page ranges with a single hyphen ("12--20" and "12–20" become "12-20")."""
+  return s.str.replace(r'\s*(?:--|–|—)\s*', '-', regex=True)
+
+
+@rule('doi', ['doi'])
+def doi(s):
+  """Lower-case DOIs and remove doi.org URL and "doi:" prefixes."""
+  return s.str.lower().str.replace(r'^(?:https?://(?:dx\.)?doi\.org/|doi:)', '', regex=True)
+
+
+def apply_rule(r, column):
+  """
+  Apply a rule to a column; a categorical column is cleaned once per category.
+  """
+  import pandas as pd
+  if isinstance(column.dtype, pd.CategoricalDtype):
+    cleaned = r.fn(pd.Series(column.cat.categories, dtype=object)).to_numpy()
+    return pd.Series(cleaned[column.cat.codes], index=column.index, dtype=object)
+  return r.fn(column)
+
+
+class Report:
+  def __init__(self, rules):
+    self.changed = {r.name: 0 for r in rules}    # rule -> changed cells
+    self.examples = {r.name: [] for r in rules}  # rule -> [(column, before, after)]
+    self.flagged = {r.name: {} for r in rules}   # rule -> {value: rows}
+    self.rows = 0
+
+  def add(self, r, name, before, after) -> None:
+    changed = before != after
+    n = int(changed.sum())
+    self.changed[r.name] += n
+    count('clean_' + r.name, n)
+    examples = self.examples[r.name]
+    if n and len(examples) < EXAMPLES:
+      for b, a in zip(before[changed][:EXAMPLES - len(examples)], after[changed]):
+        examples.append((name, b, a))
+
+  def flag(self, r, values) -> None:
+    for value, n in values.value_counts().items():
+      self.flagged[r.name][value] = self.flagged[r.name].get(value, 0) + int(n)
+
+  def total(self) -> int:
+    return sum(self.changed.values())
+
+  def print(self, rules) -> None:
+    print('[clean] {} rows, {} cells changed'.format(self.rows, self.total()))
+    for r in rules:
+      print('  {:<13} {:>6} cells  {}'.format(r.name, self.changed[r.name], r.description))
+      for column, before, after in self.examples[r.name]:
+        print('      {}: {!r} -> {!r}'.format(column, before[:60], after[:60]))
+      for value, n in sorted(self.flagged[r.name].items()):
+        print('      flagged: {!r} ({} rows)'.format(value, n))
+
+
+@traced('clean.run')
+def clean(filename=LIST_FILE, rules=None, dry_run=False, chunk_size=CHUNK_SIZE) -> Report:
+  """
+  Apply the rules (default: all registered rules) to a CSV file chunk by chunk, print the
+  report and rewrite the file if any cell changed (unless dry_run).
+  """
+  import pandas as pd
+  rules = RULES if rules is None else rules
+  report = Report(rules)
+  out = io.StringIO()
+  with open(filename, encoding=sniff_encoding(filename), errors='replace', newline='') as file:
+    reader = pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    for n, chunk in enumerate(reader):
+      report.rows += len(chunk)
+      for name in chunk.columns:
+        column = chunk[name]
+        if name in CATEGORICAL:
+          column = column.astype('category')
+        original = chunk[name]
+        for r in rules:
+          if not r.applies_to(name):
+            continue
+          cleaned = apply_rule(r, column)
+          report.add(r, name, column.astype(object), cleaned)
+          if r.check is not None:
+            report.flag(r, cleaned[r.check(cleaned)])
+          column = cleaned.astype('category') if name in CATEGORICAL else cleaned
+        if not column.astype(object).equals(original):
+          chunk[name] = column.astype(object)
+      chunk.to_csv(out, index=False, header=n == 0, lineterminator='\n')
+  report.print(rules)
+  if dry_run:
+    print('[clean] dry run, "{}" not written'.format(filename))
+  elif report.total():
+    write_csv_text(filename, out.getvalue(), key='doi')
+  else:
+    print('[clean] "{}" is clean, skip writing'.format(filename))
+  return report
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Clean a paper list CSV with the registered rules.')
+  parser.add_argument('filename', nargs='?', default=LIST_FILE)
+  parser.add_argument('--dry-run', action='store_true', help='report the changes without writing the file')
+  parser.add_argument('--rules', nargs='+', choices=[r.name for r in RULES], help='apply only these rules')
+  parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+  parser.add_argument('--list', action='store_true', help='list the rules and exit')
+  args = parser.parse_args()
+  if args.list:
+    for r in RULES:
+      print('{:<13} {:<10} {}'.format(r.name, ','.join(r.columns or ['*']), r.description))
+  else:
+    selected = [r for r in RULES if args.rules is None or r.name in args.rules]
+    clean(args.filename, selected, args.dry_run, args.chunk_size)
@@ -0,0 +1,203 @@
+"""
+Optional SQLite backing store for the repository data.
+* Papers, scholars, the co-author mapping and paper affiliations are imported from their
+  CSV files into indexed tables (DOI, normalized title, surname, canonical author id)
+* The tables can be exported back to the CSV files, which remain the source of truth
+* Librarian and Generator accept a Database to query instead of re-reading the CSVs
+
+Usage: python src/database.py import|export [--db data/sar.sqlite]
+"""
+import csv
+import os
+import sqlite3
+from datastore import write_csv
+from generate_coauthor_preview import norm, split_authors, surname_key
+from importers import LIST_FIELDS, open_text
+from papers import normalize_title
+
+DB_FILE = 'data/sar.sqlite'
+
+SCHOLAR_FIELDS = ['id', 'name', 'institution', 'category', 'country', 'homepage']
+MAPPING_FIELDS = ['original_name', 'canonical_name', 'canonical_id']
+AFFILIATION_FIELDS = ['doi', 'openalex_work_id', 'author_name', 'openalex_author_id', 'institution_id',
+                      'raw_affiliation', 'source', 'confidence', 'review_status', 'retrieved_at']
+
+# table -> (CSV file, CSV columns)
+TABLES = {
+  'papers': ('data/list.csv', LIST_FIELDS),
+  'scholars': ('data/scholar.csv', SCHOLAR_FIELDS),
+  'author_mapping': ('data/coauthor_mapping.csv', MAPPING_FIELDS),
+  'affiliations': ('data/paper_affiliations.csv', AFFILIATION_FIELDS),
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS papers (
+  rowid INTEGER PRIMARY KEY, {paper_columns}, norm_title TEXT);
+CREATE INDEX IF NOT EXISTS papers_doi ON papers (doi COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS papers_norm_title ON papers (norm_title);
+CREATE INDEX IF NOT EXISTS papers_year ON papers (year);
+
+CREATE TABLE IF NOT EXISTS paper_authors (
+  paper INTEGER REFERENCES papers (rowid), position INTEGER, name TEXT);
+CREATE INDEX IF NOT EXISTS paper_authors_name ON paper_authors (name);
+CREATE INDEX IF NOT EXISTS paper_authors_paper ON paper_authors (paper);
+
+CREATE TABLE IF NOT EXISTS scholars (
+  rowid INTEGER PRIMARY KEY, {scholar_columns}, surname TEXT);
+CREATE INDEX IF NOT EXISTS scholars_surname ON scholars (surname);
+CREATE INDEX IF NOT EXISTS scholars_id ON scholars (id);
+
+CREATE TABLE IF NOT EXISTS author_mapping (
+  rowid INTEGER PRIMARY KEY, {mapping_columns});
+CREATE INDEX IF NOT EXISTS author_mapping_original ON author_mapping (original_name);
+CREATE INDEX IF NOT EXISTS author_mapping_canonical ON author_mapping (canonical_id);
+
+CREATE TABLE IF NOT EXISTS affiliations (
+  rowid INTEGER PRIMARY KEY, {affiliation_columns});
+CREATE INDEX IF NOT EXISTS affiliations_doi ON affiliations (doi COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS affiliations_author ON affiliations (author_name);
+'''.format(
+  paper_columns=', '.join('"{}" TEXT'.format(f) for f in LIST_FIELDS),
+  scholar_columns=', '.join('"{}" TEXT'.format(f) for f in SCHOLAR_FIELDS),
+  mapping_columns=', '.join('"{}" TEXT'.format(f) for f in MAPPING_FIELDS),
+  affiliation_columns=', '.join('"{}" TEXT'.format(f) for f in AFFILIATION_FIELDS))
+
+class Database:
+  def __init__(self, filename=DB_FILE):
+    self.filename = filename
+    self.conn = sqlite3.connect(filename)
+    self.conn.row_factory = sqlite3.Row
+    self.conn.executescript(SCHEMA)
+
+  def close(self):
+    self.conn.close()
+
+  # ------------------------------------------------------------------------------------ #
+  # CSV import / export
+  # ------------------------------------------------------------------------------------ #
+  def import_csv(self) -> dict:
+    """
+    Replace the content of all tables with the current CSV files. Return row counts.
+    """
+    counts = {}
+    with self.conn:
+      for table, (filename, fields) in TABLES.items():
+        rows = []
+        if os.path.exists(filename):
+          with open_text(filename) as file:
+            rows = [[r.get(f) or '' for f in fields] for r in csv.DictReader(file)]
+        self.conn.execute('DELETE FROM {}'.format(table))
+        if table == 'papers':
+          self.conn.execute('DELETE FROM paper_authors')
+          self.insert_papers(fields, rows)
+        elif table == 'scholars':
+          self.insert_scholars(rows)
+        else:
+          self.conn.executemany('INSERT INTO {} ({}) VALUES ({})'.format(
+            table, ', '.join('"{}"'.format(f) for f in fields), ', '.join('?' * len(fields))), rows)
+        counts[table] = len(rows)
+    print('[database] imported {} into "{}"'.format(
+      ', '.join('{} {}'.format(n, t) for t, n in counts.items()), self.filename))
+    return counts
+
+  def insert_papers(self, fields, rows):
+    title_pos = fields.index('title')
+    author_pos = fields.index('author')
+    sql = 'INSERT INTO papers ({}, norm_title) VALUES ({}, ?)'.format(
+      ', '.join('"{}"'.format(f) for f in fields), ', '.join('?' * len(fields)))
+    authors = []
+    for row in rows:
+      rowid = self.conn.execute(sql, list(row) + [normalize_title(row[title_pos])]).lastrowid
+      names = [norm(n) for n in split_authors(row[author_pos])]
+      authors.extend((rowid, i, n) for i, n in enumerate(names) if n)
+    self.conn.executemany('INSERT INTO paper_authors (paper, position, name) VALUES (?, ?, ?)', authors)
+
+  def insert_scholars(self, rows):
+    name_pos = SCHOLAR_FIELDS.index('name')
+    self.conn.executemany('INSERT INTO scholars ({}, surname) VALUES ({}, ?)'.format(
+      ', '.join('"{}"'.format(f) for f in SCHOLAR_FIELDS), ', '.join('?' * len(SCHOLAR_FIELDS))),
+      [list(r) + [surname_key(r[name_pos])] for r in rows])
+
+  def replace_scholars(self, scholars):
+    """
+    Replace the scholars table with a list of scholar dicts (e.g. after update_scholar).
+    """
+    with self.conn:
+      self.conn.execute('DELETE FROM scholars')
+      self.insert_scholars([[s.get(f) or '' for f in SCHOLAR_FIELDS] for s in scholars])
+
+  def export_csv(self) -> list:
+    """
+    Write all tables back to their CSV files. Return the names of the changed files.
+    """
+    written = []
+    for table, (filename, fields) in TABLES.items():
+      rows = self.conn.execute('SELECT {} FROM {} ORDER BY rowid'.format(
+        ', '.join('"{}"'.format(f) for f in fields), table))
+      if write_csv(filename, fields, [tuple(r) for r in rows], key=fields[0]):
+        written.append(filename)
+    return written
+
+  # ------------------------------------------------------------------------------------ #
+  # queries
+  # ------------------------------------------------------------------------------------ #
+  def paper_rows(self):
+    """
+    All papers as lists ordered like LIST_FIELDS, in file order.
+    """
+    cols = ', '.join('"{}"'.format(f) for f in LIST_FIELDS)
+    return [list(r) for r in self.conn.execute('SELECT {} FROM papers ORDER BY rowid'.format(cols))]
+
+  def paper_dicts(self) -> list:
+    return [dict(zip(LIST_FIELDS, r)) for r in self.paper_rows()]
+
+  def scholar_dicts(self) -> list:
+    cols = ', '.join('"{}"'.format(f) for f in SCHOLAR_FIELDS)
+    return [dict(r) for r in self.conn.execute('SELECT {} FROM scholars ORDER BY rowid'.format(cols))]
+
+  def paper_titles(self) -> set:
+    return {r[0] for r in self.conn.execute('SELECT norm_title FROM papers')}
+
+  def paper_by_doi(self, doi):
+    row = self.conn.execute('SELECT * FROM papers WHERE doi = ? COLLATE NOCASE', (doi,)).fetchone()
+    return dict(row) if row else None
+
+  def papers_by_title(self, title) -> list:
+    return [dict(r) for r in self.conn.execute(
+      'SELECT * FROM papers WHERE norm_title = ?', (normalize_title(title),))]
+
+  def scholars_by_surname(self, name) -> list:
+    """
+    Scholars whose surname matches the surname of the given name.
+    """
+    return [dict(r) for r in self.conn.execute(
+      'SELECT * FROM scholars WHERE surname = ?', (surname_key(name),))]
+
+  def papers_of_author(self, canonical_id) -> list:
+    """
+    All papers written by any name variant of a canonical author.
+    """
+    return [dict(r) for r in self.conn.execute('''
+      SELECT DISTINCT papers.* FROM author_mapping
+      JOIN paper_authors ON paper_authors.name = author_mapping.original_name
+      JOIN papers ON papers.rowid = paper_authors.paper
+      WHERE author_mapping.canonical_id = ?
+      ORDER BY papers.year DESC, papers.rowid''', (str(canonical_id),))]
+
+  def affiliations_of_paper(self, doi) -> list:
+    return [dict(r) for r in self.conn.execute(
+      'SELECT * FROM affiliations WHERE doi = ? COLLATE NOCASE', (doi,))]
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Sync the SQLite store with the CSV data files.')
+  parser.add_argument('action', choices=['import', 'export'])
+  parser.add_argument('--db', default=DB_FILE)
+  args = parser.parse_args()
+  db = Database(args.db)
+  if args.action == 'import':
+    db.import_csv()
+  else:
+    db.export_csv()
+  db.close()
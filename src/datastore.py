@@ -0,0 +1,191 @@
+"""
+Shared writer for the CSV data files.
+* Files are written to a temporary file in the same directory and renamed atomically,
+  so an interrupted run cannot leave a half-written CSV behind
+* Writes are skipped when the rendered content is unchanged
+* A row-level diff (added / removed / modified rows) is logged for every write
+* DataStore batches the writes of one run (Librarian.update_scholar, enrich.py) and writes
+  each file once on commit; a failed commit restores the files it already wrote
+"""
+import csv
+import io
+import os
+import shutil
+import tempfile
+from instrument import wrote
+
+
+def render_csv(fieldnames, rows) -> str:
+  """
+  Render rows (dicts or sequences) as CSV text with a header line.
+  """
+  buffer = io.StringIO()
+  writer = csv.writer(buffer, lineterminator='\n')
+  writer.writerow(fieldnames)
+  for row in rows:
+    if isinstance(row, dict):
+      writer.writerow([row.get(f, '') for f in fieldnames])
+    else:
+      writer.writerow(row)
+  return buffer.getvalue()
+
+
+def read_text(filename, encoding='utf-8'):
+  """
+  Return the current content of a file, or None if it does not exist.
+  """
+  try:
+    with open(filename, 'r', encoding=encoding, newline='') as file:
+      return file.read()
+  except FileNotFoundError:
+    return None
+
+
+def atomic_write(filename, text, encoding='utf-8') -> None:
+  """
+  Write text to a temporary file next to filename and rename it over filename. Bytes
+  are written as they are (binary mode, encoding is ignored).
+  """
+  directory = os.path.dirname(filename) or '.'
+  os.makedirs(directory, exist_ok=True)
+  fd, tmp_name = tempfile.mkstemp(prefix='.' + os.path.basename(filename) + '.', suffix='.tmp', dir=directory)
+  try:
+    if isinstance(text, bytes):
+      file = os.fdopen(fd, 'wb')
+    else:
+      file = os.fdopen(fd, 'w', encoding=encoding, newline='')
+    with file:
+      file.write(text)
+      file.flush()
+      os.fsync(file.fileno())
+    if os.path.exists(filename):
+      shutil.copymode(filename, tmp_name)
+    os.replace(tmp_name, filename)
+    wrote(filename)
+  except BaseException:
+    if os.path.exists(tmp_name):
+      os.remove(tmp_name)
+    raise
+
+
+def diff_rows(old_text, new_text, key=None) -> tuple:
+  """
+  Compare two CSV texts row by row. Rows are matched by the key column if given (and
+  present in both headers), otherwise by their full content.
+  Return (added, removed, modified) as lists of row keys.
+  """
+  old_rows = list(csv.DictReader(io.StringIO(old_text or '')))
+  new_rows = list(csv.DictReader(io.StringIO(new_text or '')))
+  if key is None or (old_rows and key not in old_rows[0]) or (new_rows and key not in new_rows[0]):
+    old_keys = {tuple(r.items()) for r in old_rows}
+    new_keys = {tuple(r.items()) for r in new_rows}
+    return [k for k in new_keys - old_keys], [k for k in old_keys - new_keys], []
+  old_by_key = {r[key]: r for r in old_rows}
+  new_by_key = {r[key]: r for r in new_rows}
+  added = [k for k in new_by_key if k not in old_by_key]
+  removed = [k for k in old_by_key if k not in new_by_key]
+  modified = [k for k in new_by_key if k in old_by_key and new_by_key[k] != old_by_key[k]]
+  return added, removed, modified
+
+
+def write_csv_text(filename, text, key=None, backup=False) -> bool:
+  """
+  Atomically replace filename with CSV text unless the content is unchanged.
+  Return True if the file was written.
+  """
+  old_text = read_text(filename)
+  if old_text == text:
+    print('[datastore] "{}" unchanged, skip writing'.format(filename))
+    return False
+
+  added, removed, modified = diff_rows(old_text, text, key)
+  print('[datastore] write "{}": {} added, {} removed, {} modified rows'.format(
+    filename, len(added), len(removed), len(modified)))
+  if not (added or removed or modified):
+    print('\trows reordered or reformatted')
+  for label, keys in (('+', added), ('-', removed), ('~', modified)):
+    for k in keys[:20]:
+      print('\t{} {}'.format(label, k if key else dict(k)))
+    if len(keys) > 20:
+      print('\t{} ... {} more'.format(label, len(keys) - 20))
+
+  if backup and old_text is not None:
+    atomic_write(filename + '.bak', old_text)
+  atomic_write(filename, text)
+  return True
+
+
+def write_text(filename, text) -> bool:
+  """
+  Atomically replace a (non-CSV) text file unless the content is unchanged.
+  Return True if the file was written.
+  """
+  if read_text(filename) == text:
+    print('[datastore] "{}" unchanged, skip writing'.format(filename))
+    return False
+  print('[datastore] write "{}" ({} bytes)'.format(filename, len(text.encode('utf-8'))))
+  atomic_write(filename, text)
+  return True
+
+
+def write_csv(filename, fieldnames, rows, key=None, backup=False) -> bool:
+  """
+  Atomically write rows to a CSV file unless the content is unchanged.
+  """
+  return write_csv_text(filename, render_csv(fieldnames, rows), key, backup)
+
+
+class DataStore:
+  """
+  Collect the CSV writes of one run and perform them together on commit. Staging the
+  same file again replaces the previously staged content, so each file is written
+  at most once per run. Used as a context manager, nothing is written if the block
+  raises.
+  """
+  def __init__(self):
+    self.staged = {}
+
+  def stage(self, filename, fieldnames, rows, key=None, backup=False) -> None:
+    self.staged[filename] = (render_csv(fieldnames, rows), key, backup)
+
+  def stage_text(self, filename, text, key=None, backup=False) -> None:
+    self.staged[filename] = (text, key, backup)
+
+  def commit(self) -> list:
+    """
+    Write all staged files. If a write fails, the files already written by this commit
+    and the .bak files of backup entries are restored to their previous content (or
+    removed if they did not exist) before the error is raised again. Return the names of
+    the files that actually changed.
+    """
+    staged, self.staged = self.staged, {}
+    previous = {filename: read_text(filename) for filename in staged}
+    backups = {filename + '.bak': read_text(filename + '.bak') for filename, (_, _, backup) in staged.items() if backup}
+    written = []
+    try:
+      for filename, (text, key, backup) in staged.items():
+        if write_csv_text(filename, text, key, backup):
+          written.append(filename)
+    except BaseException:
+      restore = {**{filename: previous[filename] for filename in written}, **backups}
+      for filename, text in restore.items():
+        if text is None:
+          if os.path.exists(filename):
+            os.remove(filename)
+        elif read_text(filename) != text:
+          atomic_write(filename, text)
+      raise
+    return written
+
+  def rollback(self) -> None:
+    self.staged = {}
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    if exc_type is None:
+      self.commit()
+    else:
+      self.rollback()
+    return False
@@ -1,18 +1,35 @@
-import requests
 import json
 import string
 import re
-import bibtexparser
 import time
 from termcolor import cprint
-from html.parser import HTMLParser
+from importers import BIB_CLEANUP
+from instrument import count, span, traced
 
 class DBLP:
-  def __init__(self):
+  def __init__(self, store=None):
+    """
+    :param store: optional dblp_dump.DBLPStore to query instead of the DBLP API
+    """
+    self.store = store
     self.publ_url = 'http://dblp.org/search/publ/api'
     self.venue_url = 'https://dblp.org/search/venue/api'
     self.scholar_url = 'https://dblp.org/search/author/api'
+    self.bib_url = 'https://dblp.org/rec/{}.bib?param=1'
+    self.bib_cache = {}   # DBLP key -> cleaned BibTeX entry
 
+  def post(self, url):
+    """
+    Send one request to DBLP (counted and timed by the instrumentation).
+    """
+    import requests
+    with span('dblp.request', url=url):
+      response = requests.post(url)
+    count('http_requests')
+    count('http_bytes_received', len(response.content))
+    return response
+
+  @traced('dblp.search_paper')
   def search_paper(self, keywords=None, already_have=[], excluded=[], after_year=None) -> list:
     """
     Search papers by keywords, and return a list of newly identified papers in SAR repository format.
@@ -30,13 +47,21 @@ class DBLP:
     paper_obtained = []   # a list of all papers found
     paper_id = set()      # maintain id for duplication detection
     for keywords in keywords:
-      url = self.publ_url + '?q=' + '+'.join(keywords.split(' ')) + '&format=json&h=1000'
-      cprint('[dblp] ' + url, 'light_grey', 'on_light_green')
-      response = requests.post(url)
-      data = json.loads(response.text)
-      cprint('* Seach "{}" -> hit {} papers'.format(keywords, int(data['result']['hits']['@total'])), 'green')
+      if self.store is not None:
+        cprint('[dblp] local dump "{}": {}'.format(self.store.filename, keywords), 'light_grey', 'on_light_green')
+        hits = self.store.search(keywords, limit=1000)
+        total = len(hits)
+      else:
+        url = self.publ_url + '?q=' + '+'.join(keywords.split(' ')) + '&format=json&h=1000'
+        cprint('[dblp] ' + url, 'light_grey', 'on_light_green')
+        response = self.post(url)
+        data = json.loads(response.text)
+        hits = data['result']['hits']['hit']
+        total = int(data['result']['hits']['@total'])
+      cprint('* Seach "{}" -> hit {} papers'.format(keywords, total), 'green')
       cprint('* Filtering and converting format ...', 'light_green')
-      for each in data['result']['hits']['hit']:
+      candidates = []
+      for each in hits:
         # the paper info field
         info = each['info']
 
@@ -59,10 +84,15 @@ class DBLP:
           continue
         
         print('> find: ' + info['title'])
-        # convert the format of each paper (will call DBLP APIs)
-        paper = self.parse_paper_info(info)
-        paper_obtained.append(paper)
+        candidates.append(info)
         paper_id.add(each['@id'])
+
+      # one BibTeX request for the whole result list instead of one per candidate
+      if self.store is None and len(candidates) > 1:
+        self.prefetch_bibtex(keywords)
+      # convert the format of each paper (will call DBLP APIs)
+      for info in candidates:
+        paper_obtained.append(self.parse_paper_info(info))
     assert len(paper_id) == len(paper_obtained)
 
     # order by year
@@ -70,19 +100,25 @@ class DBLP:
     cprint('[dblp] Find {} new papers (after year {})'.format(len(paper_ordered), after_year), 'light_grey', 'on_light_green')
     return paper_obtained
     
+  @traced('dblp.search_by_title')
   def search_by_title(self, paper_title) -> dict:
     """
     Determine whether a given paper (title) is included in DBLP. If it is included, return the
     SAR repository format of this paper.
     """
-    url = self.publ_url + '?q=' + '+'.join(paper_title.split(' ')) + '&format=json'
-    response = requests.post(url)
-    data = json.loads(response.text)
+    if self.store is not None:
+      # exact title matches first, then the keyword search the API would do
+      hits = self.store.find_title(paper_title) or self.store.search(paper_title, limit=30)
+    else:
+      url = self.publ_url + '?q=' + '+'.join(paper_title.split(' ')) + '&format=json'
+      response = self.post(url)
+      data = json.loads(response.text)
+      hits = data['result']['hits']['hit'] if int(data['result']['hits']['@total']) > 0 else []
 
-    if int(data['result']['hits']['@total']) == 0:
+    if len(hits) == 0:
       return {'status': 'not included', 'data': {}}
     else:
-      for each in data['result']['hits']['hit']:
+      for each in hits:
         info = each['info']
         hit_title = info['title'].lower().replace('.', '')
         if paper_title.lower() != hit_title.lower():
@@ -95,6 +131,10 @@ class DBLP:
     Convert the DBLP search return data (of a paper) to the SAR repository format. Here, the primary goal
     is to convert the publication venue abbr name into its corresponding full name.
     """
+    if self.store is not None:
+      # the dump has everything the BibTeX and venue requests below would fetch
+      return self.store.paper(info['key'])
+
     # handle publication venue
     # based on the bibTex information of this paper
     bib = self.get_bibtex(info['key'])
@@ -142,42 +182,52 @@ class DBLP:
   # ------------------------------------------------------------------------------------ #
   # functions to extract detailed information of a given paper
   # ------------------------------------------------------------------------------------ #
-  class BibHTMLParser(HTMLParser):
-    def __init__(self):
-      super().__init__()
-      self.data = []
-      self.capture = False
-
-    def handle_starttag(self, tag, attrs):
-      if tag == 'pre':
-        self.capture = True
-
-    def handle_endtag(self, tag):
-      if tag == 'pre':
-        self.capture = False
-
-    def handle_data(self, data):
-      if self.capture:
-        self.data.append(data)
-        
+  def parse_bibtex(self, text) -> int:
+    """
+    Parse BibTeX text with any number of DBLP entries in one pass, and cache the cleaned
+    entries by DBLP key. Return the number of entries.
+    """
+    import bibtexparser
+    entries = bibtexparser.loads(text).entries
+    for bib in entries:
+      key = bib['ID'][len('DBLP:'):] if bib['ID'].startswith('DBLP:') else bib['ID']
+      self.bib_cache[key] = {field: value.translate(BIB_CLEANUP) for field, value in bib.items()}
+    count('bibtex_entries_parsed', len(entries))
+    return len(entries)
+
+  @traced('dblp.prefetch_bibtex')
+  def prefetch_bibtex(self, keywords) -> int:
+    """
+    Fetch the BibTeX of all results of a keyword search in one request (the search API
+    in BibTeX format) and cache them.
+    """
+    url = self.publ_url + '?q=' + '+'.join(keywords.split(' ')) + '&format=bib&h=1000'
+    return self.parse_bibtex(self.post(url).text)
+
+  def get_bibtex_many(self, dblp_keys) -> dict:
+    """
+    Return the BibTeX entries of several papers. Entries that are not cached yet are
+    fetched as raw .bib records and parsed together.
+    The batched path is prefetch_bibtex, which search_paper runs for every result list
+    of more than one paper, so keys only miss the cache for a single search result or a
+    search_by_title hit. Those are fetched one record per key: the search API matches
+    words of the title, venue and authors but cannot select records by DBLP key, so a
+    format=bib search cannot fetch an arbitrary set of keys in one request.
+    """
+    missing = [key for key in dict.fromkeys(dblp_keys) if key not in self.bib_cache]
+    count('bibtex_cache_hits', len(dblp_keys) - len(missing))
+    if missing:
+      self.parse_bibtex('\n'.join(self.post(self.bib_url.format(key)).text for key in missing))
+    return {key: self.bib_cache[key] for key in dblp_keys if key in self.bib_cache}
+
+  @traced('dblp.get_bibtex')
   def get_bibtex(self, dblp_key):
     """
     Return the bibtex information of a particular paper (specified by the key of DBLP)
     """
-    url = 'https://dblp.org/rec/{}.html?view=bibtex'.format(dblp_key)
-    response = requests.post(url)
-    parser = self.BibHTMLParser()
-    parser.feed(response.text)
-
-    bib = bibtexparser.loads(parser.data[0])
-    bib = bib.entries[0]
-    # remove symbols like {, }, and \n from each entry
-    for each in bib.keys():
-      bib[each] = bib[each].replace('\n', ' ')
-      for s in ['{', '}', '\\', '"']:
-        bib[each] = bib[each].replace(s, '')
-    return bib
+    return self.get_bibtex_many([dblp_key])[dblp_key]
 
+  @traced('dblp.extract_venue_text')
   def extract_venue_text(self, text, abbr):
     """
     Use DBLP venue API to extract the full name of a publication venue. This works the best if a match can be found.
@@ -187,7 +237,7 @@ class DBLP:
     """
     time.sleep(1)
     url = self.venue_url + '?q=' + '+'.join(text.split(' ')) + '&format=json'
-    response = requests.post(url)
+    response = self.post(url)
     try:
       data = json.loads(response.text)
     except:
@@ -0,0 +1,287 @@
+"""
+Offline DBLP: ingest the public dblp.xml(.gz) dump into a local SQLite store and query it
+instead of the DBLP API.
+* The dump is streamed with iterparse and every record is cleared after it is stored, so
+  memory stays constant for the full (multi-GB) file
+* Titles, keys, venues, authors, years, volumes, pages and DOIs of articles, proceedings
+  papers, book chapters, books and theses are stored; a full-text index over the titles
+  answers keyword searches
+* DBLPStore returns hits shaped like the search API results, and the papers in the SAR
+  format without the per-paper BibTeX and venue requests: journal names come from the
+  curated data/list.csv (by venue tag) and otherwise from the dump, proceedings titles
+  from the cross-referenced proceedings record
+* DBLP(store) and Librarian(dblp_store=...) use the store instead of the API
+
+Usage: python src/dblp_dump.py import dblp.xml.gz [--store data/dblp.sqlite]
+       python src/dblp_dump.py search software aging [--store data/dblp.sqlite]
+"""
+import csv
+import gzip
+import os
+import sqlite3
+import string
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+from html.entities import name2codepoint
+from importers import open_text
+from instrument import count, traced
+from papers import normalize_title
+
+STORE_FILE = 'data/dblp.sqlite'
+LIST_FILE = 'data/list.csv'
+
+# record elements (children of <dblp>) that are stored; proceedings are only used to
+# resolve the full booktitle of the papers that cross-reference them
+PAPER_TYPES = {'article', 'inproceedings', 'incollection', 'book', 'phdthesis', 'mastersthesis'}
+RECORD_TYPES = PAPER_TYPES | {'proceedings'}
+FIELDS = ['key', 'type', 'title', 'norm_title', 'venue', 'year', 'volume', 'number', 'pages',
+          'doi', 'booktitle', 'publisher', 'school', 'crossref', 'authors']
+BATCH = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+  rowid INTEGER PRIMARY KEY, {columns});
+CREATE TABLE IF NOT EXISTS proceedings (
+  key TEXT PRIMARY KEY, title TEXT, publisher TEXT);
+CREATE TABLE IF NOT EXISTS record_authors (
+  record INTEGER REFERENCES records (rowid), position INTEGER, name TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS titles USING fts5 (
+  title, content='records', content_rowid='rowid');
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+'''.format(columns=', '.join('"{}" {}'.format(f, 'INTEGER' if f == 'year' else 'TEXT') for f in FIELDS))
+
+# created after the bulk insert, which is faster than maintaining them row by row
+INDEXES = '''
+CREATE UNIQUE INDEX IF NOT EXISTS records_key ON records (key);
+CREATE INDEX IF NOT EXISTS records_norm_title ON records (norm_title);
+CREATE INDEX IF NOT EXISTS records_year ON records (year);
+CREATE INDEX IF NOT EXISTS records_doi ON records (doi COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS record_authors_name ON record_authors (name);
+CREATE INDEX IF NOT EXISTS record_authors_record ON record_authors (record);
+'''
+
+
+def open_dump(filename):
+  return gzip.open(filename, 'rb') if filename.endswith('.gz') else open(filename, 'rb')
+
+
+def make_parser() -> ET.XMLParser:
+  """
+  XML parser that resolves the HTML character entities (&uuml; ...) declared in dblp.dtd,
+  which expat does not load.
+  """
+  parser = ET.XMLParser()
+  parser.entity.update((name, chr(code)) for name, code in name2codepoint.items())
+  return parser
+
+
+def text(elem) -> str:
+  # titles may contain markup such as <i> or <sub>
+  return ' '.join(''.join(elem.itertext()).split()) if elem is not None else ''
+
+
+def author_name(name) -> str:
+  # DBLP disambiguates homonyms with a number suffix, e.g. "Wei Li 0001"
+  return name.rstrip(string.digits).strip()
+
+
+def parse_record(elem) -> dict:
+  """
+  Fields of one dump record (see FIELDS) and its author list.
+  """
+  record = {'key': elem.get('key', ''), 'type': elem.tag, 'title': text(elem.find('title'))}
+  record['norm_title'] = normalize_title(record['title'])
+  record['booktitle'] = text(elem.find('booktitle'))
+  record['venue'] = text(elem.find('journal')) or record['booktitle']
+  year = text(elem.find('year'))
+  record['year'] = int(year) if year.isdigit() else None
+  for field in ['volume', 'number', 'pages', 'publisher', 'school', 'crossref']:
+    record[field] = text(elem.find(field))
+  record['doi'] = ''
+  for ee in elem.iter('ee'):
+    url = text(ee)
+    if '//doi.org/' in url:
+      record['doi'] = url.split('//doi.org/', 1)[1]
+      break
+  names = [author_name(text(a)) for a in elem.iter('author')]
+  record['authors'] = ', '.join(names)
+  return record, names
+
+
+class DBLPStore:
+  def __init__(self, filename=STORE_FILE, list_file=LIST_FILE):
+    self.filename = filename
+    self.list_file = list_file   # curated paper list, for the journal names
+    self.conn = sqlite3.connect(filename)
+    self.conn.row_factory = sqlite3.Row
+    self.conn.executescript(SCHEMA)
+    self._venue_names = None
+
+  def close(self):
+    self.conn.close()
+
+  # ------------------------------------------------------------------------------------ #
+  # ingestion
+  # ------------------------------------------------------------------------------------ #
+  @traced('dblp_dump.ingest')
+  def ingest(self, dump) -> dict:
+    """
+    Replace the store content with the records of a dblp.xml(.gz) dump. Return counts.
+    """
+    start = time.perf_counter()
+    counts = Counter()
+    with self.conn:
+      for table in ['records', 'proceedings', 'record_authors', 'meta']:
+        self.conn.execute('DELETE FROM {}'.format(table))
+      self.conn.execute("INSERT INTO titles (titles) VALUES ('delete-all')")
+      rows, procs, authors = [], [], []
+      rowid = 0
+      insert = 'INSERT INTO records (rowid, {}) VALUES ({})'.format(
+        ', '.join('"{}"'.format(f) for f in FIELDS), ', '.join('?' * (len(FIELDS) + 1)))
+      with open_dump(dump) as file:
+        events = ET.iterparse(file, events=('start', 'end'), parser=make_parser())
+        _, root = next(events)
+        for event, elem in events:
+          if event != 'end' or elem.tag not in RECORD_TYPES:
+            continue
+          record, names = parse_record(elem)
+          # drop the processed record from the tree to keep memory constant
+          root.clear()
+          counts[record['type']] += 1
+          if record['type'] == 'proceedings':
+            procs.append((record['key'], record['title'], record['publisher']))
+          else:
+            rowid += 1
+            rows.append([rowid] + [record[f] for f in FIELDS])
+            authors.extend((rowid, i, n) for i, n in enumerate(names))
+          if len(rows) + len(procs) >= BATCH:
+            self.flush(insert, rows, procs, authors)
+      self.flush(insert, rows, procs, authors)
+      self.conn.executescript(INDEXES)
+      self.conn.execute("INSERT INTO titles (titles) VALUES ('rebuild')")
+      self.conn.execute("INSERT INTO meta VALUES ('dump', ?), ('dump_mtime', ?)",
+                        (os.path.abspath(dump), str(int(os.path.getmtime(dump)))))
+    count('dblp_dump_records', sum(counts.values()))
+    print('[dblp_dump] imported {} records ({}) from "{}" into "{}" in {:.1f}s'.format(
+      sum(counts.values()), ', '.join('{} {}'.format(n, t) for t, n in sorted(counts.items())),
+      dump, self.filename, time.perf_counter() - start))
+    return dict(counts)
+
+  def flush(self, insert, rows, procs, authors) -> None:
+    self.conn.executemany(insert, rows)
+    self.conn.executemany('INSERT OR REPLACE INTO proceedings VALUES (?, ?, ?)', procs)
+    self.conn.executemany('INSERT INTO record_authors VALUES (?, ?, ?)', authors)
+    del rows[:], procs[:], authors[:]
+
+  # ------------------------------------------------------------------------------------ #
+  # queries
+  # ------------------------------------------------------------------------------------ #
+  def __len__(self) -> int:
+    return self.conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+  def search(self, keywords, limit=1000) -> list:
+    """
+    Records whose title contains all words of keywords (as prefixes, like the DBLP search
+    API), as API-shaped hits {'@id': ..., 'info': {...}}, most recent first.
+    """
+    words = [w.replace('"', '') for w in keywords.split()]
+    query = ' '.join('"{}"*'.format(w) for w in words if w)
+    if not query:
+      return []
+    rows = self.conn.execute(
+      'SELECT r.* FROM titles JOIN records r ON r.rowid = titles.rowid WHERE titles MATCH ? '
+      'ORDER BY r.year DESC, r.rowid LIMIT ?', (query, limit)).fetchall()
+    count('dblp_dump_queries')
+    return [self.hit(row) for row in rows]
+
+  def find_title(self, title) -> list:
+    """
+    Records with exactly this title (after normalize_title), as API-shaped hits.
+    """
+    rows = self.conn.execute('SELECT * FROM records WHERE norm_title = ?', (normalize_title(title),))
+    count('dblp_dump_queries')
+    return [self.hit(row) for row in rows]
+
+  @staticmethod
+  def hit(row) -> dict:
+    """
+    Convert a record row to the shape of a DBLP search API hit.
+    """
+    info = {'key': row['key'], 'type': row['type'], 'title': row['title'], 'venue': row['venue'],
+            'year': str(row['year'] or '')}
+    for field, name in [('volume', 'volume'), ('number', 'number'), ('pages', 'pages'), ('doi', 'doi')]:
+      if row[field]:
+        info[name] = row[field]
+    if row['authors']:
+      info['authors'] = {'author': [{'text': name} for name in row['authors'].split(', ')]}
+    return {'@id': row['key'], 'info': info}
+
+  def venue_names(self) -> dict:
+    """
+    Venue tag (upper-case, e.g. TDSC) -> most frequent journal name of the journal papers
+    (type article or journal) with this tag in data/list.csv.
+    """
+    if self._venue_names is None:
+      names = defaultdict(Counter)
+      if os.path.exists(self.list_file):
+        with open_text(self.list_file) as file:
+          for row in csv.DictReader(file):
+            if row.get('type') in ('article', 'journal') and row.get('repo_venue_tags') and row.get('booktitle'):
+              names[row['repo_venue_tags'].strip().upper()][row['booktitle'].strip()] += 1
+      self._venue_names = {abbr: c.most_common(1)[0][0] for abbr, c in names.items()}
+    return self._venue_names
+
+  def paper(self, key) -> dict:
+    """
+    The record with this key in the SAR repository format (see DBLP.parse_paper_info).
+    """
+    row = self.conn.execute(
+      'SELECT r.*, p.title AS proceedings_title, p.publisher AS proceedings_publisher '
+      'FROM records r LEFT JOIN proceedings p ON p.key = r.crossref WHERE r.key = ?', (key,)).fetchone()
+    if row is None:
+      return None
+    venue, venue_abbr = '', ''
+    if row['type'] in ['phdthesis', 'mastersthesis']:
+      venue = row['school']
+    elif row['type'] == 'article':
+      venue_abbr = key.split('/')[1]
+      venue = self.venue_names().get(venue_abbr.upper()) or row['venue']
+    else:
+      venue_abbr = key.split('/')[1]
+      venue = (row['proceedings_title'] or row['booktitle'] or row['publisher']
+               or row['proceedings_publisher'] or '')
+    return {
+      'type': row['type'],
+      'title': row['title'].replace('.', ''),
+      'author': row['authors'],
+      'booktitle': venue,
+      'abbr': venue_abbr.upper(),
+      'vol': row['volume'],
+      'no': row['number'],
+      'pages': row['pages'],
+      'year': str(row['year'] or ''),
+      'doi': row['doi'],
+      'field': '',
+      'tag': ''
+    }
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Query DBLP offline from a local copy of the XML dump.')
+  parser.add_argument('--store', default=STORE_FILE, help='SQLite store built from the dump')
+  commands = parser.add_subparsers(dest='command', required=True)
+  p = commands.add_parser('import', help='stream dblp.xml(.gz) into the store')
+  p.add_argument('dump', help='path of dblp.xml or dblp.xml.gz (https://dblp.org/xml/)')
+  p = commands.add_parser('search', help='keyword search on the stored titles')
+  p.add_argument('keywords', nargs='+')
+  args = parser.parse_args()
+  store = DBLPStore(args.store)
+  if args.command == 'import':
+    store.ingest(args.dump)
+  else:
+    for hit in store.search(' '.join(args.keywords)):
+      info = hit['info']
+      print('{}  {}  {}  {}'.format(info['year'], info['key'], info['title'], info.get('venue', '')))
+  store.close()
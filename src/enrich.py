@@ -0,0 +1,359 @@
+"""
+Fill missing paper metadata and affiliations from Crossref and OpenAlex.
+* Only papers of data/list.csv with an empty abstract, volume, issue, pages or publisher,
+  without affiliation rows, or without an OpenAlex work id are looked up
+* DOIs are queried in batches (one multi-DOI filter query per 50 DOIs) over a pooled
+  HTTP session, with a shared rate limit and retries with backoff on 429 and 5xx replies
+* Responses are cached per source and DOI in data/enrich_cache.sqlite (not found
+  included), so repeated runs only query DOIs that were never seen
+* Empty list.csv fields are filled (existing values are kept); papers without affiliation
+  rows get rows from Crossref (authors with ROR ids) or else OpenAlex, marked as pending
+  review in data/paper_affiliations.csv
+* The API base URLs are parameters, so a local stub server with recorded responses can
+  stand in for the services
+
+Usage: python src/enrich.py [--mailto you@example.org] [--dry-run]  (or: python src/sar.py enrich)
+"""
+import csv
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from database import AFFILIATION_FIELDS
+from datastore import DataStore
+from importers import open_text
+from instrument import count, span, traced
+
+LIST_FILE = 'data/list.csv'
+AFFILIATION_FILE = 'data/paper_affiliations.csv'
+CACHE_FILE = 'data/enrich_cache.sqlite'
+CROSSREF_URL = 'https://api.crossref.org/works'
+OPENALEX_URL = 'https://api.openalex.org/works'
+SOURCES = ('crossref', 'openalex')
+BATCH = 50
+# list.csv fields that are filled when empty
+FILLED_FIELDS = ['abstract', 'volume', 'issue', 'pages', 'publisher']
+RETRY_STATUS = {429, 500, 502, 503, 504}
+TAG = re.compile(r'<[^>]+>')
+
+
+def normalize_doi(doi) -> str:
+  doi = str(doi or '').strip().lower()
+  for prefix in ['https://doi.org/', 'http://doi.org/', 'http://dx.doi.org/', 'doi:']:
+    if doi.startswith(prefix):
+      doi = doi[len(prefix):]
+  return doi
+
+
+def now() -> str:
+  return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+
+
+def read_rows(filename):
+  """
+  Header and rows (dicts) of a CSV file; an empty header if it does not exist.
+  """
+  if not os.path.exists(filename):
+    return [], []
+  with open_text(filename) as file:
+    reader = csv.DictReader(file)
+    return list(reader.fieldnames or []), list(reader)
+
+
+class RateLimiter:
+  """
+  Allow at most rate calls of wait() per second, across threads.
+  """
+  def __init__(self, rate):
+    self.interval = 1 / rate if rate else 0
+    self.next = 0
+    self.lock = threading.Lock()
+
+  def wait(self) -> None:
+    with self.lock:
+      start = max(self.next, time.monotonic())
+      self.next = start + self.interval
+    delay = start - time.monotonic()
+    if delay > 0:
+      time.sleep(delay)
+
+
+class ResponseCache:
+  """
+  JSON records per (source, DOI) in SQLite; None records DOIs the source does not know.
+  """
+  def __init__(self, filename=CACHE_FILE):
+    self.conn = sqlite3.connect(filename, check_same_thread=False)
+    self.conn.execute('CREATE TABLE IF NOT EXISTS responses ('
+                      'source TEXT, doi TEXT, retrieved_at TEXT, body TEXT, PRIMARY KEY (source, doi))')
+    self.lock = threading.Lock()
+
+  def get_many(self, source, dois) -> dict:
+    found = {}
+    with self.lock:
+      for i in range(0, len(dois), 500):
+        chunk = dois[i:i + 500]
+        for doi, body in self.conn.execute('SELECT doi, body FROM responses WHERE source = ? AND doi IN ({})'.format(
+            ', '.join('?' * len(chunk))), [source] + chunk):
+          found[doi] = json.loads(body)
+    return found
+
+  def put_many(self, source, records) -> None:
+    retrieved_at = now()
+    with self.lock, self.conn:
+      self.conn.executemany('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                            [(source, doi, retrieved_at, json.dumps(r)) for doi, r in records.items()])
+
+
+class EnrichmentClient:
+  def __init__(self, crossref_url=CROSSREF_URL, openalex_url=OPENALEX_URL, mailto=None, cache=None,
+               rate=5, workers=4, batch=BATCH, retries=4):
+    """
+    :param mailto: contact address sent to both APIs (their "polite" pools are faster)
+    :param cache: ResponseCache, or None to always query the services
+    :param rate: maximum requests per second, shared by all workers
+    """
+    self.urls = {'crossref': crossref_url.rstrip('/'), 'openalex': openalex_url.rstrip('/')}
+    self.mailto = mailto or os.environ.get('SAR_MAILTO')
+    self.cache = cache
+    self.limiter = RateLimiter(rate)
+    self.workers = workers
+    self.batch = batch
+    self.retries = retries
+    self._session = None
+
+  @property
+  def session(self):
+    if self._session is None:
+      import requests
+      from requests.adapters import HTTPAdapter
+      self._session = requests.Session()
+      adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.workers)
+      self._session.mount('http://', adapter)
+      self._session.mount('https://', adapter)
+      self._session.headers['User-Agent'] = 'sar-enrich (mailto:{})'.format(self.mailto or 'unknown')
+    return self._session
+
+  def get(self, url, params=None):
+    """
+    GET a JSON document, retrying with exponential backoff (or Retry-After) on rate
+    limiting and server errors. Return None for 404.
+    """
+    params = dict(params or {})
+    if self.mailto:
+      params['mailto'] = self.mailto
+    for attempt in range(self.retries + 1):
+      self.limiter.wait()
+      with span('enrich.request', url=url):
+        response = self.session.get(url, params=params, timeout=60)
+      count('http_requests')
+      count('http_bytes_received', len(response.content))
+      if response.status_code == 404:
+        return None
+      if response.status_code not in RETRY_STATUS or attempt == self.retries:
+        response.raise_for_status()
+        return response.json()
+      delay = response.headers.get('Retry-After')
+      delay = float(delay) if delay and delay.isdigit() else 2 ** attempt
+      print('[enrich] HTTP {} from {}, retrying in {:.0f}s'.format(response.status_code, url, delay))
+      time.sleep(delay)
+
+  def query(self, source, dois) -> dict:
+    """
+    Records of a batch of DOIs from one source, keyed by normalized DOI.
+    """
+    url = self.urls[source]
+    # commas and pipes separate the values of a filter; such DOIs are looked up alone
+    if len(dois) == 1 and (',' in dois[0] or '|' in dois[0]):
+      if source == 'crossref':
+        data = self.get(url + '/' + dois[0])
+        items = [data['message']] if data else []
+      else:
+        data = self.get(url + '/https://doi.org/' + dois[0])
+        items = [data] if data else []
+    elif source == 'crossref':
+      data = self.get(url, {'filter': ','.join('doi:' + d for d in dois), 'rows': len(dois),
+                            'select': 'DOI,abstract,volume,issue,page,publisher,author'})
+      items = data['message']['items'] if data else []
+    else:
+      data = self.get(url, {'filter': 'doi:' + '|'.join(dois), 'per-page': len(dois),
+                            'select': 'id,doi,biblio,abstract_inverted_index,authorships'})
+      items = data['results'] if data else []
+    return {normalize_doi(item.get('DOI') or item.get('doi')): item for item in items}
+
+  @traced('enrich.fetch')
+  def fetch(self, source, dois, refresh=False) -> dict:
+    """
+    Records of the given DOIs from one source (None for unknown DOIs), from the cache
+    where possible. The remaining DOIs are queried in batches by a pool of workers.
+    """
+    dois = list(dict.fromkeys(normalize_doi(d) for d in dois if d))
+    records = {} if refresh or self.cache is None else self.cache.get_many(source, dois)
+    count('enrich_cache_hits', len(records))
+    missing = [d for d in dois if d not in records]
+    single = [[d] for d in missing if ',' in d or '|' in d]
+    plain = [d for d in missing if ',' not in d and '|' not in d]
+    batches = [plain[i:i + self.batch] for i in range(0, len(plain), self.batch)] + single
+    print('[enrich] {}: {} DOIs, {} cached, {} requests'.format(source, len(dois), len(records), len(batches)))
+
+    def run(batch):
+      found = self.query(source, batch)
+      result = {d: found.get(d) for d in batch}
+      if self.cache is not None:
+        self.cache.put_many(source, result)
+      return result
+
+    with ThreadPoolExecutor(self.workers) as pool:
+      for result in pool.map(run, batches):
+        records.update(result)
+    return records
+
+
+# ------------------------------------------------------------------------------------ #
+# conversion of Crossref and OpenAlex records
+# ------------------------------------------------------------------------------------ #
+def crossref_fields(item) -> dict:
+  abstract = ' '.join(html.unescape(TAG.sub(' ', item.get('abstract', ''))).split())
+  # Crossref abstracts often start with a JATS "Abstract" title
+  if abstract.lower().startswith('abstract '):
+    abstract = abstract[len('abstract '):]
+  return {'abstract': abstract, 'volume': item.get('volume', ''), 'issue': item.get('issue', ''),
+          'pages': item.get('page', ''), 'publisher': item.get('publisher', '')}
+
+
+def openalex_fields(work) -> dict:
+  biblio = work.get('biblio') or {}
+  pages = '-'.join(p for p in [biblio.get('first_page'), biblio.get('last_page')] if p)
+  words = {}
+  for word, positions in (work.get('abstract_inverted_index') or {}).items():
+    for position in positions:
+      words[position] = word
+  return {'abstract': ' '.join(words[i] for i in sorted(words)), 'volume': biblio.get('volume') or '',
+          'issue': biblio.get('issue') or '', 'pages': pages, 'publisher': ''}
+
+
+def openalex_id(url) -> str:
+  return (url or '').rsplit('/', 1)[-1]
+
+
+def crossref_affiliations(item, doi, work_id, retrieved_at) -> list:
+  """
+  Affiliation rows of the Crossref authors whose affiliation has a ROR id.
+  """
+  rows = []
+  for author in item.get('author', []):
+    name = ' '.join(p for p in [author.get('given', ''), author.get('family', '')] if p)
+    for affiliation in author.get('affiliation', []):
+      ror = next((i['id'] for i in affiliation.get('id', []) if i.get('id-type') == 'ROR'), '')
+      if name and ror:
+        rows.append({'doi': doi, 'openalex_work_id': work_id, 'author_name': name, 'openalex_author_id': '',
+                     'institution_id': ror, 'raw_affiliation': affiliation.get('name', ''),
+                     'source': 'crossref+ror', 'confidence': 'medium', 'review_status': 'pending',
+                     'retrieved_at': retrieved_at})
+  return rows
+
+
+def openalex_affiliations(work, doi, retrieved_at) -> list:
+  """
+  Affiliation rows of the OpenAlex authorships, one per author and institution.
+  """
+  rows = []
+  for authorship in work.get('authorships', []):
+    author = authorship.get('author') or {}
+    raw = '; '.join(authorship.get('raw_affiliation_strings') or [])
+    for institution in authorship.get('institutions', []):
+      rows.append({'doi': doi, 'openalex_work_id': openalex_id(work.get('id')),
+                   'author_name': author.get('display_name', ''), 'openalex_author_id': openalex_id(author.get('id')),
+                   'institution_id': institution.get('ror') or institution.get('id', ''),
+                   'raw_affiliation': raw or institution.get('display_name', ''),
+                   'source': 'openalex', 'confidence': 'low', 'review_status': 'pending',
+                   'retrieved_at': retrieved_at})
+  return rows
+
+
+class Enricher:
+  def __init__(self, client=None, sources=SOURCES):
+    self.client = client or EnrichmentClient(cache=ResponseCache())
+    self.sources = sources
+
+  @traced('enrich.run')
+  def run(self, write=True, refresh=False) -> dict:
+    """
+    Look up the papers with missing data and merge the results. Return change counts.
+    """
+    fields, papers = read_rows(LIST_FILE)
+    _, affiliations = read_rows(AFFILIATION_FILE)
+    affiliated = {normalize_doi(a['doi']) for a in affiliations}
+    without_work_id = {normalize_doi(a['doi']) for a in affiliations if not a.get('openalex_work_id')}
+    dois = [normalize_doi(p.get('doi')) for p in papers
+            if any(not (p.get(f) or '').strip() for f in FILLED_FIELDS if f in fields)
+            or normalize_doi(p.get('doi')) not in affiliated or normalize_doi(p.get('doi')) in without_work_id]
+    dois = [d for d in dois if d]
+    print('[enrich] {} of {} papers have missing data'.format(len(dois), len(papers)))
+    records = {source: self.client.fetch(source, dois, refresh) for source in self.sources}
+    crossref, openalex = records.get('crossref', {}), records.get('openalex', {})
+
+    # 1) empty list.csv fields, Crossref first
+    changes = {'fields': 0, 'affiliations': 0, 'work_ids': 0}
+    for paper in papers:
+      doi = normalize_doi(paper.get('doi'))
+      candidates = []
+      if crossref.get(doi):
+        candidates.append(crossref_fields(crossref[doi]))
+      if openalex.get(doi):
+        candidates.append(openalex_fields(openalex[doi]))
+      for field in FILLED_FIELDS:
+        if field in fields and not (paper.get(field) or '').strip():
+          value = next((c[field] for c in candidates if c[field]), '')
+          if value:
+            paper[field] = value
+            changes['fields'] += 1
+
+    # 2) OpenAlex work ids of the existing affiliation rows
+    for a in affiliations:
+      work = openalex.get(normalize_doi(a['doi']))
+      if work and not a.get('openalex_work_id'):
+        a['openalex_work_id'] = openalex_id(work.get('id'))
+        changes['work_ids'] += 1
+
+    # 3) affiliation rows for papers that have none yet
+    retrieved_at = now()
+    for doi in dois:
+      if doi in affiliated:
+        continue
+      work = openalex.get(doi)
+      rows = []
+      if crossref.get(doi):
+        rows = crossref_affiliations(crossref[doi], doi, openalex_id(work.get('id')) if work else '', retrieved_at)
+      if not rows and work:
+        rows = openalex_affiliations(work, doi, retrieved_at)
+      affiliations.extend(rows)
+      changes['affiliations'] += len(rows)
+      affiliated.add(doi)
+
+    print('[enrich] filled {fields} fields, added {affiliations} affiliation rows, '
+          'set {work_ids} OpenAlex work ids'.format(**changes))
+    if write:
+      with DataStore() as store:
+        store.stage(LIST_FILE, fields, papers, key='doi')
+        store.stage(AFFILIATION_FILE, AFFILIATION_FIELDS, affiliations)
+    return changes
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Fill missing paper metadata and affiliations from Crossref and OpenAlex.')
+  parser.add_argument('--mailto', help='contact address for the APIs (default: $SAR_MAILTO)')
+  parser.add_argument('--source', choices=SOURCES, action='append', help='query only this source (repeatable)')
+  parser.add_argument('--refresh', action='store_true', help='ignore cached responses')
+  parser.add_argument('--dry-run', action='store_true', help='report the changes without writing the files')
+  parser.add_argument('--crossref-url', default=CROSSREF_URL)
+  parser.add_argument('--openalex-url', default=OPENALEX_URL)
+  args = parser.parse_args()
+  client = EnrichmentClient(args.crossref_url, args.openalex_url, args.mailto, ResponseCache())
+  Enricher(client, tuple(args.source or SOURCES)).run(write=not args.dry_run, refresh=args.refresh)
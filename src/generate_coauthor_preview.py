@@ -1,17 +1,32 @@
 """Generate a preview co-author network using librarian's canonicalization heuristics.
 
 Outputs:
-- assets/coauthor-preview.json : {nodes: [{id, name}], edges: [{source, target, weight}]}
+- assets/coauthor-preview.json : {nodes: [{id, name, size, x, y}], edges: [{source, target, weight}],
+                                  thresholds: [{weight, edges, nodes}],
+                                  adjacency: {offsets, edges}}
 - data/coauthor_mapping.csv : original_name, canonical_name, canonical_id
 
+Edges are sorted by weight (descending) and nodes by their strongest edge, so the
+edges and nodes visible at a minimum edge weight are always a prefix of the arrays;
+`thresholds` gives the prefix lengths for every distinct weight. `adjacency` is a
+CSR index: the incident edges of the node at position i are
+adjacency.edges[offsets[i]:offsets[i+1]], in ascending edge order. Node coordinates
+are computed here with a force-directed layout so the co-author
+page can render the network without running physics in the browser.
+
 This script intentionally keeps canonicalization logic self-contained to avoid
 import cycles or side-effects from importing Librarian (which may call DBLP).
 """
 import csv
 import json
+import math
 import os
 from collections import defaultdict, Counter
 
+from datastore import write_csv, write_text
+from instrument import count, span, traced
+from merge_decisions import MergeDecisions
+
 LIST_FILE = 'data/list.csv'
 MAPPING_CSV = 'data/coauthor_mapping.csv'
 OUT_JSON = 'assets/coauthor-preview.json'
@@ -128,6 +143,15 @@ def is_same_name(n1: str, n2: str) -> bool:
                 return True
     return False
 
+def surname_key(name: str) -> str:
+    """Lower-cased surname without suffixes such as "Jr". Two names can only be the same
+    person (see is_same_name) if their surname keys are equal.
+    """
+    parts = canonical_key(name)[0].split()
+    if parts and parts[-1] in ('jr', 'jr.', 'ii', 'iii', 'iv'):
+        parts = parts[:-1]
+    return ' '.join(parts)
+
 # --- end canonicalization helpers ---
 
 
@@ -143,50 +167,292 @@ def split_authors(author_field: str):
     return parts
 
 
-def build_preview():
-    if not os.path.exists(LIST_FILE):
-        print(f"error: {LIST_FILE} not found")
-        return
+# --- layout helpers ---
+
+LAYOUT_SEED = 42
+LAYOUT_ITERATIONS = 120
+NODE_SPACING = 60.0      # target distance between linked nodes, in vis-network pixels
+COMPONENT_GAP = 120.0    # gap between packed components
+REPULSION_BLOCK = 1024   # rows per block when computing pairwise repulsion
+GRID_MIN_NODES = 500     # components from this size use the grid approximation of repulsion
+GRID_NODES_PER_CELL = 4  # average nodes per cell of the approximation (at most 32 x 32 cells)
+
+
+def connected_components(n, edges):
+    """Return the node indices of each connected component, largest first."""
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for s, t, _ in edges:
+        rs, rt = find(s), find(t)
+        if rs != rt:
+            parent[rs] = rt
+    groups = defaultdict(list)
+    for i in range(n):
+        groups[find(i)].append(i)
+    return sorted(groups.values(), key=lambda g: (-len(g), g[0]))
+
+
+def exact_repulsion(pos, k):
+    """Repulsion k^2 / d between all pairs of nodes, O(n^2) per call.
+
+    Evaluated in row blocks so memory stays O(n * REPULSION_BLOCK).
+    """
+    import numpy as np
+    disp = np.zeros(pos.shape)
+    for start in range(0, len(pos), REPULSION_BLOCK):
+        block = pos[start:start + REPULSION_BLOCK]
+        delta = block[:, None, :] - pos[None, :, :]
+        dist2 = np.einsum('ijk,ijk->ij', delta, delta)
+        np.maximum(dist2, 1e-4, out=dist2)
+        disp[start:start + REPULSION_BLOCK] += np.einsum('ijk,ij->ik', delta, (k * k) / dist2)
+    return disp
+
+
+def grid_repulsion(pos, k, cells):
+    """Approximate repulsion k^2 / d on a grid of cells x cells square cells.
+
+    Pairs of nodes in the same or neighbouring cells repel exactly; every other cell acts
+    on a node as its node count concentrated at its centroid, evaluated at the centroid
+    of the node's cell (a one-level Barnes-Hut). The cost is O(n * nodes per
+    neighbourhood + occupied cells^2) per call instead of O(n^2).
+    """
+    import numpy as np
+    n = len(pos)
+    lo = pos.min(axis=0)
+    side = max(float(np.ptp(pos, axis=0).max()) / cells, 1e-9)
+    cell = np.minimum(((pos - lo) / side).astype(np.int64), cells - 1) + 1
+    width = cells + 2    # a free border for the neighbour offsets
+    key = cell[:, 1] * width + cell[:, 0]
+    order = np.argsort(key, kind='stable')
+    sorted_keys = key[order]
+    disp = np.zeros((n, 2))
+    # near field: every pair of nodes in the same or neighbouring cells once (i, j), with
+    # the force applied to both ends; within a cell only the pairs i < j (in cell order)
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    for dx, dy in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+        target = key + dy * width + dx
+        start = np.searchsorted(sorted_keys, target, 'left')
+        if dx == dy == 0:
+            start = rank + 1
+        lengths = np.searchsorted(sorted_keys, target, 'right') - start
+        total = int(lengths.sum())
+        if not total:
+            continue
+        i = np.repeat(np.arange(n), lengths)
+        j = order[np.repeat(start - np.cumsum(lengths) + lengths, lengths) + np.arange(total)]
+        delta = pos[i] - pos[j]
+        dist2 = np.einsum('ij,ij->i', delta, delta)
+        np.maximum(dist2, 1e-4, out=dist2)
+        force = delta * ((k * k) / dist2)[:, None]
+        for d in (0, 1):
+            disp[:, d] += np.bincount(i, weights=force[:, d], minlength=n) - np.bincount(j, weights=force[:, d], minlength=n)
+    # far field: cell centroids weighted by their node counts
+    occupied, inverse, mass = np.unique(key, return_inverse=True, return_counts=True)
+    centroid = np.stack([np.bincount(inverse, weights=pos[:, d]) for d in (0, 1)], axis=1) / mass[:, None]
+    cx, cy = occupied % width, occupied // width
+    far = (np.abs(cx[:, None] - cx[None, :]) > 1) | (np.abs(cy[:, None] - cy[None, :]) > 1)
+    delta = centroid[:, None, :] - centroid[None, :, :]
+    dist2 = np.einsum('ijk,ijk->ij', delta, delta)
+    np.maximum(dist2, 1e-4, out=dist2)
+    disp += np.einsum('ijk,ij->ik', delta, np.where(far, mass[None, :] * (k * k) / dist2, 0.0))[inverse]
+    return disp
+
+
+def force_layout(n, src, dst, weight, rng, iterations=LAYOUT_ITERATIONS):
+    """Fruchterman-Reingold layout of one component with vectorized NumPy forces.
+
+    src/dst are index arrays into the component's nodes, weight the edge weights.
+    Repulsion is exact below GRID_MIN_NODES nodes and otherwise approximated on a grid
+    (grid_repulsion), which keeps the cost of large components close to linear.
+    Coordinates are returned in units where the ideal edge length is 1.
+    """
+    import numpy as np
+    if n == 1:
+        return np.zeros((1, 2))
+    pos = rng.uniform(-1.0, 1.0, size=(n, 2)) * math.sqrt(n)
+    k = 1.0
+    temperature = math.sqrt(n)
+    cooling = temperature / (iterations + 1)
+    w = np.log1p(weight)
+    cells = min(32, max(4, int(math.sqrt(n / GRID_NODES_PER_CELL))))
+    for _ in range(iterations):
+        # repulsion: k^2 / d along the pairwise difference vectors
+        disp = exact_repulsion(pos, k) if n < GRID_MIN_NODES else grid_repulsion(pos, k, cells)
+        # attraction: d^2 / k along the edges, scaled by co-authorship weight
+        if len(src):
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt(np.einsum('ij,ij->i', delta, delta)) + 1e-9
+            force = delta * (dist * w / k)[:, None]
+            np.add.at(disp, src, -force)
+            np.add.at(disp, dst, force)
+        length = np.sqrt(np.einsum('ij,ij->i', disp, disp)) + 1e-9
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+    return pos - pos.mean(axis=0)
+
+
+def compute_layout(node_ids, edges, seed=LAYOUT_SEED):
+    """Deterministic coordinates for every node id, laid out per connected component.
+
+    Components are laid out independently and shelf-packed, largest first, into rows
+    of roughly square overall extent. Returns {node id: (x, y)}.
+    """
+    import numpy as np
+    index = {nid: i for i, nid in enumerate(node_ids)}
+    indexed = [(index[e['source']], index[e['target']], e['weight']) for e in edges]
+    by_component = defaultdict(list)
+    components = connected_components(len(node_ids), indexed)
+    comp_of = {}
+    for c, members in enumerate(components):
+        for i in members:
+            comp_of[i] = c
+    for s, t, w in indexed:
+        by_component[comp_of[s]].append((s, t, w))
+
+    rng = np.random.default_rng(seed)
+    boxes = []
+    for c, members in enumerate(components):
+        local = {i: j for j, i in enumerate(members)}
+        comp_edges = by_component[c]
+        src = np.array([local[s] for s, _, _ in comp_edges], dtype=np.intp)
+        dst = np.array([local[t] for _, t, _ in comp_edges], dtype=np.intp)
+        weight = np.array([w for _, _, w in comp_edges], dtype=float)
+        pos = force_layout(len(members), src, dst, weight, rng) * NODE_SPACING
+        lo, hi = pos.min(axis=0), pos.max(axis=0)
+        boxes.append((members, pos - lo, hi - lo))
+
+    # shelf packing: fill rows left to right up to the target width
+    total_area = sum((size[0] + COMPONENT_GAP) * (size[1] + COMPONENT_GAP) for _, _, size in boxes)
+    row_width = max(math.sqrt(total_area) * 1.2, max(size[0] for _, _, size in boxes) if boxes else 0)
+    coords = {}
+    x = y = row_height = 0.0
+    for members, pos, size in boxes:
+        if x > 0 and x + size[0] > row_width:
+            x, y = 0.0, y + row_height + COMPONENT_GAP
+            row_height = 0.0
+        for i, (px, py) in zip(members, pos):
+            coords[node_ids[i]] = (round(float(px + x), 1), round(float(py + y), 1))
+        x += size[0] + COMPONENT_GAP
+        row_height = max(row_height, size[1])
+    return coords
+
+# --- end layout helpers ---
+
+
+def threshold_views(nodes, edges):
+    """Order nodes and edges so every minimum-weight view is a prefix of both arrays.
+
+    Edges are sorted by weight descending; nodes by the weight of their strongest edge
+    (nodes without edges last). Returns (nodes, edges, thresholds) where thresholds lists,
+    for each distinct weight w in descending order, how many edges and nodes have
+    weight >= w.
+    """
+    edges = sorted(edges, key=lambda e: (-e['weight'], e['source'], e['target']))
+    strongest = defaultdict(int)
+    for e in edges:
+        for nid in (e['source'], e['target']):
+            strongest[nid] = max(strongest[nid], e['weight'])
+    nodes = sorted(nodes, key=lambda n: (-strongest[n['id']], n['id']))
+
+    thresholds = []
+    n_nodes = 0
+    for i, e in enumerate(edges):
+        if i + 1 < len(edges) and edges[i + 1]['weight'] == e['weight']:
+            continue
+        while n_nodes < len(nodes) and strongest[nodes[n_nodes]['id']] >= e['weight']:
+            n_nodes += 1
+        thresholds.append({'weight': e['weight'], 'edges': i + 1, 'nodes': n_nodes})
+    return nodes, edges, thresholds
+
+
+def adjacency_index(nodes, edges):
+    """CSR adjacency over array positions: returns (offsets, edge indices).
 
-    # collect all raw author names
-    papers = []
-    with open(LIST_FILE, encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            papers.append(r)
+    The incident edges of nodes[i] are edge_ids[offsets[i]:offsets[i+1]], sorted
+    ascending, so with weight-sorted edges the visible ones form a prefix.
+    """
+    import numpy as np
+    position = {n['id']: i for i, n in enumerate(nodes)}
+    n_edges = len(edges)
+    ends = np.array([(position[e['source']], position[e['target']]) for e in edges], dtype=np.int64).reshape(-1, 2)
+    owner = np.concatenate([ends[:, 0], ends[:, 1]])
+    edge_ids = np.concatenate([np.arange(n_edges), np.arange(n_edges)])
+    order = np.lexsort((edge_ids, owner))
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=len(nodes)), out=offsets[1:])
+    return offsets.tolist(), edge_ids[order].tolist()
 
-    raw_authors = []
+
+def author_lists(author_fields):
+    """Return the normalized author names of each author field."""
     paper_author_lists = []  # list of lists for each paper
-    for p in papers:
-        authors_field = p.get('author', '') or ''
-        names = split_authors(authors_field)
-        clean_names = [norm(n) for n in names if norm(n)]
-        paper_author_lists.append(clean_names)
-        raw_authors.extend(clean_names)
-
-    # build canonical groups: iterate through unique raw authors and cluster
+    for field in author_fields:
+        names = split_authors(field or '')
+        paper_author_lists.append([norm(n) for n in names if norm(n)])
+    return paper_author_lists
+
+
+@traced('coauthor.load')
+def load_author_lists(filename=LIST_FILE):
+    """Return the normalized author names of every paper in the list file."""
+    with open(filename, encoding='utf-8') as f:
+        return author_lists(p.get('author', '') for p in csv.DictReader(f))
+
+
+@traced('coauthor.cluster')
+def cluster_authors(paper_author_lists, decisions=None):
+    """Group the unique raw names into clusters of variants of the same person.
+
+    The merge decisions (default: data/merge_decisions.csv, see merge_decisions.py) are
+    consulted before is_same_name, and the new comparisons are recorded in their cache
+    (data/merge_cache.csv).
+    """
+    if decisions is None:
+        decisions = MergeDecisions()
+    # iterate through unique raw authors in order of first appearance
     unique_raw = []
     seen = set()
-    for a in raw_authors:
-        k = a.lower()
-        if k in seen:
-            continue
-        seen.add(k)
-        unique_raw.append(a)
-
-    # clustering
-    clusters = []  # list of lists of raw names
-    for name in unique_raw:
-        placed = False
-        for cl in clusters:
-            if is_same_name(cl[0], name):
-                cl.append(name)
-                placed = True
-                break
-        if not placed:
-            clusters.append([name])
-
-    # choose canonical name for each cluster
+    for authors in paper_author_lists:
+        for a in authors:
+            k = a.lower()
+            if k in seen:
+                continue
+            seen.add(k)
+            unique_raw.append(a)
+
+    # clustering: a name joins the first (oldest) cluster whose first name is the same
+    # person. is_same_name requires equal surname keys, so only the clusters with the
+    # same surname key need to be compared
+    comparisons = 0
+    def compare(n1, n2):
+        nonlocal comparisons
+        comparisons += 1
+        return is_same_name(n1, n2)
+    clusters = [[unique_raw[i] for i in cl] for cl in decisions.cluster(unique_raw, surname_key, compare)]
+    count('is_same_name', comparisons)
+    # only new comparisons change the cache; an unchanged cache is not rewritten
+    if decisions.changed:
+        decisions.save()
+    return clusters
+
+
+@traced('coauthor.canonical')
+def choose_canonical(clusters, decisions=None):
+    """Return (canonical_list, canonical_map) for the clusters.
+
+    canonical_list holds {id, name, members} per cluster and canonical_map maps each
+    raw name to (canonical id, canonical name). A cluster with a name pinned in the
+    merge decisions is named after the pin.
+    """
+    if decisions is None:
+        decisions = MergeDecisions()
     # Prefer variants that contain full given-name tokens (e.g. 'Xiaobai Sun')
     # over short/inverted forms like 'Sun, X.'; tie-break by length.
     canonical_map = {}
@@ -210,16 +476,16 @@ def build_preview():
             if score > best_score:
                 best_score = score
                 best = nm
-        canonical_name = best
+        canonical_name = decisions.pinned(cl) or best
         canonical_list.append({'id': cid, 'name': canonical_name, 'members': cl})
         for nm in cl:
             canonical_map[nm] = (cid, canonical_name)
+    return canonical_list, canonical_map
 
-    # build nodes
-    nodes = [{'id': c['id'], 'name': c['name'], 'size': len(c['members'])} for c in canonical_list]
-    id_by_name = {c['name']: c['id'] for c in canonical_list}
 
-    # build weighted edges (coauthorship counts)
+@traced('coauthor.edges')
+def build_edges(paper_author_lists, canonical_map):
+    """Count co-authorships between canonical ids. Return a Counter {(id, id): weight}."""
     edge_counter = Counter()
     for authors in paper_author_lists:
         # map author raw name -> canonical id if known
@@ -233,24 +499,60 @@ def build_preview():
         for i in range(len(ids)):
             for j in range(i+1, len(ids)):
                 edge_counter[(ids[i], ids[j])] += 1
+    return edge_counter
+
+
+@traced('coauthor.preview')
+def build_preview(paper_author_lists=None, canonical=None):
+    """Build and write the preview and the mapping.
+
+    A caller that already has the author lists of the papers, or the result of
+    choose_canonical(), can pass them in to skip reading and clustering (see pipeline.py).
+    """
+    if paper_author_lists is None:
+        if not os.path.exists(LIST_FILE):
+            print(f"error: {LIST_FILE} not found")
+            return
+        # collect all raw author names
+        paper_author_lists = load_author_lists()
+
+    # build canonical groups
+    if canonical is None:
+        decisions = MergeDecisions()
+        canonical = choose_canonical(cluster_authors(paper_author_lists, decisions), decisions)
+    canonical_list, canonical_map = canonical
 
+    # build nodes
+    nodes = [{'id': c['id'], 'name': c['name'], 'size': len(c['members'])} for c in canonical_list]
+
+    # build weighted edges (coauthorship counts)
+    edge_counter = build_edges(paper_author_lists, canonical_map)
     edges = [{'source': s, 'target': t, 'weight': w} for (s, t), w in edge_counter.items()]
 
+    # precompute node coordinates so the page does not need to run physics
+    with span('coauthor.layout'):
+        coords = compute_layout([n['id'] for n in nodes], edges)
+    for n in nodes:
+        n['x'], n['y'] = coords[n['id']]
+
     # ensure output directories exist
     os.makedirs(os.path.dirname(OUT_JSON), exist_ok=True)
     os.makedirs(os.path.dirname(MAPPING_CSV), exist_ok=True)
 
-    # write JSON
-    out = {'nodes': nodes, 'edges': edges}
-    with open(OUT_JSON, 'w', encoding='utf-8') as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
-
-    # write mapping CSV
-    with open(MAPPING_CSV, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['original_name', 'canonical_name', 'canonical_id'])
-        for orig, (cid, cname) in sorted(canonical_map.items(), key=lambda x: (x[1][0], x[0])):
-            writer.writerow([orig, cname, cid])
+    # order nodes/edges for prefix slicing by minimum edge weight
+    with span('coauthor.index'):
+        nodes, edges, thresholds = threshold_views(nodes, edges)
+        offsets, adjacent_edges = adjacency_index(nodes, edges)
+
+    with span('coauthor.write'):
+        # write JSON
+        out = {'nodes': nodes, 'edges': edges, 'thresholds': thresholds,
+               'adjacency': {'offsets': offsets, 'edges': adjacent_edges}}
+        write_text(OUT_JSON, json.dumps(out, ensure_ascii=False, separators=(',', ':')))
+
+        # write mapping CSV
+        rows = [[orig, cname, cid] for orig, (cid, cname) in sorted(canonical_map.items(), key=lambda x: (x[1][0], x[0]))]
+        write_csv(MAPPING_CSV, ['original_name', 'canonical_name', 'canonical_id'], rows, key='original_name')
 
     # print summary
     print(f'preview written: {OUT_JSON} (nodes={len(nodes)}, edges={len(edges)})')
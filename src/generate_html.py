@@ -1,62 +1,90 @@
 import csv
 import json
-import pandas as pd
-from bs4 import BeautifulSoup
-from papers import Paper
+import os
+from glob import glob
+from authors import AuthorShards
+from datastore import write_csv_text, write_text
+from importers import LIST_FIELDS, rename_map, sniff_encoding
+from instrument import span, traced, wrote
+from papers import PaperCorpus
+
+# sharded paper list (generate_list(shard=...)): fragment directory, and the minimum
+# number of rows embedded in components/list.html (one table page)
+LIST_SHARD_DIR = 'components/list'
+LIST_PAGE_ROWS = 25
+
+
+def shard_option(value):
+  """
+  Parse a --shard-list value: 'year' or a positive number of papers per shard.
+  """
+  import argparse
+  if value == 'year':
+    return value
+  if value.isdigit() and int(value) > 0:
+    return int(value)
+  raise argparse.ArgumentTypeError('expected "year" or a positive number of papers, got "{}"'.format(value))
+
 
 class Generator:
-  def __init__(self, sort=False):
+  @traced('generator.init')
+  def __init__(self, sort=False, db=None, corpus=None):
     self.list_filename = 'data/list.csv'
     self.scholar_filename = 'data/scholar.csv'
     self.chart_template_filename = 'pages/_index-chart.js'
     self.chart_filename = 'assets/index-chart.js'
 
+    # optional database.Database to query instead of re-reading the CSV files
+    self.db = db
+
+    # read all papers from the csv file into a column-oriented corpus, unless the
+    # caller already has one (see pipeline.py)
+    self.corpus = corpus if corpus is not None else self.load_corpus()
+
     # sort csv and get statistic data 
     self.data = self.read_csv(sort) 
-
-    # read all papers from the csv file
-    self.papers = []
-    with open(self.list_filename, 'r', encoding='utf-8') as file:
-      for each in csv.DictReader(file):
-        p = Paper(each)
-        self.papers.append(p)
+    if sort:
+      self.corpus = self.load_corpus()
+    self.papers = self.corpus
     
     # read all scholars from the csv file
-    self.scholars = []
-    with open(self.scholar_filename, 'r', encoding='utf-8') as file:
-      for each in csv.DictReader(file):
-        self.scholars.append(each)
+    self.scholars = self.load_scholars()
 
     print('[INFO] read {} papers from "{}"'.format(len(self.papers), self.list_filename))
     print('       read {} scholars from "{}"'.format(len(self.scholars), self.scholar_filename))
 
 
+  def load_scholars(self) -> list:
+    if self.db is not None:
+      return self.db.scholar_dicts()
+    with open(self.scholar_filename, 'r', encoding='utf-8') as file:
+      return list(csv.DictReader(file))
+
+  @traced('generator.load_corpus')
+  def load_corpus(self) -> PaperCorpus:
+    if self.db is not None:
+      return PaperCorpus.from_rows(LIST_FIELDS, self.db.paper_rows())
+    return PaperCorpus.from_csv(self.list_filename)
+
+  @traced('generator.read_csv')
   def read_csv(self, sort) -> dict:
     """
     Read csv file and calculate statistics for the basic BAR and PIE charts.
     """
-    # Read CSV with common encoding fallbacks and normalize column names
-    try:
-      df = pd.read_csv(self.list_filename, sep=',', header=0, encoding='utf-8-sig')
-    except Exception:
-      try:
-        df = pd.read_csv(self.list_filename, sep=',', header=0, encoding='cp1252')
-      except Exception:
-        df = pd.read_csv(self.list_filename, sep=',', header=0, encoding='latin-1', engine='python')
-
-    # Normalize column names to lower-case and trim
+    import pandas as pd
+    # Read CSV with a single encoding sniff and map header aliases (e.g. Zotero
+    # exports) to the canonical list.csv column names
+    if self.db is not None:
+      df = pd.DataFrame(self.db.paper_rows(), columns=LIST_FIELDS)
+    elif sort:
+      df = pd.read_csv(self.list_filename, sep=',', header=0,
+                       encoding=sniff_encoding(self.list_filename), encoding_errors='replace')
+    else:
+      # the statistics only need a few columns, which the corpus has already parsed
+      df = pd.DataFrame({f: self.corpus.column(f) for f in ('year', 'booktitle', 'title', 'repo_venue_tags')})
+    df = df.rename(columns=rename_map(list(df.columns)))
     df.columns = [str(c).strip().lower() for c in df.columns]
 
-    # Map common header names to canonical names expected by the script
-    col_map = {}
-    if 'publication title' in df.columns:
-      col_map['publication title'] = 'booktitle'
-    if 'journal' in df.columns and 'booktitle' not in df.columns:
-      col_map['journal'] = 'booktitle'
-    # apply mapping
-    if col_map:
-      df = df.rename(columns=col_map)
-
     # Ensure key columns exist
     if 'year' in df.columns:
       df['year'] = pd.to_numeric(df['year'], errors='coerce').fillna(0).astype(int)
@@ -91,18 +119,13 @@ class Generator:
       'Other': 0
     }
     
-    # Process each row and classify based on repo_analysis_tags
-    if 'repo_analysis_tags' in df.columns:
-      for tags_str in df['repo_analysis_tags'].fillna(''):
-        category_name, _ = self._classify_tags_internal(tags_str)
-        if category_name in field_counts:
-          field_counts[category_name] += 1
-        else:
-          field_counts['Other'] += 1
-          print(f'[DEBUG] Unclassified tags: "{tags_str}"')
-    else:
-      # If repo_analysis_tags column doesn't exist, default to 'Other'
-      field_counts['Other'] = len(df)
+    # Classify each distinct repo_analysis_tags value once and count its papers.
+    # A missing column yields empty tags, which are classified as 'Other'.
+    for (category_name, _), indices in self.corpus.by_tag(self.classify_tag).items():
+      if category_name in field_counts:
+        field_counts[category_name] += len(indices)
+      else:
+        field_counts['Other'] += len(indices)
     
     # Convert to DataFrame and sort by count
     pie_data = pd.DataFrame(list(field_counts.items()), columns=['field', 'count'])
@@ -131,7 +154,7 @@ class Generator:
     })
 
     if sort:
-      df.to_csv(self.list_filename, sep=',', encoding='utf-8', index=False, header=True)
+      write_csv_text(self.list_filename, df.to_csv(sep=',', index=False, header=True, lineterminator='\n'), key='doi')
 
     return data
 
@@ -169,6 +192,7 @@ class Generator:
     print(f'[DEBUG] Unclassified tags: "{tags_lower}"')
     return 'Other', 'other'
 
+  @traced('generator.index')
   def generate_index(self):
     """
     Generate the static index.html file. Need to reaplce the followings:
@@ -177,6 +201,7 @@ class Generator:
     * Bar chart <- cumulative number of publications
     * Pie chart <- distribution of research topics
     """
+    from bs4 import BeautifulSoup
     # read the template HTML file 
     with open('pages/_index.html', 'r') as file:
       text = file.read()
@@ -235,10 +260,12 @@ class Generator:
 
     with open(self.chart_filename, 'w', encoding='utf-8') as f:
       f.write(chart_script)
+    wrote(self.chart_filename)
 
     # write the new HTML
     with open('index.html', 'w') as file:
       file.write(str(soup))
+    wrote('index.html')
     print('[INFO] succesfully update list.html"')
 
 
@@ -248,13 +275,75 @@ class Generator:
     """
     return self._classify_tags_internal(tags_str)
 
-  def generate_list(self):
+  def paper_tags(self) -> list:
+    """
+    (category name, css class) of every paper. The corpus caches the classification of the
+    distinct repo_analysis_tags values, so this is shared by all pages.
+    """
+    paper_tags = [('Other', 'other')] * len(self.corpus)
+    for label, indices in self.corpus.by_tag(self.classify_tag).items():
+      for i in indices:
+        paper_tags[i] = label
+    return paper_tags
+
+  def list_shards(self, shard) -> list:
+    """
+    Split the paper indices into shards of the paper list, newest first: one shard per
+    year (shard='year', papers without a numeric year go to 'unknown') or shards of a
+    fixed number of papers (shard=n). Return [(name, indices)].
+    """
+    years = [str(y).strip() for y in self.corpus.column('year')]
+    # sorted() is stable, so papers of one year keep their list.csv order
+    order = sorted(range(len(years)), key=lambda i: int(years[i]) if years[i].isdigit() else -1, reverse=True)
+    if shard == 'year':
+      shards = {}
+      for i in order:
+        shards.setdefault(years[i] if years[i].isdigit() else 'unknown', []).append(i)
+      return list(shards.items())
+    size = int(shard)
+    return [('page-{}'.format(n + 1), order[start:start + size]) for n, start in enumerate(range(0, len(order), size))]
+
+  def write_list_shards(self, tbody, rows, shard) -> None:
+    """
+    Put the newest shards (at least LIST_PAGE_ROWS rows) into the table body and write the
+    others to LIST_SHARD_DIR as HTML fragments of table rows. The tbody gets a data-shards
+    manifest (file, rows and years of every shard) from which the page fetches the rest.
+    """
+    years = self.corpus.column('year')
+    manifest = []
+    embedded = 0
+    files = set()
+    os.makedirs(LIST_SHARD_DIR, exist_ok=True)
+    for name, indices in self.list_shards(shard):
+      entry = {'file': 'list/{}.html'.format(name), 'rows': len(indices),
+               'years': sorted({str(years[i]).strip() for i in indices}, reverse=True)}
+      if embedded < LIST_PAGE_ROWS:
+        for i in indices:
+          tbody.append(rows[i])
+        embedded += len(indices)
+        entry['embedded'] = True
+      else:
+        filename = os.path.join(LIST_SHARD_DIR, name + '.html')
+        write_text(filename, ''.join(str(rows[i]) for i in indices))
+        files.add(filename)
+      manifest.append(entry)
+    for filename in glob(os.path.join(LIST_SHARD_DIR, '*.html')):
+      if filename not in files:
+        os.remove(filename)
+    tbody['data-shards'] = json.dumps(manifest, separators=(',', ':'))
+    print('[INFO] paper list split into {} shards ({} rows in the page, the rest in "{}")'.format(
+      len(manifest), embedded, LIST_SHARD_DIR))
+
+  @traced('generator.list')
+  def generate_list(self, shard=None):
     """
     Generate the static components/list.html file. Need to reaplce the followings:
     * Description of the sub-title <- number of papers
-    * Data table <- complete paper list
+    * Data table <- complete paper list, or only its newest shards if shard is 'year' or
+      a number of papers per shard (the others are fetched by the page when needed)
     * Add tag classification and filtering functionality
     """
+    from bs4 import BeautifulSoup
     # read the template HTML file 
     with open('pages/_list.html', 'r') as file:
       text = file.read()
@@ -305,6 +394,10 @@ class Generator:
       if co_a_icon and co_a_icon.parent and co_a_icon.parent.name == 'a':
         co_a = co_a_icon.parent
         co_a['href'] = 'coauthor.html'
+      # authors link should be relative inside components folder
+      au_a_icon = soup.find('i', class_='fas fa-user')
+      if au_a_icon and au_a_icon.parent and au_a_icon.parent.name == 'a':
+        au_a_icon.parent['href'] = 'author.html'
     except Exception:
       pass
 
@@ -322,13 +415,28 @@ class Generator:
     element.string = ''
     
     # collect all years for the year filter
-    years = sorted(list(set([paper.year for paper in self.papers])), reverse=True)
+    years = self.corpus.years()
+
+    # classification tag of each paper, computed once per distinct tag value
+    paper_tags = self.paper_tags()
+
+    # papers added since the latest snapshot of the list (see snapshot.py)
+    from snapshot import new_since_last
+    snapshot, is_new = new_since_last({'doi': d, 'title': t} for d, t in
+                                      zip(self.corpus.column('doi'), self.corpus.column('title')))
+    if snapshot is not None:
+      year_filter = soup.find(id='yearFilter')
+      if year_filter:
+        option = soup.new_tag('option', value='new')
+        option.string = 'New since snapshot {} ({})'.format(snapshot.name, sum(is_new))
+        year_filter.append(option)
     
     # create a new row for each item in data
     # and add this new row into the HTML table
-    for each in self.papers:
+    rows = []
+    for idx, each in enumerate(self.papers):
       # Get classification tag for this paper
-      tag_display, tag_class = self.classify_tag(getattr(each, 'repo_analysis_tags', ''))
+      tag_display, tag_class = paper_tags[idx]
       
       # Define tag colors based on category
       tag_colors = {
@@ -346,6 +454,11 @@ class Generator:
       new_row = soup.new_tag('tr')
       new_row['data-tag'] = tag_class
       new_row['data-year'] = str(each.year)
+      new_row['data-idx'] = str(idx)
+      new_badge = ''
+      if snapshot is not None and is_new[idx]:
+        new_row['data-new'] = '1'
+        new_badge = ' <span class="badge badge-black text-white">New</span>'
       
       year_cell = BeautifulSoup('<td>{}</td>'.format(each.year), 'html.parser')
       
@@ -355,21 +468,33 @@ class Generator:
       pub_cell_html = '''
       <td>
         <div class="mb-2">
-          <span class="badge {} {}">{}</span>
+          <span class="badge {} {}">{}</span>{}
         </div>
         <p>{}<br/><strong>{}</strong><br/><em>{}</em></p>
       </td>
-      '''.format(tag_color, text_color, tag_display, each.author, each.title, each.venue_str())
+      '''.format(tag_color, text_color, tag_display, new_badge, each.author, each.title, each.venue_str())
       pub_cell = BeautifulSoup(pub_cell_html, 'html.parser')
       
       doi_cell = BeautifulSoup(
-        '<td><a href="https://www.doi.org/{}" target="_blank">DOI</a></td>'.format(
-          each.doi), 'html.parser')
+        '<td><a href="https://www.doi.org/{}" target="_blank">DOI</a><br/>'
+        '<a href="#" class="related-toggle">Related</a></td>'.format(each.doi), 'html.parser')
 
       new_row.append(year_cell)
       new_row.append(pub_cell)
       new_row.append(doi_cell)
-      element.append(new_row)
+      rows.append(new_row)
+
+    if shard is None:
+      for new_row in rows:
+        element.append(new_row)
+      # the fragments of an earlier sharded build are not used by this page
+      for filename in glob(os.path.join(LIST_SHARD_DIR, '*.html')):
+        os.remove(filename)
+    else:
+      self.write_list_shards(element, rows, shard)
+      results = soup.find(id='filterResults')
+      if results:
+        results.append(soup.new_tag('a', href='#', id='loadMoreShards', style='display:none'))
 
     # Add JavaScript for filtering functionality - replace existing DataTable initialization
     filter_script = '''
@@ -377,20 +502,56 @@ class Generator:
         // Store all rows data for filtering
         var allRowsData = [];
         var years = {};
+        // Shards of a sharded list (file, rows and years of each, newest first); only the
+        // embedded ones are in the page, the others are fetched when needed
+        var shards = $('#basic-datatables tbody').data('shards') || [];
+        var totalRows = 0;
         
         // Collect all data and years
-        $('#basic-datatables tbody tr').each(function() {
-          var $row = $(this);
-          var rowData = {
-            element: $row.clone(),
-            tag: $row.data('tag'),
-            year: $row.data('year'),
-            text: $row.text().toLowerCase()
-          };
-          allRowsData.push(rowData);
-          
-          var year = $row.data('year');
-          if (year) years[year] = true;
+        function addRows($rows) {
+          $rows.each(function() {
+            var $row = $(this);
+            var rowData = {
+              element: $row.clone(),
+              tag: $row.data('tag'),
+              year: $row.data('year'),
+              isNew: $row.data('new') === 1,
+              text: $row.text().toLowerCase()
+            };
+            allRowsData.push(rowData);
+            
+            var year = $row.data('year');
+            if (year) years[year] = true;
+          });
+        }
+        addRows($('#basic-datatables tbody tr'));
+        shards.forEach(function(shard) {
+          shard.years.forEach(function(year) { if (year) years[year] = true; });
+          totalRows += shard.rows;
+        });
+        totalRows = totalRows || allRowsData.length;
+        
+        // Fetch the shards selected by needed(shard) that are not loaded or loading yet
+        function loadShards(needed) {
+          return $.when.apply($, shards.filter(function(shard) {
+            return !shard.embedded && needed(shard);
+          }).map(function(shard) {
+            shard.request = shard.request || $.get(shard.file).then(function(html) {
+              addRows($($.parseHTML(html)).filter('tr'));
+            });
+            return shard.request;
+          }));
+        }
+        
+        function updateLoadMore() {
+          var rest = shards.filter(function(shard) { return !shard.embedded && !shard.request; });
+          var rows = rest.reduce(function(sum, shard) { return sum + shard.rows; }, 0);
+          $('#loadMoreShards').toggle(rows > 0).text('Load older papers (' + rows + ' more)');
+        }
+        $('#loadMoreShards').click(function(e) {
+          e.preventDefault();
+          var next = shards.filter(function(shard) { return !shard.embedded && !shard.request; })[0];
+          loadShards(function(shard) { return shard === next; }).always(applyFilters);
         });
         
         // Populate year filter
@@ -399,8 +560,18 @@ class Generator:
           $('#yearFilter').append('<option value="' + year + '">' + year + '</option>');
         });
         
-        // Filter function - operates on all data
+        // Filters need the shards of the selected year, or all shards for the other filters
         function applyFilters() {
+          var yearFilter = $('#yearFilter').val();
+          var needsAll = $('#tagFilter').val() || $('#searchInput').val() || yearFilter === 'new' ||
+            $('#showAllResults').val() === 'all';
+          loadShards(function(shard) {
+            return needsAll || (yearFilter && shard.years.indexOf(yearFilter) !== -1);
+          }).always(renderRows);
+        }
+        
+        // Filter function - operates on all loaded data
+        function renderRows() {
           var tagFilter = $('#tagFilter').val();
           var yearFilter = $('#yearFilter').val();
           var searchTerm = $('#searchInput').val().toLowerCase();
@@ -416,8 +587,8 @@ class Generator:
               show = false;
             }
             
-            // Year filter
-            if (yearFilter && rowData.year.toString() !== yearFilter) {
+            // Year filter ('new': papers added since the latest snapshot)
+            if (yearFilter === 'new' ? !rowData.isNew : (yearFilter && rowData.year.toString() !== yearFilter)) {
               show = false;
             }
             
@@ -433,11 +604,12 @@ class Generator:
           
           // Update result counts
           $('#filteredCount').text(filteredData.length);
-          if (filteredData.length !== allRowsData.length) {
-            $('#totalCount').show().html(' (out of ' + allRowsData.length + ' total)');
+          if (filteredData.length !== totalRows) {
+            $('#totalCount').show().html(' (out of ' + totalRows + ' total)');
           } else {
             $('#totalCount').hide();
           }
+          updateLoadMore();
 
           // Destroy existing DataTable first to avoid restoring original rows
           if ($.fn.DataTable.isDataTable('#basic-datatables')) {
@@ -481,6 +653,36 @@ class Generator:
           $("#basic-datatables").DataTable(dataTableConfig);
         }
         
+        // Related papers (assets/related.json, see related.py), loaded on first use;
+        // delegated because the rows are re-created by applyFilters
+        var related = null;
+        $(document).on('click', '.related-toggle', function(e) {
+          e.preventDefault();
+          var $row = $(this).closest('tr');
+          var $list = $row.find('.related-list');
+          if ($list.length) {
+            $list.toggle();
+            return;
+          }
+          $list = $('<ul class="related-list small mb-0"></ul>').appendTo($row.children('td').eq(1));
+          related = related || $.getJSON('../assets/related.json');
+          related.done(function(data) {
+            var pairs = data.related[$row.data('idx')] || [];
+            if (!pairs.length) {
+              $list.append('<li class="text-muted">No related papers found</li>');
+            }
+            for (var i = 0; i < pairs.length; i += 2) {
+              var paper = data.papers[pairs[i]];
+              $('<li></li>')
+                .append($('<a target="_blank"></a>').attr('href', 'https://www.doi.org/' + paper[1]).text(paper[0]))
+                .append(' (' + paper[2] + ', ' + pairs[i + 1] + '% similar)')
+                .appendTo($list);
+            }
+          }).fail(function() {
+            $list.append('<li class="text-muted">Related papers are not available</li>');
+          });
+        });
+
         // Bind filter events
         $('#tagFilter, #yearFilter, #showAllResults').change(applyFilters);
         $('#searchInput').on('input', applyFilters);
@@ -497,6 +699,11 @@ class Generator:
           // Disable default search since we have custom filters
           searching: false
         });
+        if (shards.length) {
+          $('#filteredCount').text(allRowsData.length);
+          $('#totalCount').show().html(' (out of ' + totalRows + ' total)');
+        }
+        updateLoadMore();
      });
     '''
     
@@ -506,14 +713,35 @@ class Generator:
       existing_script.string = filter_script
     
     # write the new HTML
-    with open('components/list.html', 'w', encoding='utf-8') as file:
-      file.write(str(soup))
+    with span('generator.list.write'):
+      with open('components/list.html', 'w', encoding='utf-8') as file:
+        file.write(str(soup))
+    wrote('components/list.html')
     print('[INFO] succesfully add {} rows into "components/list.html"'.format(len(self.papers)))
 
+  @traced('generator.cube')
+  def generate_cube(self):
+    """
+    Generate assets/cube.json, the year x topic x venue x system-type counts the
+    dashboard slices in the browser.
+    """
+    from cube import write_cube
+    write_cube(self.corpus, [name for name, _ in self.paper_tags()])
+
+  @traced('generator.related')
+  def generate_related(self):
+    """
+    Generate assets/related.json, the related papers shown on components/list.html.
+    """
+    from related import write_related
+    write_related(self.corpus)
+
+  @traced('generator.coauthor')
   def generate_coauthor(self):
     """
     Generate the static components/coauthor.html from pages/_coauthor.html template.
     """
+    from bs4 import BeautifulSoup
     with open('pages/_coauthor.html', 'r', encoding='utf-8') as file:
       text = file.read()
 
@@ -561,6 +789,10 @@ class Generator:
           co_li['class'] = co_li.get('class', [])
           if 'active' not in co_li['class']:
             co_li['class'].append('active')
+      # Authors -> author.html
+      au_a_icon = soup.find('i', class_='fas fa-user')
+      if au_a_icon and au_a_icon.parent and au_a_icon.parent.name == 'a':
+        au_a_icon.parent['href'] = 'author.html'
     except Exception:
       pass
 
@@ -575,11 +807,76 @@ class Generator:
       out_text = str(soup)
     with open('components/coauthor.html', 'w', encoding='utf-8') as f:
       f.write(out_text)
+    wrote('components/coauthor.html')
     print('[INFO] succesfully generated components/coauthor.html')
 
+  @traced('generator.authors')
+  def generate_authors(self, workers=4, force=False, mapping=None):
+    """
+    Generate components/author.html from pages/_author.html, and the per-author JSON shards
+    it loads (assets/authors/). Shards are only rewritten for authors whose papers changed.
+    mapping ({raw name: (canonical id, canonical name)}) defaults to data/coauthor_mapping.csv.
+    """
+    from bs4 import BeautifulSoup
+    with open('pages/_author.html', 'r', encoding='utf-8') as file:
+      text = file.read()
+
+    soup = BeautifulSoup(text, 'html.parser')
+
+    # insert sidebar fragment
+    try:
+      with open('components/_sidebar.html', 'r', encoding='utf-8') as sf:
+        sidebar_html = sf.read()
+      old_sidebar = soup.find('div', class_='sidebar')
+      if old_sidebar:
+        new_sidebar = BeautifulSoup(sidebar_html, 'html.parser')
+        old_sidebar.replace_with(new_sidebar)
+    except Exception:
+      pass
+
+    # fix links for components context and mark Authors as active
+    try:
+      links = {'fas fa-home': '../index.html', 'fas fa-layer-group': 'list.html',
+               'fas fa-file': 'coauthor.html', 'fas fa-user': 'author.html'}
+      for icon_class, href in links.items():
+        icon = soup.find('i', class_=icon_class)
+        if icon and icon.parent and icon.parent.name == 'a':
+          icon.parent['href'] = href
+          li = icon.parent.find_parent('li')
+          if li:
+            classes = [c for c in li.get('class', []) if c != 'active']
+            if icon_class == 'fas fa-user':
+              classes.append('active')
+            li['class'] = classes
+    except Exception:
+      pass
+
+    first_html = soup.find('html')
+    out_text = '<!DOCTYPE html>\n' + str(first_html) if first_html else str(soup)
+    with open('components/author.html', 'w', encoding='utf-8') as f:
+      f.write(out_text)
+    wrote('components/author.html')
+    print('[INFO] succesfully generated components/author.html')
+
+    with span('generator.authors.shards'):
+      AuthorShards(self.corpus, self.paper_tags(), mapping).write(workers=workers, force=force)
+
 if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Generate the static SAR website.')
+  parser.add_argument('--db', help='query this SQLite store (see database.py) instead of the CSV files')
+  parser.add_argument('--shard-list', metavar='year|N', type=shard_option,
+                      help='split the paper list by year or into shards of N papers, loaded on demand')
+  args = parser.parse_args()
+  db = None
+  if args.db:
+    from database import Database
+    db = Database(args.db)
   # Page generation must not rewrite or reorder the source CSV.
-  g = Generator(sort=False)
+  g = Generator(sort=False, db=db)
   g.generate_index()
-  g.generate_list()
+  g.generate_cube()
+  g.generate_list(shard=args.shard_list)
+  g.generate_related()
   g.generate_coauthor()
+  g.generate_authors()
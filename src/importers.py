@@ -0,0 +1,337 @@
+"""
+Import adapters that convert bibliography exports into the canonical data/list.csv schema.
+* Zotero / SAR CSV, BibTeX, RIS and DBLP search-API JSON are supported
+* Rows are streamed one at a time, and header aliases are resolved once per file
+* The text encoding is detected with a single sniff of the beginning of the file
+
+Usage: python src/importers.py <input> <output.csv> [--format csv|bibtex|ris|dblp-json]
+"""
+import codecs
+import csv
+import json
+import os
+import re
+import string
+
+# columns of data/list.csv, in file order
+LIST_FIELDS = ['doi', 'title', 'type', 'year', 'author', 'booktitle', 'pages', 'issue', 'volume',
+               'publisher', 'place', 'conference', 'date', 'abstract',
+               'repo_venue_tags', 'repo_analysis_tags', 'system_type_tag']
+
+# removes braces, backslashes and quotes from BibTeX field values in one pass
+BIB_CLEANUP = str.maketrans({'\n': ' ', '{': '', '}': '', '\\': '', '"': ''})
+
+# Header aliases of each canonical column, in order of preference. Aliases are
+# compared against lower-cased, stripped headers.
+HEADER_ALIASES = {
+  'doi': ('doi',),
+  'title': ('title',),
+  'type': ('type', 'item type'),
+  'year': ('year', 'publication year'),
+  'author': ('author', 'creators'),
+  'booktitle': ('booktitle', 'publication title', 'journal', 'conference name', 'meeting name'),
+  'pages': ('pages',),
+  'issue': ('issue', 'number', 'no'),
+  'volume': ('volume', 'vol'),
+  'publisher': ('publisher',),
+  'place': ('place',),
+  'conference': ('conference', 'conference name', 'meeting name'),
+  'date': ('date',),
+  'abstract': ('abstract', 'abstract note'),
+  'repo_venue_tags': ('repo_venue_tags',),
+  'repo_analysis_tags': ('repo_analysis_tags',),
+  'system_type_tag': ('system_type_tag',),
+}
+
+# publication types of the various export formats -> list.csv type
+TYPE_ALIASES = {
+  'conferencepaper': 'inproceedings',
+  'inproceedings': 'inproceedings',
+  'proceedings-article': 'inproceedings',
+  'conference and workshop papers': 'inproceedings',
+  'conf': 'inproceedings',
+  'cpaper': 'inproceedings',
+  'journalarticle': 'journal',
+  'journal articles': 'journal',
+  'jour': 'journal',
+  'article': 'journal',
+  'journal': 'journal',
+  'phdthesis': 'phdthesis',
+  'thes': 'phdthesis',
+  'thesis': 'phdthesis',
+  'techreport': 'techreport',
+  'rprt': 'techreport',
+  'report': 'techreport',
+  'book': 'book',
+  'booksection': 'inproceedings',
+  'incollection': 'inproceedings',
+  'inbook': 'inproceedings',
+  'chap': 'inproceedings',
+}
+
+SNIFF_SIZE = 64 * 1024
+
+
+def sniff_encoding(filename) -> str:
+  """
+  Detect the text encoding of a file from its first bytes: a BOM, then UTF-8, then cp1252.
+  latin-1 is returned as the last resort because it accepts any byte sequence.
+  """
+  with open(filename, 'rb') as file:
+    head = file.read(SNIFF_SIZE)
+  if head.startswith(codecs.BOM_UTF8):
+    return 'utf-8-sig'
+  for encoding in ('utf-8', 'cp1252'):
+    try:
+      # incremental decoding tolerates a multi-byte character cut off at the sample end
+      codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+      return encoding
+    except UnicodeDecodeError:
+      continue
+  return 'latin-1'
+
+
+def open_text(filename):
+  """
+  Open a file for reading with its sniffed encoding. Bytes that do not decode (beyond the
+  sniffed sample) are replaced instead of aborting the import.
+  """
+  return open(filename, 'r', encoding=sniff_encoding(filename), errors='replace', newline='')
+
+
+def resolve_columns(header) -> dict:
+  """
+  Map each canonical column to the position of its best matching header entry.
+  Columns without a match are omitted.
+  """
+  lowered = {}
+  for i, name in enumerate(header):
+    lowered.setdefault(str(name).strip().lower(), i)
+  positions = {}
+  for field, aliases in HEADER_ALIASES.items():
+    for alias in aliases:
+      if alias in lowered:
+        positions[field] = lowered[alias]
+        break
+  return positions
+
+
+def rename_map(header) -> dict:
+  """
+  Return {original header: canonical column} for the headers that have a canonical name.
+  """
+  mapping = {}
+  for field, pos in resolve_columns(header).items():
+    mapping.setdefault(header[pos], field)
+  return mapping
+
+
+def normalize_type(value) -> str:
+  value = str(value or '').strip()
+  return TYPE_ALIASES.get(value.lower(), value)
+
+
+def finish_row(row: dict) -> dict:
+  """
+  Fill in missing canonical columns and apply the value conventions of list.csv.
+  """
+  out = {field: (row.get(field) or '').strip() for field in LIST_FIELDS}
+  out['type'] = normalize_type(out['type'])
+  if not out['year'] and out['date']:
+    found = re.search(r'\d{4}', out['date'])
+    if found:
+      out['year'] = found.group(0)
+  out['pages'] = out['pages'].replace('--', '-')
+  if out['doi'].lower().startswith(('https://doi.org/', 'http://doi.org/', 'https://www.doi.org/')):
+    out['doi'] = out['doi'].split('doi.org/', 1)[1]
+  return out
+
+
+# ------------------------------------------------------------------------------------ #
+# import adapters
+# ------------------------------------------------------------------------------------ #
+IMPORTERS = {}
+
+
+def register(cls):
+  """
+  Class decorator that makes an importer available by its format name.
+  """
+  IMPORTERS[cls.name] = cls
+  return cls
+
+
+class Importer:
+  name = ''
+  extensions = ()
+
+  def rows(self, file):
+    """
+    Yield rows in the canonical list.csv schema from an open text file.
+    """
+    raise NotImplementedError
+
+
+@register
+class CSVImporter(Importer):
+  """
+  SAR list.csv files and Zotero CSV exports.
+  """
+  name = 'csv'
+  extensions = ('.csv',)
+
+  def rows(self, file):
+    reader = csv.reader(file)
+    header = next(reader, [])
+    columns = list(resolve_columns(header).items())
+    for values in reader:
+      if not values:
+        continue
+      n = len(values)
+      yield finish_row({field: values[pos] for field, pos in columns if pos < n})
+
+
+@register
+class BibTeXImporter(Importer):
+  name = 'bibtex'
+  extensions = ('.bib', '.bibtex')
+
+  # BibTeX field -> canonical column
+  fields = {'doi': 'doi', 'title': 'title', 'year': 'year', 'author': 'author',
+            'booktitle': 'booktitle', 'journal': 'booktitle', 'school': 'booktitle',
+            'pages': 'pages', 'number': 'issue', 'volume': 'volume', 'publisher': 'publisher',
+            'address': 'place', 'abstract': 'abstract'}
+  cleanup = BIB_CLEANUP
+
+  def entries(self, file):
+    """
+    Split a BibTeX file into the text of its entries without reading it all at once.
+    """
+    chunk = []
+    for line in file:
+      if line.lstrip().startswith('@') and chunk:
+        yield ''.join(chunk)
+        chunk = []
+      chunk.append(line)
+    if chunk:
+      yield ''.join(chunk)
+
+  def rows(self, file):
+    import bibtexparser
+    for text in self.entries(file):
+      for entry in bibtexparser.loads(text).entries:
+        row = {'type': entry.get('ENTRYTYPE', '')}
+        for key, column in self.fields.items():
+          if key in entry and not row.get(column):
+            row[column] = ' '.join(entry[key].translate(self.cleanup).split())
+        row['author'] = '; '.join(a.strip() for a in row.get('author', '').split(' and ') if a.strip())
+        yield finish_row(row)
+
+
+@register
+class RISImporter(Importer):
+  name = 'ris'
+  extensions = ('.ris',)
+
+  # RIS tag -> canonical column; later tags only fill columns that are still empty
+  tags = {'TY': 'type', 'TI': 'title', 'T1': 'title', 'T2': 'booktitle', 'JO': 'booktitle',
+          'JF': 'booktitle', 'BT': 'booktitle', 'PY': 'year', 'Y1': 'year', 'DA': 'date',
+          'VL': 'volume', 'IS': 'issue', 'DO': 'doi', 'PB': 'publisher', 'CY': 'place',
+          'AB': 'abstract', 'N2': 'abstract'}
+  line_re = re.compile(r'^([A-Z][A-Z0-9])  -\s?(.*)$')
+
+  def rows(self, file):
+    row, authors, start, end = {}, [], '', ''
+    for line in file:
+      match = self.line_re.match(line.rstrip('\r\n'))
+      if not match:
+        continue
+      tag, value = match.group(1), match.group(2).strip()
+      if tag == 'ER':
+        row['author'] = '; '.join(authors)
+        row['pages'] = '{}-{}'.format(start, end) if start and end else start
+        yield finish_row(row)
+        row, authors, start, end = {}, [], '', ''
+      elif tag in ('AU', 'A1'):
+        authors.append(value)
+      elif tag == 'SP':
+        start = value
+      elif tag == 'EP':
+        end = value
+      elif tag in self.tags and not row.get(self.tags[tag]):
+        if tag in ('PY', 'Y1'):
+          value = value[:4]
+        row[self.tags[tag]] = value
+
+
+@register
+class DBLPJSONImporter(Importer):
+  """
+  Responses of the DBLP publication search API (format=json).
+  """
+  name = 'dblp-json'
+  extensions = ('.json',)
+
+  def rows(self, file):
+    # the search API returns a single JSON document, so it is decoded as a whole
+    # and only the conversion of hits is streamed
+    data = json.load(file)
+    for hit in data.get('result', {}).get('hits', {}).get('hit', []):
+      info = hit.get('info', {})
+      authors = info.get('authors', {}).get('author', [])
+      if not isinstance(authors, list):
+        authors = [authors]
+      title = info.get('title', '')
+      yield finish_row({
+        'doi': info.get('doi', ''),
+        'title': title[:-1] if title.endswith('.') else title,
+        'type': info.get('type', ''),
+        'year': info.get('year', ''),
+        'author': '; '.join(a['text'].rstrip(string.digits).strip() for a in authors),
+        'booktitle': info.get('venue', ''),
+        'pages': info.get('pages', ''),
+        'issue': info.get('number', ''),
+        'volume': info.get('volume', ''),
+      })
+
+
+def detect_format(filename) -> str:
+  extension = os.path.splitext(filename)[1].lower()
+  for name, cls in IMPORTERS.items():
+    if extension in cls.extensions:
+      return name
+  raise ValueError('cannot detect the import format of "{}"'.format(filename))
+
+
+def iter_rows(filename, format=None):
+  """
+  Stream the papers of an export file as dicts in the canonical list.csv schema.
+  """
+  importer = IMPORTERS[format or detect_format(filename)]()
+  with open_text(filename) as file:
+    yield from importer.rows(file)
+
+
+def import_file(filename, output_file, format=None) -> int:
+  """
+  Convert an export file into a CSV file with the list.csv columns. Return the number of rows.
+  """
+  count = 0
+  with open(output_file, 'w', encoding='utf-8', newline='') as file:
+    writer = csv.DictWriter(file, fieldnames=LIST_FIELDS)
+    writer.writeheader()
+    for row in iter_rows(filename, format):
+      writer.writerow(row)
+      count += 1
+  print('[importers] wrote {} papers from "{}" to "{}"'.format(count, filename, output_file))
+  return count
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Convert a bibliography export into the list.csv schema.')
+  parser.add_argument('input')
+  parser.add_argument('output')
+  parser.add_argument('--format', choices=sorted(IMPORTERS))
+  args = parser.parse_args()
+  import_file(args.input, args.output, args.format)
@@ -0,0 +1,128 @@
+"""
+Lightweight instrumentation for the repository scripts.
+* span(name) is a context manager (traced(name) the decorator form) that records the
+  wall time of a stage; spans nest, so a report shows which step of a stage is slow
+* count(name, n) increments a counter, e.g. name comparisons, HTTP requests, cache hits
+  and bytes written
+* Nothing is recorded unless the SAR_TRACE environment variable names a report file;
+  the report is written when the script exits, as a Chrome trace (open it in
+  chrome://tracing or https://ui.perfetto.dev) whose otherData holds the span totals and
+  counters
+* SAR_PROFILE=<span name> runs that span under cProfile and writes <span name>.prof
+
+Usage: SAR_TRACE=trace.json SAR_PROFILE=coauthor.cluster python src/generate_coauthor_preview.py
+"""
+import atexit
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+TRACE_FILE = os.environ.get('SAR_TRACE', '')
+PROFILE_SPAN = os.environ.get('SAR_PROFILE', '')
+
+enabled = bool(TRACE_FILE or PROFILE_SPAN)
+events = []          # Chrome trace "complete" events
+counters = Counter()
+lock = threading.Lock()
+_start = time.perf_counter()
+
+
+def now_us() -> float:
+  return (time.perf_counter() - _start) * 1e6
+
+
+def count(name, n=1) -> None:
+  if enabled:
+    with lock:
+      counters[name] += n
+
+
+def wrote(filename) -> None:
+  """
+  Count the size of a file that was just written as bytes written.
+  """
+  if enabled and os.path.exists(filename):
+    count('bytes_written', os.path.getsize(filename))
+
+
+@contextmanager
+def span(name, **args):
+  if not enabled:
+    yield
+    return
+  profiler = cProfile.Profile() if name == PROFILE_SPAN else None
+  begin = now_us()
+  if profiler:
+    profiler.enable()
+  try:
+    yield
+  finally:
+    if profiler:
+      profiler.disable()
+      write_profile(name, profiler)
+    event = {'name': name, 'ph': 'X', 'ts': begin, 'dur': now_us() - begin,
+             'pid': os.getpid(), 'tid': threading.get_ident()}
+    if args:
+      event['args'] = args
+    events.append(event)
+
+
+def traced(name):
+  """
+  Decorator form of span().
+  """
+  def decorator(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+      with span(name):
+        return func(*args, **kwargs)
+    return wrapper
+  return decorator
+
+
+def write_profile(name, profiler) -> None:
+  filename = name + '.prof'
+  profiler.dump_stats(filename)
+  print('[instrument] profile of "{}" written to "{}"; top functions:'.format(name, filename), file=sys.stderr)
+  pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+
+
+def summary() -> dict:
+  """
+  Total wall time and number of calls per span name, and all counters.
+  """
+  spans = {}
+  for e in events:
+    s = spans.setdefault(e['name'], {'calls': 0, 'seconds': 0.0})
+    s['calls'] += 1
+    s['seconds'] += e['dur'] / 1e6
+  return {'spans': spans, 'counters': dict(counters)}
+
+
+def write_report(filename) -> None:
+  """
+  Write the recorded spans as a Chrome trace; counters are added as counter events at the
+  end of the trace and, with the span totals, under otherData.
+  """
+  data = summary()
+  trace = list(events)
+  if counters:
+    trace.append({'name': 'counters', 'ph': 'C', 'ts': now_us(), 'pid': os.getpid(), 'args': dict(counters)})
+  with open(filename, 'w', encoding='utf-8') as file:
+    json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms', 'otherData': data}, file, indent=1)
+  print('[instrument] trace written to "{}"'.format(filename), file=sys.stderr)
+  for name, s in sorted(data['spans'].items(), key=lambda x: -x[1]['seconds']):
+    print('  {:<32} {:9.3f}s  {:>6} calls'.format(name, s['seconds'], s['calls']), file=sys.stderr)
+  for name, n in sorted(data['counters'].items()):
+    print('  {:<32} {:>16}'.format(name, n), file=sys.stderr)
+
+
+if TRACE_FILE:
+  atexit.register(lambda: write_report(TRACE_FILE))
@@ -5,11 +5,19 @@ This script is used to manage the data files.
 """
 import csv
 import os
+from datastore import DataStore, write_csv
 from dblp import DBLP
+from generate_coauthor_preview import surname_key
+from instrument import count, span, traced
+from merge_decisions import MergeDecisions, name_key
+from papers import normalize_title
 
 class Librarian:
-  def __init__(self):
-    self.dblp = DBLP()
+  def __init__(self, db=None, dblp_store=None):
+    # optional dblp_dump.DBLPStore to search instead of the DBLP API
+    self.dblp = DBLP(dblp_store)
+    # optional database.Database to query instead of re-reading the CSV files
+    self.db = db
 
     self.paper_list_filename = 'data/list.csv'
     self.paper_list_fields = ['year', 'type', 'author', 'title', 'field', 'tag', 
@@ -19,30 +27,57 @@ class Librarian:
     self.scholar_fields = ['id', 'name', 'institution', 'category', 'country', 'homepage']
     # Ensure scholar file exists with proper header. If missing, create it.
     if not os.path.exists(self.scholar_filename):
-      os.makedirs(os.path.dirname(self.scholar_filename), exist_ok=True)
-      with open(self.scholar_filename, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=self.scholar_fields)
-        writer.writeheader()
+      write_csv(self.scholar_filename, self.scholar_fields, [])
       print('[librarian] created "{}" with headers'.format(self.scholar_filename))
 
-    # get the list of current papers
-    with open(self.paper_list_filename, 'r', encoding='utf-8') as file:
-      reader = csv.DictReader(file)
-      self.papers = list(reader)
-    print('[librarian] load {} papers from "{}"'.format(len(self.papers), self.paper_list_filename))
-    # get the list of current scholars
-    with open(self.scholar_filename, 'r', encoding='utf-8') as file:
-      reader = csv.DictReader(file)
-      self.scholar = list(reader)
-    print('[librarian] load {} scholars from "{}"'.format(len(self.scholar), self.scholar_filename))
-  
+    # papers and scholars are loaded on first use, so an operation that needs only
+    # one of the files does not read the other
+    self._papers = None
+    self._scholar = None
+
+  @property
+  def papers(self) -> list:
+    if self._papers is None:
+      with span('librarian.load_papers'):
+        self._papers = self.read_rows(self.paper_list_filename, 'papers')
+    return self._papers
+
+  @property
+  def scholar(self) -> list:
+    if self._scholar is None:
+      with span('librarian.load_scholars'):
+        self._scholar = self.read_rows(self.scholar_filename, 'scholars')
+    return self._scholar
+
+  @scholar.setter
+  def scholar(self, scholars):
+    self._scholar = scholars
+
+  def read_rows(self, filename, table) -> list:
+    """
+    Rows of one data file as dicts, from the database if one is given.
+    """
+    if self.db is not None:
+      rows = self.db.paper_dicts() if table == 'papers' else self.db.scholar_dicts()
+      source = self.db.filename
+    else:
+      with open(filename, 'r', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+      source = filename
+    print('[librarian] load {} {} from "{}"'.format(len(rows), table, source))
+    return rows
+
+  @traced('librarian.search_new_papers')
   def search_new_papers(self, keywords, year=None, output_file='data/add.csv'):
     """
     Search DBLP and write new papers found into a file. Note that this often contains papers
     that are irrelevant to the SAR repository.
     """
     # these paper titles are already included in repository
-    paper_titles = [e['title'].lower() for e in self.papers]
+    if self.db is not None:
+      paper_titles = self.db.paper_titles()
+    else:
+      paper_titles = {normalize_title(e['title']) for e in self.papers}
 
     # these paper titles should be excluded
     with open('data/excluded/excluded_format.txt', 'r', encoding='utf-8') as file:
@@ -56,15 +91,20 @@ class Librarian:
                                         excluded=excluded_titles,
                                         after_year=year)
     
+    # most likely relevant candidates first (see triage.py)
+    from triage import SCORE_FIELD, Triage
+    new_papers = Triage().train().rank(new_papers)
+
     # write the new papers into the add.csv file
     with open(output_file, 'w', encoding='utf-8') as file:
-      writer = csv.DictWriter(file, fieldnames=self.paper_list_fields)
+      writer = csv.DictWriter(file, fieldnames=[SCORE_FIELD] + self.paper_list_fields)
       writer.writeheader()
       for each in new_papers:
         writer.writerow(each)
 
     print('[librarian] write {} papers to "{}" (might be irrelevant to the SAR repository)'.format(len(new_papers), output_file))
 
+  @traced('librarian.update_scholar')
   def update_scholar(self):
     """
     Update scholar.csv accoridng to list.csv
@@ -72,6 +112,19 @@ class Librarian:
     # read current names and build normalized lookup
     current_names = [e.get('name', '').strip() for e in self.scholar]
     current_norm = {n.lower() for n in current_names if n}
+    current_keys = {name_key(n) for n in current_names if n}
+
+    # is_same_name requires equal surnames, so fuzzy matching only needs to compare
+    # a name with the current names that share its surname
+    if self.db is not None:
+      def same_surname(name):
+        return [s.get('name', '').strip() for s in self.db.scholars_by_surname(name)]
+    else:
+      by_surname = {}
+      for n in current_names:
+        by_surname.setdefault(surname_key(n), []).append(n)
+      def same_surname(name):
+        return by_surname.get(surname_key(name), [])
 
     paper_names = []
     raw_new = []
@@ -166,6 +219,7 @@ class Librarian:
       return (surname.lower(), tuple(initials), tuple(given_tokens))
 
     def is_same_name(n1: str, n2: str) -> bool:
+      count('is_same_name')
       k1 = canonical_key(n1)
       k2 = canonical_key(n2)
       s1, init1, given1 = k1[0], k1[1], k1[2]
@@ -239,24 +293,15 @@ class Librarian:
 
       return False
 
+    # stored merge decisions are consulted before is_same_name, which is then only run
+    # for pairs that were never compared (see merge_decisions.py)
+    decisions = MergeDecisions()
+
     # --- deduplicate existing scholars by clustering similar names ---
     def dedupe_existing_scholars():
       # Build clusters of indices where names are considered the same
-      clusters = []
-      for idx, s in enumerate(self.scholar):
-        name = s.get('name', '').strip()
-        if not name:
-          clusters.append({'rep': idx, 'members': [idx]})
-          continue
-        placed = False
-        for cl in clusters:
-          rep_name = self.scholar[cl['rep']].get('name', '')
-          if is_same_name(rep_name, name):
-            cl['members'].append(idx)
-            placed = True
-            break
-        if not placed:
-          clusters.append({'rep': idx, 'members': [idx]})
+      names = [s.get('name', '').strip() for s in self.scholar]
+      clusters = [{'rep': cl[0], 'members': cl} for cl in decisions.cluster(names, surname_key, is_same_name)]
 
       # Identify clusters with >1 member
       multi = [cl for cl in clusters if len(cl['members']) > 1]
@@ -277,9 +322,13 @@ class Librarian:
         # 2) otherwise prefer longest name (more complete)
         best_idx = members[0]
         best_score = -1
+        pinned = decisions.pinned(names[mi] for mi in members)
         for mi in members:
           nm = (self.scholar[mi].get('name') or '')
           score = 0
+          if pinned is not None and name_key(nm) == name_key(pinned):
+            # a curator pinned the cluster to this name
+            score += 10**6
           if ',' in nm:
             # prefer comma-formatted names
             score += 1000
@@ -312,36 +361,16 @@ class Librarian:
         new_scholars.append(rep)
         merged_summary.append((rep.get('id', ''), removed_info, rep.get('name', '')))
 
-      # Backup and write merged scholars back to file
-      try:
-        import shutil
-        bak_name = self.scholar_filename + '.bak'
-        shutil.copy(self.scholar_filename, bak_name)
-      except Exception:
-        bak_name = None
-
-      # sort new_scholars by surname then name to group same-family entries together
-      def scholar_sort_key(rec):
-        name = (rec.get('name') or '')
-        sk = canonical_key(name)
-        return (sk[0] or '', name)
-
-      new_scholars_sorted = sorted(new_scholars, key=scholar_sort_key)
-
-      with open(self.scholar_filename, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=self.scholar_fields)
-        writer.writeheader()
-        for r in new_scholars_sorted:
-          writer.writerow({k: r.get(k, '') for k in self.scholar_fields})
-
-      # Update in-memory list
+      # Update in-memory list; it is written once, together with any new
+      # names, at the end of update_scholar
       self.scholar = new_scholars
-      return {'backup': bak_name, 'merged': merged_summary}
+      return {'merged': merged_summary}
 
     # Run dedupe now (merge duplicates in existing scholar.csv)
-    dedupe_result = dedupe_existing_scholars()
+    with span('librarian.dedupe'):
+      dedupe_result = dedupe_existing_scholars()
     if dedupe_result:
-      print('[librarian] deduplicated scholar.csv; backup: {}'.format(dedupe_result.get('backup')))
+      print('[librarian] deduplicated scholar.csv')
       for rep_id, removed_info, rep_name in dedupe_result.get('merged'):
         # removed_info is list of (id, name)
         removed_str = ', '.join([f"{rid}:{rname}" for rid, rname in removed_info]) if removed_info else ''
@@ -359,12 +388,12 @@ class Librarian:
         # compare normalized against existing names (and consider heuristics)
         n_norm = norm(name)
         matched = False
-        if n_norm in current_norm:
+        if n_norm in current_norm or decisions.partners.get(name_key(name), set()) & current_keys:
           matched = True
         else:
           # try fuzzy check against existing names
-          for ex in current_names:
-            if is_same_name(ex, name):
+          for ex in same_surname(name):
+            if decisions.same_person(ex, name, is_same_name):
               matched = True
               break
         if not matched:
@@ -379,8 +408,8 @@ class Librarian:
         continue
       # also ensure it doesn't match current_names by heuristic
       already = False
-      for ex in current_names:
-        if is_same_name(ex, n):
+      for ex in same_surname(n):
+        if decisions.same_person(ex, n, is_same_name):
           already = True
           break
       if already:
@@ -391,6 +420,7 @@ class Librarian:
     print('[librarian] found {} new scholar names ({} unique)'.format(len(raw_new), len(new_names)))
 
     # Print names from scholar that do not appear in papers
+    paper_names = set(paper_names)
     for each in current_names:
       if each not in paper_names:
         print('\tnot appear in paper list: ' + each)
@@ -413,20 +443,25 @@ class Librarian:
         self.scholar.append({'id': str(next_id), 'name': name, 'institution': '', 'category': '', 'country': '', 'homepage': ''})
         next_id += 1
 
-      # Write full sorted scholar list back
-      def scholar_sort_key(rec):
-        name = (rec.get('name') or '')
-        sk = canonical_key(name)
-        return (sk[0] or '', name)
-
-      scholars_sorted = sorted(self.scholar, key=scholar_sort_key)
-      with open(self.scholar_filename, 'w', encoding='utf-8', newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=self.scholar_fields)
-        writer.writeheader()
-        for r in scholars_sorted:
-          writer.writerow({k: r.get(k, '') for k in self.scholar_fields})
-      print('[librarian] successfully wrote {} new scholars'.format(len(new_names)))
-
+      print('[librarian] added {} new scholars'.format(len(new_names)))
+
+    # Write the merged and extended scholar list (sorted by surname then name to group
+    # same-family entries together), its backup and the merge decisions together
+    scholars_sorted = None
+    with DataStore() as store:
+      decisions.save(store)
+      if dedupe_result or new_names:
+        def scholar_sort_key(rec):
+          name = (rec.get('name') or '')
+          sk = canonical_key(name)
+          return (sk[0] or '', name)
+
+        scholars_sorted = sorted(self.scholar, key=scholar_sort_key)
+        store.stage(self.scholar_filename, self.scholar_fields, scholars_sorted, key='id', backup=True)
+    if scholars_sorted is not None and self.db is not None:
+      self.db.replace_scholars(scholars_sorted)
+
+  @traced('librarian.check_paper_inclusion')
   def check_paper_inclusion(self, filename, start=None, end=None):
     """
     Determine whether the papers (titles) listed in the file are included in DBLP.
@@ -445,6 +480,14 @@ class Librarian:
         print('[{}] {}'.format(result, paper_title))
 
 if __name__ == '__main__':
-  lib = Librarian()
+  import argparse
+  parser = argparse.ArgumentParser(description='Maintain the SAR data files.')
+  parser.add_argument('--db', help='query this SQLite store (see database.py) instead of the CSV files')
+  args = parser.parse_args()
+  db = None
+  if args.db:
+    from database import Database
+    db = Database(args.db)
+  lib = Librarian(db)
   # lib.search_new_papers(keywords=['software aging', 'software rejuvenation'])
   lib.update_scholar()
@@ -0,0 +1,231 @@
+"""
+Persistent decisions on whether two author names are the same person.
+* data/merge_decisions.csv holds one decision per name pair: accept (same person),
+  reject (different people) or pin (the first name belongs to the cluster of, and is
+  shown as, the second name)
+* Decisions of a curator (source "curator") always win. Pairs that the is_same_name
+  heuristic had to compare are recorded with source "heuristic" in data/merge_cache.csv
+  (not versioned, not watched), so reruns look them up instead of comparing again; a
+  curator corrects a bad merge with `reject`, and `forget-heuristic` clears the cache
+  after the heuristic changed. Builds only write data/merge_decisions.csv when a curator
+  decision changed
+* MergeDecisions.cluster() groups names with the stored decisions first and the
+  heuristic second; Librarian.update_scholar (scholar.csv deduplication and new-name
+  matching) and generate_coauthor_preview.py (author clusters and canonical names) both
+  use it
+
+Usage: python src/merge_decisions.py reject "Lin Li" "Lingling Li"
+       python src/merge_decisions.py accept "Jr., Rivalino Matias" "Rivalino Matias"
+       python src/merge_decisions.py pin "R. Matias" "Rivalino Matias Jr."
+       python src/merge_decisions.py list [--source curator]
+       python src/merge_decisions.py forget-heuristic
+"""
+import csv
+import os
+from collections import defaultdict
+from datastore import DataStore
+from instrument import count
+
+DECISIONS_CSV = 'data/merge_decisions.csv'
+CACHE_CSV = 'data/merge_cache.csv'
+FIELDS = ['name', 'other', 'decision', 'source']
+ACCEPT, REJECT, PIN = 'accept', 'reject', 'pin'
+CURATOR, HEURISTIC = 'curator', 'heuristic'
+
+
+def name_key(name) -> str:
+  return ' '.join(str(name or '').split()).lower()
+
+
+def pair_key(a, b) -> tuple:
+  return tuple(sorted((name_key(a), name_key(b))))
+
+
+class MergeDecisions:
+  def __init__(self, filename=DECISIONS_CSV, cache=CACHE_CSV):
+    self.filename = filename       # curator decisions
+    self.cache = cache             # heuristic decisions
+    self.rows = {}                 # pair key -> row dict
+    self.partners = defaultdict(set)   # name key -> name keys a curator accepted or pinned with it
+    self.pins = {}                 # name key -> canonical name it is pinned to
+    self.changed = set()           # sources whose decisions changed since loading or saving
+    migrate = False
+    for name, default in ((cache, HEURISTIC), (filename, CURATOR)):
+      if os.path.exists(name):
+        with open(name, encoding='utf-8', newline='') as file:
+          for row in csv.DictReader(file):
+            source = row.get('source') or default
+            # heuristic rows in the decisions file (older versions) move to the cache
+            migrate = migrate or (name == filename and source == HEURISTIC)
+            self.add(row['name'], row['other'], row['decision'], source)
+    self.changed = {CURATOR, HEURISTIC} if migrate else set()
+
+  def add(self, name, other, decision, source=CURATOR) -> None:
+    if decision not in (ACCEPT, REJECT, PIN):
+      raise ValueError('unknown merge decision "{}"'.format(decision))
+    key = pair_key(name, other)
+    old = self.rows.get(key)
+    if old is not None and old['source'] == CURATOR and source == HEURISTIC:
+      return
+    if decision == PIN:
+      name, other = ' '.join(name.split()), ' '.join(other.split())
+    else:
+      name, other = sorted((' '.join(name.split()), ' '.join(other.split())), key=name_key)
+    row = {'name': name, 'other': other, 'decision': decision, 'source': source}
+    if old == row:
+      return
+    if old is not None and old['decision'] in (ACCEPT, PIN):
+      self.partners[key[0]].discard(key[1])
+      self.partners[key[1]].discard(key[0])
+    if old is not None and old['decision'] == PIN:
+      self.pins.pop(name_key(old['name']), None)
+    if decision == PIN:
+      self.pins[name_key(name)] = other
+    if decision in (ACCEPT, PIN) and source == CURATOR:
+      self.partners[key[0]].add(key[1])
+      self.partners[key[1]].add(key[0])
+    self.rows[key] = row
+    self.changed.add(source)
+    if old is not None:
+      self.changed.add(old['source'])
+
+  def decision(self, a, b):
+    """
+    The stored decision (accept, reject or pin) for a name pair, or None.
+    """
+    row = self.rows.get(pair_key(a, b))
+    return row['decision'] if row else None
+
+  def same_person(self, a, b, heuristic) -> bool:
+    """
+    Whether a and b are the same person: the stored decision if there is one, otherwise
+    heuristic(a, b), which is then recorded in the cache.
+    """
+    decision = self.decision(a, b)
+    if decision is not None:
+      count('merge_decision_hits')
+      return decision != REJECT
+    same = heuristic(a, b)
+    self.add(a, b, ACCEPT if same else REJECT, HEURISTIC)
+    return same
+
+  def rejected(self, name, names) -> bool:
+    """
+    Whether a curator rejected name as the same person as any of names.
+    """
+    for other in names:
+      row = self.rows.get(pair_key(name, other))
+      if row and row['decision'] == REJECT and row['source'] == CURATOR:
+        return True
+    return False
+
+  def pinned(self, names):
+    """
+    The canonical name that one of names is pinned to, or None.
+    """
+    for name in names:
+      pin = self.pins.get(name_key(name))
+      if pin is not None:
+        return pin
+    return None
+
+  def cluster(self, names, key, heuristic) -> list:
+    """
+    Group names into clusters of the same person, as lists of positions in names. Each
+    name joins the oldest cluster that holds a name it is accepted with or pinned to, or
+    otherwise the oldest cluster with the same key(name) whose first name is the same
+    person (see same_person). A name never joins a cluster holding a name a curator
+    rejected it with; empty names are clusters of their own.
+    """
+    clusters = []
+    by_key = defaultdict(list)    # key -> clusters with that key, oldest first
+    cluster_of = {}               # name key -> its cluster
+
+    def members(cl):
+      return [names[j] for j in cl]
+
+    for i, name in enumerate(names):
+      target = None
+      if name.strip():
+        for partner in sorted(self.partners.get(name_key(name), ())):
+          cl = cluster_of.get(partner)
+          if cl is not None and not self.rejected(name, members(cl)) and (target is None or cl[0] < target[0]):
+            target = cl
+        if target is None:
+          for cl in by_key[key(name)]:
+            if self.same_person(names[cl[0]], name, heuristic) and not self.rejected(name, members(cl)):
+              target = cl
+              break
+      if target is None:
+        target = []
+        clusters.append(target)
+        by_key[key(name)].append(target)
+      target.append(i)
+      cluster_of.setdefault(name_key(name), target)
+    return clusters
+
+  def save(self, store=None) -> bool:
+    """
+    Write the curator decisions and the cache (sorted by name pair), each only if its
+    decisions changed, or stage them in a datastore.DataStore that the caller commits.
+    Return True if a file was written.
+    """
+    own = store is None
+    store = DataStore() if own else store
+    for source, filename in ((CURATOR, self.filename), (HEURISTIC, self.cache)):
+      if source in self.changed:
+        rows = [self.rows[k] for k in sorted(self.rows) if self.rows[k]['source'] == source]
+        store.stage(filename, FIELDS, rows)
+    self.changed = set()
+    return bool(store.commit()) if own else False
+
+  def forget(self, source=HEURISTIC) -> int:
+    """
+    Remove the decisions of a source. Return the number removed.
+    """
+    keys = [k for k, row in self.rows.items() if row['source'] == source]
+    for k in keys:
+      row = self.rows.pop(k)
+      if row['decision'] in (ACCEPT, PIN):
+        self.partners[k[0]].discard(k[1])
+        self.partners[k[1]].discard(k[0])
+      if row['decision'] == PIN:
+        self.pins.pop(name_key(row['name']), None)
+    if keys:
+      self.changed.add(source)
+    return len(keys)
+
+
+def main(argv=None) -> None:
+  import argparse
+  parser = argparse.ArgumentParser(description='Record and list author-merge decisions.')
+  parser.add_argument('--file', default=DECISIONS_CSV)
+  parser.add_argument('--cache', default=CACHE_CSV)
+  commands = parser.add_subparsers(dest='command', required=True)
+  for decision, text in ((ACCEPT, 'the two names are the same person'),
+                         (REJECT, 'the two names are different people'),
+                         (PIN, 'NAME belongs to the cluster of OTHER, which is shown as its name')):
+    p = commands.add_parser(decision, help=text)
+    p.add_argument('name')
+    p.add_argument('other')
+  p = commands.add_parser('list', help='print the decisions')
+  p.add_argument('--source', choices=[CURATOR, HEURISTIC])
+  commands.add_parser('forget-heuristic', help='clear the cache of heuristic decisions')
+  args = parser.parse_args(argv)
+
+  decisions = MergeDecisions(args.file, args.cache)
+  if args.command == 'list':
+    for row in decisions.rows.values():
+      if args.source in (None, row['source']):
+        print('{:<7} {:<9} {}  |  {}'.format(row['decision'], row['source'], row['name'], row['other']))
+    return
+  if args.command == 'forget-heuristic':
+    print('[merge] removed {} heuristic decisions'.format(decisions.forget(HEURISTIC)))
+  else:
+    decisions.add(args.name, args.other, args.command, CURATOR)
+    print('[merge] {}: "{}" / "{}"'.format(args.command, args.name, args.other))
+  decisions.save()
+
+
+if __name__ == '__main__':
+  main()
@@ -1,34 +1,87 @@
-import csv 
+import csv
+import sys
+from importers import HEADER_ALIASES, iter_rows, open_text
+from instrument import count
+
+# Header aliases for each Paper field, in order of preference. Fields stored in
+# list.csv share the alias table of the import adapters; the remaining ones are
+# legacy fields of older exports.
+FIELD_ALIASES = {
+  'year': HEADER_ALIASES['year'],
+  'type': HEADER_ALIASES['type'],
+  'author': HEADER_ALIASES['author'],
+  'title': HEADER_ALIASES['title'],
+  'field': ('field', 'language'),
+  'tag': ('tag', 'manual tags', 'automatic tags'),
+  'booktitle': HEADER_ALIASES['booktitle'],
+  'abbr': ('abbr', 'journal abbreviation'),
+  'vol': ('vol',) + HEADER_ALIASES['volume'],
+  'no': ('no',) + HEADER_ALIASES['issue'],
+  'pages': HEADER_ALIASES['pages'],
+  'doi': HEADER_ALIASES['doi'],
+  'repo_analysis_tags': HEADER_ALIASES['repo_analysis_tags'],
+  'repo_venue_tags': HEADER_ALIASES['repo_venue_tags'],
+  'system_type_tag': HEADER_ALIASES['system_type_tag'],
+  'abstract': HEADER_ALIASES['abstract'],
+}
+
+# Low-cardinality fields whose values are interned so that repeated values
+# (years, venues, tags) share one string object across the corpus.
+INTERNED_FIELDS = {'year', 'type', 'field', 'tag', 'booktitle', 'abbr',
+                   'repo_analysis_tags', 'repo_venue_tags', 'system_type_tag'}
+
+
+def normalize_title(title) -> str:
+  """
+  Lower-cased title without a trailing period and with collapsed whitespace, used to
+  match the same paper across data sources.
+  """
+  title = ' '.join(str(title or '').split()).lower()
+  return title[:-1] if title.endswith('.') else title
+
+
+def resolve_header(fieldnames) -> dict:
+  """
+  Map each Paper field to the position of its best matching column in a CSV header.
+  Fields without a matching column are omitted.
+  """
+  lowered = {}
+  for i, name in enumerate(fieldnames):
+    lowered.setdefault(str(name).strip().lower(), i)
+  positions = {}
+  for field, aliases in FIELD_ALIASES.items():
+    for alias in aliases:
+      if alias in lowered:
+        positions[field] = lowered[alias]
+        break
+  return positions
+
 
 class Paper:
-  def __init__(self, js) -> None:
+  __slots__ = tuple(FIELD_ALIASES)
+
+  def __init__(self, js=None, **fields) -> None:
     # normalize input dict keys to lower-case for resilience
     if isinstance(js, dict):
       lowered = {str(k).strip().lower(): v for k, v in js.items()}
-    else:
-      # fallback: try to convert object with attributes
-      lowered = {}
-    def get(*keys, default=''):
-      for k in keys:
-        if k in lowered and lowered[k] is not None:
-          return lowered[k]
-      return default
-
-    self.year = get('year', default='')
-    self.type = get('type', 'item type', default='')
-    self.author = get('author', 'creators', default='')
-    self.title = get('title', default='')
-    self.field = get('field', 'language', default='')
-    self.tag = get('tag', 'manual tags', 'automatic tags', default='')
-    self.booktitle = get('booktitle', 'publication title', 'journal', default='')
-    self.abbr = get('abbr', 'journal abbreviation', default='')
-    self.vol = get('vol', 'volume', default='')
-    self.no = get('no', 'number', 'issue', default='')
-    self.pages = get('pages', default='')
-    self.doi = get('doi', default='')
-    # Add support for repo_analysis_tags field
-    self.repo_analysis_tags = get('repo_analysis_tags', default='')
-  
+      for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+          if lowered.get(alias) is not None:
+            fields.setdefault(field, lowered[alias])
+            break
+    for field in self.__slots__:
+      setattr(self, field, fields.get(field, ''))
+
+  @classmethod
+  def from_values(cls, values) -> 'Paper':
+    """
+    Build a Paper from values ordered as Paper.__slots__, skipping alias resolution.
+    """
+    p = cls.__new__(cls)
+    for field, value in zip(cls.__slots__, values):
+      setattr(p, field, value)
+    return p
+
   def __str__(self) -> str:
     return "{}\n{}\n{}\n".format(self.author, self.title, self.venue_str())
 
@@ -47,59 +100,113 @@ class Paper:
       venue += ' pp.{}, {}'.format(self.pages, self.year)
     return venue
 
+
+class PaperCorpus:
+  """
+  Column-oriented collection of papers. Each Paper field is stored as one list of
+  (interned) strings, and Paper records are materialized only on access.
+  """
+  def __init__(self) -> None:
+    self.columns = {field: [] for field in Paper.__slots__}
+    self._groups = {}
+
+  @classmethod
+  def from_csv(cls, filename) -> 'PaperCorpus':
+    with open_text(filename) as file:
+      reader = csv.reader(file)
+      header = next(reader, [])
+      return cls.from_rows(header, reader)
+
+  @classmethod
+  def from_rows(cls, header, rows) -> 'PaperCorpus':
+    """
+    Build a corpus from a header and an iterable of row lists. Header aliases are
+    resolved once for the whole input rather than once per row.
+    """
+    corpus = cls()
+    positions = resolve_header(header)
+    appenders = []
+    for field in Paper.__slots__:
+      column = corpus.columns[field]
+      pos = positions.get(field)
+      appenders.append((column.append, pos, field in INTERNED_FIELDS))
+    intern = sys.intern
+    for row in rows:
+      n = len(row)
+      for append, pos, interned in appenders:
+        value = row[pos] if pos is not None and pos < n else ''
+        append(intern(value) if interned else value)
+    return corpus
+
+  @classmethod
+  def from_dicts(cls, dicts) -> 'PaperCorpus':
+    dicts = list(dicts)
+    header = list(dicts[0].keys()) if dicts else []
+    return cls.from_rows(header, ([d.get(k) or '' for k in header] for d in dicts))
+
+  def append(self, paper: Paper) -> None:
+    for field in Paper.__slots__:
+      value = getattr(paper, field)
+      self.columns[field].append(sys.intern(value) if field in INTERNED_FIELDS and isinstance(value, str) else value)
+    self._groups.clear()
+
+  def __len__(self) -> int:
+    return len(self.columns['title'])
+
+  def __getitem__(self, index) -> Paper:
+    return Paper.from_values([self.columns[f][index] for f in Paper.__slots__])
+
+  def __iter__(self):
+    columns = [self.columns[f] for f in Paper.__slots__]
+    for values in zip(*columns):
+      yield Paper.from_values(values)
+
+  def column(self, field) -> list:
+    return self.columns[field]
+
+  def group_by(self, field, key=None) -> dict:
+    """
+    Group paper indices by the value of a field. If key is given, it is applied once
+    per distinct field value (not once per paper) to derive the group label.
+    Results are cached, so use a stable key function for repeated calls.
+    """
+    cache_key = (field, key)
+    if cache_key in self._groups:
+      count('group_by_cache_hits')
+      return self._groups[cache_key]
+    count('group_by_cache_misses')
+    by_value = {}
+    for i, value in enumerate(self.columns[field]):
+      by_value.setdefault(value, []).append(i)
+    if key is None:
+      groups = by_value
+    else:
+      groups = {}
+      for value, indices in by_value.items():
+        groups.setdefault(key(value), []).extend(indices)
+      for indices in groups.values():
+        indices.sort()
+    self._groups[cache_key] = groups
+    return groups
+
+  def by_year(self) -> dict:
+    return self.group_by('year')
+
+  def by_tag(self, key=None) -> dict:
+    return self.group_by('repo_analysis_tags', key)
+
+  def by_venue(self) -> dict:
+    return self.group_by('repo_venue_tags')
+
+  def years(self) -> list:
+    return sorted(self.by_year().keys(), reverse=True)
+
+
 if __name__ == '__main__':
-  # Try common encodings when reading CSV files to avoid UnicodeDecodeError
-  csv_path = 'data/list.csv'
-  data = []
-  try:
-    # Prefer UTF-8 with BOM handling
-    with open(csv_path, 'r', encoding='utf-8-sig') as file:
-      reader = csv.DictReader(file)
-      data = list(reader)
-  except UnicodeDecodeError:
-    try:
-      # Fallback to a common Windows encoding
-      with open(csv_path, 'r', encoding='cp1252') as file:
-        reader = csv.DictReader(file)
-        data = list(reader)
-    except UnicodeDecodeError:
-      # As a last resort read with latin-1 and replace undecodable bytes so script continues
-      with open(csv_path, 'r', encoding='latin-1', errors='replace') as file:
-        reader = csv.DictReader(file)
-        data = list(reader)
-
-  # Normalize rows: map common CSV headers (Zotero export style) to the keys expected by Paper
-  def normalize_row(row: dict) -> dict:
-    # build lower-case lookup for original row
-    lc = {k.strip().lower(): v for k, v in row.items()}
-
-    def pick(*candidates):
-      for c in candidates:
-        if c in lc and lc[c] is not None:
-          return lc[c]
-      return ''
-
-    normalized = {
-      'year': pick('year'),
-      'type': pick('item type', 'type'),
-      'author': pick('author', 'creators'),
-      'title': pick('title'),
-      'field': pick('language', 'field'),
-      'tag': pick('manual tags', 'automatic tags', 'tags'),
-      'booktitle': pick('publication title', 'conference name', 'meeting name', 'journal'),
-      'abbr': pick('journal abbreviation', 'journal abbreviation (iso)'),
-      'vol': pick('volume', 'vol'),
-      'no': pick('number', 'issue'),
-      'pages': pick('pages'),
-      'doi': pick('doi')
-    }
-    return normalized
-
-  # Apply normalization
-  data = [normalize_row(r) for r in data]
-
-  if len(data) == 0:
+  # rows are normalized to the list.csv schema by the import adapters
+  first = next(iter_rows('data/list.csv'), None)
+  if first is None:
     print('no data rows found in CSV')
   else:
-    p = Paper(data[0])
+    p = Paper(first)
     print(p)
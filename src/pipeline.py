@@ -0,0 +1,138 @@
+"""
+Run the site build in one process.
+* data/list.csv is parsed once into the PaperCorpus of a Generator, which all pages share
+* Author lists and canonical author clusters are computed once from the corpus and used for
+  the co-author preview, the name mapping and the author pages (which then do not re-read
+  data/coauthor_mapping.csv)
+* Tag classifications are cached by the corpus and shared by the index, list and author pages
+* The wall time of every stage is printed at the end
+* update() rebuilds only the pages affected by a set of changed input files, keeping the
+  corpus and author clusters from the previous build when their input (the author column
+  and data/merge_decisions.csv) did not change
+  (used by watch.py)
+
+Usage: python src/pipeline.py [--db data/sar.sqlite] [--skip-coauthor]  (or: python src/sar.py build)
+"""
+import time
+from contextlib import contextmanager
+from instrument import span
+
+
+# pages in build order, and the pages that depend on each watched input file
+PAGES = ['index', 'cube', 'list', 'related', 'coauthor_page', 'author_pages']
+PAGES_OF = {
+  'data/list.csv': set(PAGES),
+  'data/scholar.csv': {'index'},
+  'pages/_index.html': {'index'},
+  'pages/_index-chart.js': {'index'},
+  'pages/_list.html': {'list'},
+  'pages/_coauthor.html': {'coauthor_page'},
+  'pages/_author.html': {'author_pages'},
+  'components/_sidebar.html': set(PAGES) - {'cube', 'related'},
+  'data/merge_decisions.csv': {'author_pages'},
+}
+
+
+class Pipeline:
+  def __init__(self, db=None, shard_list=None):
+    """
+    :param db: optional database.Database to query instead of reading the CSV files
+    :param shard_list: split the paper list by 'year' or into shards of n papers
+                       (see Generator.generate_list)
+    """
+    self.db = db
+    self.shard_list = shard_list
+    self.timings = []     # (stage, seconds) in execution order
+    self.generator = None
+    self.authors = None   # author column the current clusters were computed from
+    self.mapping = None   # raw name -> (canonical id, canonical name)
+
+  @contextmanager
+  def stage(self, name):
+    start = time.perf_counter()
+    with span('pipeline.' + name):
+      yield
+    self.timings.append((name, time.perf_counter() - start))
+
+  def run(self, coauthor=True) -> None:
+    """
+    Build the co-author preview (unless coauthor is False) and all pages.
+    """
+    self.timings = []
+    self.load()
+    if coauthor:
+      self.build_coauthor()
+    self.render(PAGES)
+    self.report()
+
+  def update(self, changed) -> None:
+    """
+    Rebuild after the given files (relative paths, see PAGES_OF) changed. The corpus and
+    the author clusters are kept from the previous build unless their input changed.
+    """
+    self.timings = []
+    pages = set().union(*(PAGES_OF.get(f, set()) for f in changed))
+    # curated merge decisions change the clusters even if the author column did not
+    coauthor = 'data/merge_decisions.csv' in changed
+    if self.generator is None or 'data/list.csv' in changed:
+      self.load()
+      coauthor = coauthor or self.generator.corpus.column('author') != self.authors
+    elif 'data/scholar.csv' in changed:
+      with self.stage('scholars'):
+        self.generator.scholars = self.generator.load_scholars()
+    if coauthor:
+      self.build_coauthor()
+    self.render(pages)
+    self.report()
+
+  def load(self) -> None:
+    from generate_html import Generator
+    with self.stage('load'):
+      self.generator = Generator(sort=False, db=self.db)
+
+  def build_coauthor(self) -> None:
+    from generate_coauthor_preview import author_lists, build_preview, choose_canonical, cluster_authors
+    from merge_decisions import MergeDecisions
+    authors = self.generator.corpus.column('author')
+    with self.stage('author_lists'):
+      lists = author_lists(authors)
+    with self.stage('clustering'):
+      decisions = MergeDecisions()
+      canonical = choose_canonical(cluster_authors(lists, decisions), decisions)
+    with self.stage('coauthor_preview'):
+      build_preview(lists, canonical)
+    self.authors = list(authors)
+    self.mapping = canonical[1]
+
+  def render(self, pages) -> None:
+    g = self.generator
+    build = {'index': g.generate_index, 'cube': g.generate_cube, 'list': lambda: g.generate_list(shard=self.shard_list),
+             'related': g.generate_related,
+             'coauthor_page': g.generate_coauthor,
+             'author_pages': lambda: g.generate_authors(mapping=self.mapping)}
+    for page in PAGES:
+      if page in pages:
+        with self.stage(page):
+          build[page]()
+
+  def report(self) -> None:
+    total = sum(seconds for _, seconds in self.timings)
+    print('[pipeline] time per stage:')
+    for name, seconds in self.timings:
+      print('  {:<18} {:8.3f}s {:6.1f}%'.format(name, seconds, 100 * seconds / total if total else 0))
+    print('  {:<18} {:8.3f}s'.format('total', total))
+
+
+if __name__ == '__main__':
+  import argparse
+  from generate_html import shard_option
+  parser = argparse.ArgumentParser(description='Build the co-author preview and all pages in one process.')
+  parser.add_argument('--db', help='query this SQLite store (see database.py) instead of the CSV files')
+  parser.add_argument('--skip-coauthor', action='store_true', help='keep the current co-author preview')
+  parser.add_argument('--shard-list', metavar='year|N', type=shard_option, help='split the paper list by year or into shards of N papers')
+  args = parser.parse_args()
+  db = None
+  if args.db:
+    from database import Database
+    db = Database(args.db)
+  Pipeline(db, args.shard_list).run(coauthor=not args.skip_coauthor)
@@ -0,0 +1,106 @@
+"""
+Related papers from the similarity of titles and abstracts.
+* Each paper's title and abstract are vectorized with the TF-IDF of triage.py (words and
+  word pairs); terms that occur in a single paper are dropped
+* Cosine similarities are computed for a block of papers at a time as a sparse product
+  through the inverted index (term -> papers), so only pairs sharing a term are touched
+  and no block holds more than BLOCK_CELLS scores; the k best of each row are picked
+  with argpartition
+* assets/related.json holds the title, DOI and year of every paper (in list.csv order)
+  and, per paper, the indices and scores (0-100) of its k most similar papers;
+  components/list.html loads it the first time a "Related" link is opened
+
+Usage: python src/related.py [--k 5]  (also run by generate_html.py and pipeline.py)
+"""
+from datastore import write_text
+from instrument import count, traced
+from triage import TfIdf
+
+RELATED_JSON = 'assets/related.json'
+K = 5
+MIN_SCORE = 0.05          # neighbours below this cosine similarity are not listed
+BLOCK_CELLS = 4_000_000   # dense scores (block rows x papers) computed at once
+
+
+def paper_texts(titles, abstracts) -> list:
+  return ['{} {}'.format(t or '', a or '') for t, a in zip(titles, abstracts)]
+
+
+def nearest(X, k=K, min_score=MIN_SCORE, block_cells=BLOCK_CELLS) -> list:
+  """
+  The k rows most similar to each row of X (L2-normalized triage.SparseRows), as a list
+  of [(row, similarity), ...] in descending similarity; a row is never its own neighbour.
+  """
+  import numpy as np
+  n, terms = X.shape
+  if n < 2:
+    return [[] for _ in range(n)]
+  k = min(k, n - 1)
+  # the matrix by row (for the blocks) and by term (the inverted index)
+  order = np.lexsort((X.cols, X.rows))
+  rows, cols, values = X.rows[order], X.cols[order], X.values[order]
+  row_start = np.searchsorted(rows, np.arange(n + 1))
+  order = np.argsort(cols, kind='stable')
+  posting_rows, posting_values = rows[order], values[order]
+  term_start = np.searchsorted(cols[order], np.arange(terms + 1))
+  df = np.diff(term_start)
+
+  result = []
+  step = max(1, block_cells // n)
+  for first in range(0, n, step):
+    last = min(n, first + step)
+    lo, hi = row_start[first], row_start[last]
+    t, v, r = cols[lo:hi], values[lo:hi], rows[lo:hi] - first
+    # expand every entry of the block into the postings of its term
+    lengths = df[t]
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    postings = np.repeat(term_start[t], lengths) + offsets
+    scores = np.bincount(np.repeat(r, lengths) * n + posting_rows[postings],
+                         weights=np.repeat(v, lengths) * posting_values[postings],
+                         minlength=(last - first) * n).reshape(last - first, n)
+    count('related_products', len(postings))
+    scores[np.arange(last - first), np.arange(first, last)] = -1
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    ranked = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, ranked, axis=1)
+    top_scores = np.take_along_axis(top_scores, ranked, axis=1)
+    for indices, similarities in zip(top.tolist(), top_scores.tolist()):
+      result.append([(j, s) for j, s in zip(indices, similarities) if s >= min_score])
+  return result
+
+
+@traced('related.build')
+def build_related(titles, abstracts, dois, years, k=K) -> dict:
+  """
+  The related-papers index of the given columns (see RELATED_JSON).
+  """
+  texts = paper_texts(titles, abstracts)
+  X = TfIdf(min_df=2).fit(texts).transform(texts)
+  neighbours = nearest(X, k)
+  print('[related] {} papers, {} terms, {} related pairs (k={})'.format(
+    len(texts), X.shape[1], sum(len(n) for n in neighbours), k))
+  return {'k': k,
+          'papers': [[t, d, y] for t, d, y in zip(titles, dois, years)],
+          # flat [index, score, index, score, ...] per paper keeps the file small
+          'related': [[x for j, s in n for x in (j, round(100 * s))] for n in neighbours]}
+
+
+def write_related(corpus, filename=RELATED_JSON, k=K) -> bool:
+  """
+  Write the related-papers index of a papers.PaperCorpus unless it is unchanged.
+  """
+  import json
+  related = build_related(corpus.column('title'), corpus.column('abstract'), corpus.column('doi'),
+                          corpus.column('year'), k)
+  return write_text(filename, json.dumps(related, ensure_ascii=False, separators=(',', ':')))
+
+
+if __name__ == '__main__':
+  import argparse
+  from papers import PaperCorpus
+  parser = argparse.ArgumentParser(description='Compute the related papers of the paper list.')
+  parser.add_argument('--k', type=int, default=K, help='related papers per paper')
+  parser.add_argument('--source', default='data/list.csv')
+  args = parser.parse_args()
+  write_related(PaperCorpus.from_csv(args.source), k=args.k)
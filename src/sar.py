@@ -0,0 +1,159 @@
+"""
+Command line entry point for the repository scripts.
+* search       search DBLP (or the local DBLP dump store) for candidate papers and write
+               them to data/add.csv
+* triage       score the candidates in data/add.csv by relevance and sort them
+* dblp-import  stream the DBLP XML dump into the local store used by `search --offline`
+* enrich       fill missing paper metadata and affiliations from Crossref and OpenAlex
+* scholars     update data/scholar.csv from the paper list (offline)
+* merges       record, list or clear author-merge decisions (merge_decisions.py)
+* coauthor     build the co-author network preview and name mapping
+* build        coauthor, then generate the HTML pages and assets, in one process (pipeline.py)
+* watch        build, then rebuild the affected pages whenever a data file or template changes
+* serve        copy the site to dist/ with fingerprinted, pre-compressed assets and serve it
+               (serve.py)
+
+Modules are imported inside the subcommand that needs them, so e.g. `scholars` never loads
+the HTTP stack and `--help` does not load pandas or BeautifulSoup.
+
+Usage: python src/sar.py build [--db data/sar.sqlite]
+"""
+import argparse
+
+DEFAULT_KEYWORDS = ['software aging', 'software rejuvenation']
+
+
+def open_db(args):
+  if not args.db:
+    return None
+  from database import Database
+  return Database(args.db)
+
+
+def search(args):
+  from librarian import Librarian
+  store = None
+  if args.offline:
+    from dblp_dump import DBLPStore
+    store = DBLPStore(args.dblp_store)
+  Librarian(open_db(args), store).search_new_papers(keywords=args.keywords, year=args.year, output_file=args.output)
+
+
+def triage(args):
+  from triage import evaluate, triage_file
+  if args.evaluate:
+    evaluate()
+  else:
+    triage_file(args.filename)
+
+
+def dblp_import(args):
+  from dblp_dump import DBLPStore
+  DBLPStore(args.dblp_store).ingest(args.dump)
+
+
+def enrich(args):
+  from enrich import SOURCES, EnrichmentClient, Enricher, ResponseCache
+  client = EnrichmentClient(mailto=args.mailto, cache=ResponseCache())
+  Enricher(client, tuple(args.source or SOURCES)).run(write=not args.dry_run, refresh=args.refresh)
+
+
+def scholars(args):
+  from librarian import Librarian
+  Librarian(open_db(args)).update_scholar()
+
+
+def merges(args):
+  from merge_decisions import main
+  main(args.arguments)
+
+
+def coauthor(args):
+  from generate_coauthor_preview import build_preview
+  build_preview()
+
+
+def build(args):
+  from pipeline import Pipeline
+  Pipeline(open_db(args), args.shard_list).run(coauthor=not args.skip_coauthor)
+
+
+def watch(args):
+  from watch import watch
+  try:
+    watch(args.poll, args.debounce)
+  except KeyboardInterrupt:
+    pass
+
+
+def serve(args):
+  from serve import main
+  try:
+    main(args.build, args.port, args.bind)
+  except KeyboardInterrupt:
+    pass
+
+
+def make_parser() -> argparse.ArgumentParser:
+  from generate_html import shard_option
+  parser = argparse.ArgumentParser(prog='sar', description='Maintain the SAR data files and build the website.')
+  parser.add_argument('--db', help='query this SQLite store (see database.py) instead of the CSV files')
+  commands = parser.add_subparsers(dest='command', required=True)
+
+  p = commands.add_parser('search', help='search DBLP for new candidate papers')
+  p.add_argument('--keywords', nargs='+', default=DEFAULT_KEYWORDS)
+  p.add_argument('--year', type=int, help='only papers published after this year')
+  p.add_argument('--output', default='data/add.csv')
+  p.add_argument('--offline', action='store_true', help='search the local DBLP dump store instead of the API')
+  p.add_argument('--dblp-store', default='data/dblp.sqlite')
+  p.set_defaults(func=search)
+
+  p = commands.add_parser('triage', help='score and sort candidate papers by relevance')
+  p.add_argument('filename', nargs='?', default='data/add.csv')
+  p.add_argument('--evaluate', action='store_true', help='print the cross-validated accuracy instead')
+  p.set_defaults(func=triage)
+
+  p = commands.add_parser('dblp-import', help='stream dblp.xml(.gz) into the local DBLP store')
+  p.add_argument('dump', help='path of dblp.xml or dblp.xml.gz (https://dblp.org/xml/)')
+  p.add_argument('--dblp-store', default='data/dblp.sqlite')
+  p.set_defaults(func=dblp_import)
+
+  p = commands.add_parser('enrich', help='fill missing metadata and affiliations from Crossref and OpenAlex')
+  p.add_argument('--mailto', help='contact address for the APIs (default: $SAR_MAILTO)')
+  p.add_argument('--source', choices=['crossref', 'openalex'], action='append', help='query only this source')
+  p.add_argument('--refresh', action='store_true', help='ignore cached responses')
+  p.add_argument('--dry-run', action='store_true', help='report the changes without writing the files')
+  p.set_defaults(func=enrich)
+
+  p = commands.add_parser('scholars', help='update data/scholar.csv from the paper list')
+  p.set_defaults(func=scholars)
+
+  p = commands.add_parser('merges', help='record, list or clear author-merge decisions',
+                          description='Arguments are passed to merge_decisions.py; see its --help.')
+  p.add_argument('arguments', nargs=argparse.REMAINDER, help='accept|reject|pin NAME OTHER, list, forget-heuristic')
+  p.set_defaults(func=merges)
+
+  p = commands.add_parser('coauthor', help='build the co-author network preview')
+  p.set_defaults(func=coauthor)
+
+  p = commands.add_parser('build', help='build the co-author preview and all pages')
+  p.add_argument('--skip-coauthor', action='store_true', help='keep the current co-author preview')
+  p.add_argument('--shard-list', metavar='year|N', type=shard_option, help='split the paper list by year or into shards of N papers')
+  p.set_defaults(func=build)
+
+  p = commands.add_parser('watch', help='rebuild the affected pages when data files or templates change')
+  p.add_argument('--poll', action='store_true', help='poll modification times instead of using inotify')
+  p.add_argument('--debounce', type=float, default=0.3, help='seconds of quiet before a rebuild')
+  p.set_defaults(func=watch)
+
+  p = commands.add_parser('serve', help='serve the site from dist/ with compression and cache headers')
+  p.add_argument('--build', action='store_true', help='rebuild dist/ even if it exists')
+  p.add_argument('--port', type=int, default=8000)
+  p.add_argument('--bind', default='127.0.0.1')
+  p.set_defaults(func=serve)
+  return parser
+
+
+if __name__ == '__main__':
+  args = make_parser().parse_args()
+  args.func(args)
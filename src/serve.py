@@ -0,0 +1,273 @@
+"""
+Build a deployable copy of the generated site in dist/ and serve it locally.
+* index.html, the generated pages in components/ (with the shards of a sharded paper
+  list) and assets/ are copied to dist/
+* Stylesheets and scripts referenced by the pages get content-hashed file names
+  (e.g. assets/css/plugins.min.3f2a9c1e0b.css) and the references are rewritten;
+  dist/asset-manifest.json maps the original to the fingerprinted names
+* Text files are pre-compressed next to the original (.gz, and .br when the optional
+  brotli module is installed), so the server does no compression work per request
+* The server picks the best pre-compressed variant for Accept-Encoding, sends a strong
+  ETag and answers If-None-Match with 304; fingerprinted files are cached as immutable,
+  everything else is revalidated on every load
+* The bytes a browser transfers for each page (HTML plus its stylesheets and scripts) are
+  printed raw and compressed after the build
+
+Usage: python src/serve.py [--build] [--port 8000]  (or: python src/sar.py serve)
+"""
+import functools
+import gzip
+import hashlib
+import http.server
+import json
+import os
+import re
+import shutil
+from glob import glob
+
+DIST = 'dist'
+MANIFEST = 'asset-manifest.json'
+PAGES = ['index.html', 'components/list.html', 'components/coauthor.html', 'components/author.html']
+# directories of page fragments loaded by the pages (the shards of a sharded paper list)
+FRAGMENTS = ['components/list']
+COMPRESSED = ['.html', '.css', '.js', '.json', '.svg', '.txt', '.xml', '.csv', '.ttf', '.eot', '.otf', '.ico']
+# local stylesheet and script references in src/href attributes
+ASSET_REF = re.compile(r'\b(src|href)="([^":?#]+\.(?:css|js))"')
+FINGERPRINTED = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+# content codings in order of preference, with the suffix of the pre-compressed file
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')] if brotli else [('gzip', '.gz')]
+
+
+def digest(filename, length=10) -> str:
+  with open(filename, 'rb') as f:
+    return hashlib.sha256(f.read()).hexdigest()[:length]
+
+
+def fingerprint(out, path, manifest) -> str:
+  """
+  Copy out/path to a content-hashed name next to it (once per asset) and return the
+  new path relative to out.
+  """
+  if path not in manifest:
+    stem, ext = os.path.splitext(path)
+    hashed = '{}.{}{}'.format(stem, digest(os.path.join(out, path)), ext)
+    shutil.copyfile(os.path.join(out, path), os.path.join(out, hashed))
+    manifest[path] = hashed
+  return manifest[path]
+
+
+def rewrite_page(out, page, manifest) -> list:
+  """
+  Point the stylesheet and script references of out/page to fingerprinted copies.
+  Return the referenced assets (paths relative to out) in order.
+  """
+  filename = os.path.join(out, page)
+  base = os.path.dirname(page)
+  with open(filename, encoding='utf-8') as f:
+    html = f.read()
+  assets = []
+
+  def replace(match):
+    path = os.path.normpath(os.path.join(base, match.group(2))).replace(os.sep, '/')
+    if not os.path.isfile(os.path.join(out, path)):
+      return match.group(0)
+    hashed = fingerprint(out, path, manifest)
+    assets.append(hashed)
+    return '{}="{}"'.format(match.group(1), os.path.relpath(hashed, base or '.').replace(os.sep, '/'))
+
+  html = ASSET_REF.sub(replace, html)
+  with open(filename, 'w', encoding='utf-8') as f:
+    f.write(html)
+  return assets
+
+
+def compress(filename) -> dict:
+  """
+  Write the pre-compressed variants of a file, keeping only those smaller than the
+  original. Return the size of every variant, keyed by content coding ('' is identity).
+  """
+  with open(filename, 'rb') as f:
+    data = f.read()
+  sizes = {'': len(data)}
+  for encoding, suffix in ENCODINGS:
+    if encoding == 'br':
+      packed = brotli.compress(data, quality=11)
+    else:
+      # mtime=0 keeps the output identical between builds
+      packed = gzip.compress(data, 9, mtime=0)
+    if len(packed) < len(data):
+      with open(filename + suffix, 'wb') as f:
+        f.write(packed)
+      sizes[encoding] = len(packed)
+  return sizes
+
+
+def build_dist(out=DIST) -> dict:
+  """
+  Copy the generated site to out, fingerprint and pre-compress it.
+  Return the size of every file in out by content coding.
+  """
+  if os.path.isdir(out):
+    shutil.rmtree(out)
+  shutil.copytree('assets', os.path.join(out, 'assets'))
+  pages = [page for page in PAGES if os.path.isfile(page)]
+  for page in pages:
+    os.makedirs(os.path.join(out, os.path.dirname(page)), exist_ok=True)
+    shutil.copyfile(page, os.path.join(out, page))
+  for directory in FRAGMENTS:
+    if os.path.isdir(directory):
+      shutil.copytree(directory, os.path.join(out, directory))
+
+  manifest = {}
+  references = {page: rewrite_page(out, page, manifest) for page in pages}
+  with open(os.path.join(out, MANIFEST), 'w', encoding='utf-8') as f:
+    json.dump(manifest, f, indent=1, sort_keys=True)
+
+  sizes = {}
+  for filename in sorted(glob(os.path.join(out, '**', '*'), recursive=True)):
+    if os.path.isfile(filename):
+      path = os.path.relpath(filename, out).replace(os.sep, '/')
+      if os.path.splitext(path)[1].lower() in COMPRESSED:
+        sizes[path] = compress(filename)
+      else:
+        sizes[path] = {'': os.path.getsize(filename)}
+  print('[serve] built {}: {} pages, {} fingerprinted assets, {} files'.format(
+    out, len(pages), len(manifest), len(sizes)))
+  report(references, sizes)
+  return sizes
+
+
+def report(references, sizes) -> None:
+  """
+  Print the bytes transferred for each page with an empty cache: the HTML and its
+  stylesheets and scripts, uncompressed and with each pre-compressed coding.
+  """
+  encodings = [''] + [encoding for encoding, _ in ENCODINGS]
+  print('[serve] bytes per page load (HTML, stylesheets and scripts):')
+  print('  {:<28}'.format('page') + ''.join('{:>12}'.format(e or 'identity') for e in encodings))
+  for page, assets in references.items():
+    files = [page] + sorted(set(assets))
+    totals = [sum(sizes[f].get(e, sizes[f]['']) for f in files) for e in encodings]
+    print('  {:<28}'.format(page) + ''.join('{:>12,}'.format(t) for t in totals))
+  totals = [sum(s.get(e, s['']) for s in sizes.values()) for e in encodings]
+  print('  {:<28}'.format('all files') + ''.join('{:>12,}'.format(t) for t in totals))
+
+
+def accepted(header) -> set:
+  """
+  Content codings accepted by an Accept-Encoding header (q=0 excludes a coding).
+  """
+  codings = set()
+  for item in (header or '').split(','):
+    name, _, params = item.strip().partition(';')
+    q = params.strip()
+    if q.startswith('q='):
+      try:
+        if float(q[2:]) == 0:
+          continue
+      except ValueError:
+        continue
+    if name:
+      codings.add(name.strip().lower())
+  return codings
+
+
+class AssetHandler(http.server.SimpleHTTPRequestHandler):
+  """
+  Static file handler that serves pre-compressed variants, ETags and cache headers.
+  """
+  etags = {}  # (filename, mtime_ns, size) -> ETag
+
+  def etag(self, filename, st) -> str:
+    key = (filename, st.st_mtime_ns, st.st_size)
+    if key not in self.etags:
+      self.etags[key] = '"{}"'.format(digest(filename, 16))
+    return self.etags[key]
+
+  def variant(self, path, st):
+    """
+    Return (content coding, filename) of the best pre-compressed variant of path that
+    the client accepts and that is not older than path.
+    """
+    codings = accepted(self.headers.get('Accept-Encoding'))
+    for encoding, suffix in ENCODINGS:
+      if encoding in codings or '*' in codings:
+        try:
+          if os.stat(path + suffix).st_mtime_ns >= st.st_mtime_ns:
+            return encoding, path + suffix
+        except FileNotFoundError:
+          pass
+    return None, path
+
+  def send_head(self):
+    path = self.translate_path(self.path)
+    if os.path.isdir(path) and self.path.split('?')[0].endswith('/'):
+      path = os.path.join(path, 'index.html')
+    if not os.path.isfile(path):
+      return super().send_head()
+    st = os.stat(path)
+    encoding, filename = self.variant(path, st)
+    if encoding:
+      st = os.stat(filename)
+    etag = self.etag(filename, st)
+    compressible = os.path.splitext(path)[1].lower() in COMPRESSED
+
+    if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+      self.send_response(304)
+      self.send_cache_headers(path, etag, compressible)
+      self.end_headers()
+      return None
+    f = open(filename, 'rb')
+    self.send_response(200)
+    self.send_header('Content-Type', self.guess_type(path))
+    self.send_header('Content-Length', str(st.st_size))
+    if encoding:
+      self.send_header('Content-Encoding', encoding)
+    self.send_header('Last-Modified', self.date_time_string(st.st_mtime))
+    self.send_cache_headers(path, etag, compressible)
+    self.end_headers()
+    return f
+
+  def send_cache_headers(self, path, etag, compressible) -> None:
+    self.send_header('ETag', etag)
+    self.send_header('Cache-Control', IMMUTABLE if FINGERPRINTED.search(path) else 'no-cache')
+    if compressible:
+      self.send_header('Vary', 'Accept-Encoding')
+
+
+def serve(directory=DIST, port=8000, bind='127.0.0.1') -> None:
+  handler = functools.partial(AssetHandler, directory=directory)
+  with http.server.ThreadingHTTPServer((bind, port), handler) as server:
+    print('[serve] serving {} at http://{}:{}/ (brotli {}); press Ctrl+C to stop'.format(
+      directory, bind, port, 'on' if brotli else 'not installed, gzip only'))
+    server.serve_forever()
+
+
+def main(build=False, port=8000, bind='127.0.0.1', directory=DIST) -> None:
+  if build or not os.path.isfile(os.path.join(directory, MANIFEST)):
+    build_dist(directory)
+  serve(directory, port, bind)
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Build dist/ with fingerprinted, pre-compressed assets and serve it.')
+  parser.add_argument('--build', action='store_true', help='rebuild dist/ even if it exists')
+  parser.add_argument('--build-only', action='store_true', help='build dist/ and exit')
+  parser.add_argument('--port', type=int, default=8000)
+  parser.add_argument('--bind', default='127.0.0.1')
+  args = parser.parse_args()
+  try:
+    if args.build_only:
+      build_dist()
+    else:
+      main(args.build, args.port, args.bind)
+  except KeyboardInterrupt:
+    pass
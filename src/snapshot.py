@@ -0,0 +1,248 @@
+"""
+Versioned snapshots of the paper list.
+* Every paper is identified by its DOI, or by its normalized title if it has none, and
+  fingerprinted by a hash of all its list.csv fields
+* A snapshot stores the fingerprint of every paper, but only the rows that are new or
+  changed since the previous snapshot (plus the keys of removed papers); the first
+  snapshot holds all rows. Snapshots are gzipped JSON files in data/snapshots/
+* Two snapshots (or a snapshot and a CSV file) are compared in one pass over their
+  fingerprint tables, without loading rows; rows are only rebuilt to show field changes
+* new_since_last() tells which papers were added since the latest snapshot; the paper
+  list marks them and can be filtered to them
+
+Usage: python src/snapshot.py create [--name 20250101] [--source data/list.csv]
+       python src/snapshot.py import data/archive/20241020_list.csv --name 20241020
+       python src/snapshot.py diff [OLD] [NEW] [--fields]
+       python src/snapshot.py list
+"""
+import gzip
+import hashlib
+import json
+import os
+from datetime import date
+from glob import glob
+from datastore import atomic_write
+from importers import LIST_FIELDS, iter_rows
+from instrument import traced
+from papers import normalize_title
+
+SNAPSHOT_DIR = 'data/snapshots'
+LIST_FILE = 'data/list.csv'
+
+
+def row_key(row) -> str:
+  doi = (row.get('doi') or '').strip().lower()
+  return 'doi:' + doi if doi else 'title:' + normalize_title(row.get('title'))
+
+
+def fingerprint(row) -> str:
+  values = [' '.join(str(row.get(f) or '').split()) for f in LIST_FIELDS]
+  return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()[:16]
+
+
+def keyed_rows(rows) -> dict:
+  """
+  Rows by key; repeated keys (e.g. a DOI listed twice) get a #2, #3, ... suffix.
+  """
+  keyed = {}
+  for row in rows:
+    key = base = row_key(row)
+    n = 1
+    while key in keyed:
+      n += 1
+      key = '{}#{}'.format(base, n)
+    keyed[key] = row
+  return keyed
+
+
+class Snapshot:
+  def __init__(self, name, parent=None, fingerprints=None, rows=None, removed=None, created=None):
+    self.name = name
+    self.parent = parent              # name of the previous snapshot
+    self.fingerprints = fingerprints or {}   # key -> fingerprint of every paper
+    self.rows = rows or {}            # key -> field values (LIST_FIELDS order) of new/changed papers
+    self.removed = removed or []      # keys removed since the parent
+    self.created = created or date.today().isoformat()
+
+  def to_json(self) -> dict:
+    return {'name': self.name, 'parent': self.parent, 'created': self.created, 'fields': LIST_FIELDS,
+            'fingerprints': self.fingerprints, 'rows': self.rows, 'removed': self.removed}
+
+  @classmethod
+  def from_json(cls, data) -> 'Snapshot':
+    fields = data.get('fields', LIST_FIELDS)
+    # rows are stored in the field order of their snapshot
+    rows = {k: [dict(zip(fields, v)).get(f, '') for f in LIST_FIELDS] for k, v in data['rows'].items()}
+    return cls(data['name'], data.get('parent'), data['fingerprints'], rows, data.get('removed'), data.get('created'))
+
+
+class SnapshotStore:
+  def __init__(self, directory=SNAPSHOT_DIR):
+    self.directory = directory
+    self.cache = {}
+
+  def path(self, name) -> str:
+    return os.path.join(self.directory, name + '.json.gz')
+
+  def names(self) -> list:
+    """
+    Snapshot names in chronological order (names start with a YYYYMMDD date).
+    """
+    return sorted(os.path.basename(p)[:-len('.json.gz')] for p in glob(self.path('*')))
+
+  def latest(self):
+    names = self.names()
+    return self.load(names[-1]) if names else None
+
+  def load(self, name) -> Snapshot:
+    if name not in self.cache:
+      with gzip.open(self.path(name), 'rt', encoding='utf-8') as file:
+        self.cache[name] = Snapshot.from_json(json.load(file))
+    return self.cache[name]
+
+  @traced('snapshot.create')
+  def create(self, rows, name=None) -> Snapshot:
+    """
+    Store rows (list.csv dicts) as a new snapshot holding only the rows that differ from
+    the latest snapshot.
+    """
+    name = name or date.today().strftime('%Y%m%d')
+    if name in self.names():
+      raise ValueError('snapshot "{}" already exists'.format(name))
+    parent = self.latest()
+    keyed = keyed_rows(rows)
+    fingerprints = {k: fingerprint(r) for k, r in keyed.items()}
+    old = parent.fingerprints if parent else {}
+    snapshot = Snapshot(name, parent.name if parent else None, fingerprints,
+                        {k: [keyed[k].get(f) or '' for f in LIST_FIELDS] for k, fp in fingerprints.items()
+                         if old.get(k) != fp},
+                        [k for k in old if k not in fingerprints])
+    text = json.dumps(snapshot.to_json(), ensure_ascii=False, separators=(',', ':'))
+    # mtime=0 keeps the file identical for identical content
+    atomic_write(self.path(name), gzip.compress(text.encode('utf-8'), mtime=0))
+    self.cache[name] = snapshot
+    print('[snapshot] created "{}": {} papers, {} rows stored, {} removed (parent: {})'.format(
+      name, len(fingerprints), len(snapshot.rows), len(snapshot.removed), snapshot.parent))
+    return snapshot
+
+  def rows(self, name) -> dict:
+    """
+    Rebuild the full rows (key -> dict) of a snapshot from its chain of deltas.
+    """
+    chain = []
+    snapshot = self.load(name)
+    while True:
+      chain.append(snapshot)
+      if snapshot.parent is None:
+        break
+      snapshot = self.load(snapshot.parent)
+    rows = {}
+    for snapshot in reversed(chain):
+      for key in snapshot.removed:
+        rows.pop(key, None)
+      rows.update(snapshot.rows)
+    last = chain[0]
+    return {k: dict(zip(LIST_FIELDS, rows[k])) for k in last.fingerprints}
+
+
+def diff(old, new) -> dict:
+  """
+  Added, removed and modified keys between two fingerprint tables.
+  """
+  changes = {'added': [], 'removed': [], 'modified': []}
+  for key, fp in new.items():
+    previous = old.get(key)
+    if previous is None:
+      changes['added'].append(key)
+    elif previous != fp:
+      changes['modified'].append(key)
+  changes['removed'] = [key for key in old if key not in new]
+  return changes
+
+
+def field_changes(old_row, new_row) -> dict:
+  return {f: (old_row.get(f, ''), new_row.get(f, '')) for f in LIST_FIELDS
+          if ' '.join(str(old_row.get(f) or '').split()) != ' '.join(str(new_row.get(f) or '').split())}
+
+
+class Source:
+  """
+  Fingerprints and rows of a snapshot name or of a CSV file (any importers.py format).
+  """
+  def __init__(self, store, name):
+    self.name = name
+    if os.path.exists(name):
+      self._rows = keyed_rows(iter_rows(name))
+      self.fingerprints = {k: fingerprint(r) for k, r in self._rows.items()}
+    else:
+      self._rows = None
+      self.store = store
+      self.fingerprints = store.load(name).fingerprints
+
+  def rows(self) -> dict:
+    if self._rows is None:
+      self._rows = self.store.rows(self.name)
+    return self._rows
+
+
+def new_since_last(rows, store=None) -> tuple:
+  """
+  The latest snapshot and, for each of the given rows in order, whether its paper was
+  added since that snapshot. (None, []) if there are no snapshots.
+  """
+  latest = (store or SnapshotStore()).latest()
+  if latest is None:
+    return None, []
+  return latest, [k not in latest.fingerprints for k in keyed_rows(rows)]
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Snapshot the paper list and compare snapshots.')
+  parser.add_argument('--dir', default=SNAPSHOT_DIR)
+  commands = parser.add_subparsers(dest='command', required=True)
+  p = commands.add_parser('create', help='snapshot the current paper list')
+  p.add_argument('--name', help='snapshot name (default: today as YYYYMMDD)')
+  p.add_argument('--source', default=LIST_FILE)
+  p = commands.add_parser('import', help='snapshot an archived full copy of the list')
+  p.add_argument('source')
+  p.add_argument('--name', required=True)
+  p = commands.add_parser('diff', help='compare two snapshots or CSV files')
+  p.add_argument('old', nargs='?', help='default: the latest snapshot')
+  p.add_argument('new', nargs='?', default=LIST_FILE)
+  p.add_argument('--fields', action='store_true', help='show the changed fields of modified papers')
+  commands.add_parser('list', help='list the snapshots')
+  args = parser.parse_args()
+
+  store = SnapshotStore(args.dir)
+  if args.command in ('create', 'import'):
+    store.create(iter_rows(args.source), args.name)
+  elif args.command == 'list':
+    for name in store.names():
+      s = store.load(name)
+      print('{}  {}  {} papers, {} rows stored, {} removed'.format(
+        s.name, s.created, len(s.fingerprints), len(s.rows), len(s.removed)))
+  else:
+    old_name = args.old or (store.names() or [None])[-1]
+    if old_name is None:
+      parser.error('no snapshots in "{}"'.format(args.dir))
+    old, new = Source(store, old_name), Source(store, args.new)
+    changes = diff(old.fingerprints, new.fingerprints)
+    print('[snapshot] {} -> {}: {} added, {} removed, {} modified'.format(
+      old.name, new.name, len(changes['added']), len(changes['removed']), len(changes['modified'])))
+    if changes['added']:
+      new_rows = new.rows()
+      for key in changes['added']:
+        print('  + {}  {}'.format(key, new_rows[key]['title']))
+    if changes['removed']:
+      old_rows = old.rows()
+      for key in changes['removed']:
+        print('  - {}  {}'.format(key, old_rows[key]['title']))
+    if changes['modified']:
+      old_rows, new_rows = old.rows(), new.rows()
+      for key in changes['modified']:
+        fields = field_changes(old_rows[key], new_rows[key])
+        print('  ~ {}  ({})'.format(key, ', '.join(fields)))
+        if args.fields:
+          for field, (before, after) in fields.items():
+            print('      {}: {!r} -> {!r}'.format(field, before[:80], after[:80]))
@@ -0,0 +1,201 @@
+"""
+Seeded generator of synthetic corpora in the data/list.csv and data/scholar.csv schema,
+used by benchmark.py to measure the build pipeline at sizes well above the real list.
+* Authors are drawn from a pool of generated people with a skewed productivity
+  distribution and stable research groups, so co-authorships repeat like in the real data
+* Each person is written in several name variants ("Given M. Surname", "Surname, G." ...)
+  so the name clustering and scholar dedupe have realistic work to do
+* Venues, tags and system types are sampled (with their frequencies) from the real
+  data/list.csv when it is available, and titles and abstracts from its vocabulary
+
+Usage: python src/synthetic.py 10000 /tmp/sar-10k [--seed 0]
+"""
+import csv
+import os
+import random
+from collections import Counter
+from database import SCHOLAR_FIELDS
+from datastore import atomic_write, render_csv
+from importers import LIST_FIELDS, open_text
+
+LIST_FILE = 'data/list.csv'
+
+GIVEN_NAMES = ['Alberto', 'Ana', 'Bo', 'Carlos', 'Chen', 'Daniel', 'Domenico', 'Elena', 'Ermeson',
+               'Fumio', 'Hao', 'Hiroyuki', 'Ivan', 'Javier', 'Jing', 'Jun', 'Kishor', 'Lei', 'Li',
+               'Lin', 'Luca', 'Maria', 'Marco', 'Michael', 'Min', 'Paulo', 'Qing', 'Rafael', 'Roberto',
+               'Sergio', 'Stefano', 'Tadashi', 'Wei', 'Xiaobai', 'Yan', 'Yoshinobu', 'Yu', 'Zhen']
+SURNAME_SYLLABLES = ['al', 'an', 'ba', 'chen', 'co', 'da', 'do', 'fer', 'ga', 'hi', 'ka', 'li', 'lo',
+                     'ma', 'mo', 'na', 'ni', 'ok', 'pa', 'ra', 'ro', 'sa', 'si', 'ta', 'to', 'va', 'wa',
+                     'xu', 'ya', 'zhi', 'zo']
+
+# used when no real list.csv is available
+FALLBACK_VOCAB = {
+  'venues': [('inproceedings', 'ISSRE', 'International Symposium on Software Reliability Engineering'),
+             ('journal', 'TR', 'IEEE Transactions on Reliability'),
+             ('journal', 'JSS', 'Journal of Systems and Software')],
+  'repo_analysis_tags': ['model-based', 'measurement-based', 'hybrid', 'rej', 'arb prediction', 'testing'],
+  'system_type_tag': ['Linux', 'Android', 'Docker', 'VMM'],
+  'words': ['software', 'aging', 'rejuvenation', 'memory', 'leak', 'analysis', 'model', 'cloud',
+            'system', 'availability', 'performance', 'degradation', 'prediction', 'time', 'series'],
+}
+
+
+def load_vocab(filename=LIST_FILE) -> dict:
+  """
+  Weighted vocabularies from a real paper list: (type, venue tag, booktitle) triples, analysis
+  tags, system types and the words of titles and abstracts. Values keep their multiplicity,
+  so sampling uniformly from a list follows the real frequencies.
+  """
+  if not os.path.exists(filename):
+    return FALLBACK_VOCAB
+  with open_text(filename) as file:
+    rows = list(csv.DictReader(file))
+  words = []
+  for r in rows:
+    words.extend(w.strip('.,:;()"').lower() for w in (r.get('title', '') + ' ' + r.get('abstract', '')).split())
+  return {
+    'venues': [(r.get('type', ''), r.get('repo_venue_tags', ''), r.get('booktitle', '')) for r in rows],
+    'repo_analysis_tags': [r.get('repo_analysis_tags', '') for r in rows],
+    'system_type_tag': [r.get('system_type_tag', '') for r in rows],
+    'words': [w for w in words if w.isalpha()] or FALLBACK_VOCAB['words'],
+  }
+
+
+def name_variants(given, middle, surname) -> list:
+  """
+  Spellings of one person as they occur in paper metadata, the full form first.
+  """
+  return ['{} {}. {}'.format(given, middle, surname), '{} {}'.format(given, surname),
+          '{}. {}. {}'.format(given[0], middle, surname), '{}, {}'.format(surname, given),
+          '{}, {}.'.format(surname, given[0])]
+
+
+class SyntheticCorpus:
+  def __init__(self, size, seed=0, vocab=None):
+    """
+    :param size: number of papers
+    :param seed: random seed; the same size and seed always give the same corpus
+    :param vocab: vocabularies as returned by load_vocab()
+    """
+    self.size = size
+    self.rng = random.Random(seed)
+    self.vocab = load_vocab() if vocab is None else vocab
+    self.people = self.make_people(max(10, int(size * 1.6)))
+    # productivity follows a power law: person k writes ~ 1 / (k + 1) ** 0.8 of the papers
+    self.cum_weights = []
+    total = 0.0
+    for k in range(len(self.people)):
+      total += 1.0 / (k + 1) ** 0.8
+      self.cum_weights.append(total)
+
+  def make_people(self, count) -> list:
+    people, seen = [], set()
+    while len(people) < count:
+      surname = ''.join(self.rng.choice(SURNAME_SYLLABLES) for _ in range(self.rng.randint(1, 3))).capitalize()
+      given = self.rng.choice(GIVEN_NAMES)
+      middle = chr(ord('A') + self.rng.randrange(26))
+      if (given, middle, surname) in seen:
+        continue
+      seen.add((given, middle, surname))
+      people.append(name_variants(given, middle, surname))
+    return people
+
+  def spelling(self, person) -> str:
+    # the full form in most papers, an abbreviated or inverted variant otherwise
+    variants = self.people[person]
+    return variants[0] if self.rng.random() < 0.7 else self.rng.choice(variants[1:])
+
+  def authors(self) -> list:
+    """
+    A lead author drawn by productivity and co-authors mostly from the lead's group
+    (the 20 neighbouring people in the pool).
+    """
+    lead = self.rng.choices(range(len(self.people)), cum_weights=self.cum_weights)[0]
+    authors = [lead]
+    for _ in range(min(8, max(0, int(self.rng.expovariate(1 / 2.5))))):
+      if self.rng.random() < 0.8:
+        other = min(len(self.people) - 1, max(0, lead + self.rng.randint(-10, 10)))
+      else:
+        other = self.rng.randrange(len(self.people))
+      if other not in authors:
+        authors.append(other)
+    return authors
+
+  def sentence(self, low, high) -> str:
+    return ' '.join(self.rng.choice(self.vocab['words']) for _ in range(self.rng.randint(low, high)))
+
+  def paper(self, i) -> dict:
+    rng = self.rng
+    year = rng.randint(1995, 2025)
+    type_, venue_tag, booktitle = rng.choice(self.vocab['venues'])
+    first_page = rng.randint(1, 2000)
+    title = self.sentence(5, 12).capitalize()
+    abstract = '. '.join(self.sentence(12, 25).capitalize() for _ in range(rng.randint(3, 8))) + '.'
+    return {
+      'doi': '10.5555/synthetic.{}.{}'.format(year, i),
+      'title': title,
+      'type': type_,
+      'year': str(year),
+      'author': '; '.join(self.spelling(a) for a in self.authors()),
+      'booktitle': booktitle,
+      'pages': '{}-{}'.format(first_page, first_page + rng.randint(4, 20)),
+      'issue': str(rng.randint(1, 12)) if type_ == 'journal' else '',
+      'volume': str(rng.randint(1, 80)) if type_ == 'journal' else '',
+      'publisher': 'Institute of Electrical and Electronics Engineers (IEEE)',
+      'place': '',
+      'conference': '',
+      'date': '{}-{}'.format(year, rng.randint(1, 12)),
+      'abstract': abstract if rng.random() < 0.7 else '',
+      'repo_venue_tags': venue_tag,
+      'repo_analysis_tags': rng.choice(self.vocab['repo_analysis_tags']),
+      'system_type_tag': rng.choice(self.vocab['system_type_tag']),
+    }
+
+  def papers(self) -> list:
+    return [self.paper(i) for i in range(self.size)]
+
+  def scholars(self, papers) -> list:
+    """
+    Scholar rows for about 70% of the people appearing in the papers, in the name spelling
+    of one of their papers; 10% of them are listed twice in another spelling, as in a
+    scholar list that has not been deduplicated.
+    """
+    spellings = Counter()
+    for p in papers:
+      spellings.update(a.strip() for a in p['author'].split(';'))
+    by_person = {}
+    for person, variants in enumerate(self.people):
+      found = [v for v in variants if v in spellings]
+      if found:
+        by_person[person] = found
+    names = []
+    for person, found in by_person.items():
+      if self.rng.random() < 0.7:
+        names.append(found[0])
+        if len(found) > 1 and self.rng.random() < 0.1:
+          names.append(found[-1])
+    return [{'id': str(i), 'name': n, 'institution': '', 'category': '', 'country': '', 'homepage': ''}
+            for i, n in enumerate(names, start=1)]
+
+  def write(self, directory) -> dict:
+    """
+    Write data/list.csv and data/scholar.csv below directory. Return row counts.
+    """
+    papers = self.papers()
+    scholars = self.scholars(papers)
+    atomic_write(os.path.join(directory, 'data', 'list.csv'), render_csv(LIST_FIELDS, papers))
+    atomic_write(os.path.join(directory, 'data', 'scholar.csv'), render_csv(SCHOLAR_FIELDS, scholars))
+    authors = {a.strip() for p in papers for a in p['author'].split(';')}
+    return {'papers': len(papers), 'scholars': len(scholars), 'author_names': len(authors)}
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Write a synthetic paper list and scholar list.')
+  parser.add_argument('size', type=int, help='number of papers')
+  parser.add_argument('directory', help='output directory (data/ is created below it)')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+  counts = SyntheticCorpus(args.size, args.seed).write(args.directory)
+  print('[synthetic] wrote {papers} papers ({author_names} distinct author names) and {scholars} scholars'.format(**counts),
+        'to "{}"'.format(args.directory))
@@ -0,0 +1,208 @@
+"""
+Rank the candidate papers of a DBLP search by relevance to the repository.
+* A TF-IDF representation of titles (words and word pairs) is trained on data/list.csv
+  (relevant) and data/excluded/excluded_irrelevant.txt (irrelevant)
+* A class-balanced logistic regression is fit on the sparse matrix with NumPy; the matrix
+  is kept in coordinate form, so products with it are single bincount calls
+* Candidates get a score between 0 and 1 and are written sorted by it, so reviewers work
+  through the likely relevant ones first; --evaluate prints a cross-validated accuracy
+
+Usage: python src/triage.py [data/add.csv] [--evaluate]  (or: python src/sar.py triage)
+"""
+import csv
+import html
+import math
+import re
+from collections import Counter
+from datastore import write_csv
+from importers import open_text
+from instrument import count, traced
+
+LIST_FILE = 'data/list.csv'
+IRRELEVANT_FILE = 'data/excluded/excluded_irrelevant.txt'
+CANDIDATE_FILE = 'data/add.csv'
+SCORE_FIELD = 'score'
+
+WORD = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('a an and are as at by for from in into is of on or the to via with its using based'.split())
+
+
+def tokens(text) -> list:
+  """
+  Lower-cased words (without stop words) and adjacent word pairs of a title.
+  """
+  words = [w for w in WORD.findall(str(text or '').lower()) if w not in STOPWORDS]
+  return words + [a + ' ' + b for a, b in zip(words, words[1:])]
+
+
+class SparseRows:
+  """
+  Sparse matrix in coordinate form: row, column and value of every non-zero entry.
+  """
+  def __init__(self, rows, cols, values, shape):
+    self.rows, self.cols, self.values, self.shape = rows, cols, values, shape
+
+  def dot(self, w):
+    """
+    Matrix-vector product X @ w.
+    """
+    import numpy as np
+    return np.bincount(self.rows, weights=self.values * w[self.cols], minlength=self.shape[0])
+
+  def tdot(self, r):
+    """
+    Transposed product X.T @ r.
+    """
+    import numpy as np
+    return np.bincount(self.cols, weights=self.values * r[self.rows], minlength=self.shape[1])
+
+
+class TfIdf:
+  def __init__(self, min_df=1):
+    self.min_df = min_df
+    self.vocabulary = {}
+    self.idf = None
+
+  def fit(self, texts) -> 'TfIdf':
+    import numpy as np
+    df = Counter()
+    for text in texts:
+      df.update(set(tokens(text)))
+    terms = sorted(t for t, n in df.items() if n >= self.min_df)
+    self.vocabulary = {t: i for i, t in enumerate(terms)}
+    n = len(texts)
+    # smoothed inverse document frequency
+    self.idf = np.array([math.log((1 + n) / (1 + df[t])) + 1 for t in terms])
+    return self
+
+  def transform(self, texts) -> SparseRows:
+    """
+    L2-normalized TF-IDF rows; unknown terms are ignored.
+    """
+    import numpy as np
+    rows, cols, values = [], [], []
+    for i, text in enumerate(texts):
+      tf = Counter(self.vocabulary[t] for t in tokens(text) if t in self.vocabulary)
+      rows.extend([i] * len(tf))
+      cols.extend(tf.keys())
+      values.extend(tf.values())
+    rows = np.array(rows, dtype=np.int64)
+    cols = np.array(cols, dtype=np.int64)
+    values = np.array(values, dtype=float) * self.idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(texts)))
+    values /= norms[rows]
+    return SparseRows(rows, cols, values, (len(texts), len(self.vocabulary)))
+
+
+class LogisticRegression:
+  """
+  L2-regularized logistic regression, fit by full-batch gradient descent with classes
+  weighted inversely to their frequency.
+  """
+  def __init__(self, l2=1e-3, rate=2.0, epochs=500):
+    self.l2, self.rate, self.epochs = l2, rate, epochs
+    self.w = None
+    self.b = 0.0
+
+  def fit(self, X, y) -> 'LogisticRegression':
+    import numpy as np
+    y = np.asarray(y, dtype=float)
+    positive = y.sum()
+    weight = np.where(y == 1, len(y) / (2 * positive), len(y) / (2 * (len(y) - positive)))
+    self.w = np.zeros(X.shape[1])
+    self.b = 0.0
+    for _ in range(self.epochs):
+      error = weight * (self.predict(X) - y) / len(y)
+      self.w -= self.rate * (X.tdot(error) + self.l2 * self.w)
+      self.b -= self.rate * error.sum()
+    return self
+
+  def predict(self, X):
+    import numpy as np
+    return 1 / (1 + np.exp(-(X.dot(self.w) + self.b)))
+
+
+def training_set():
+  """
+  Titles of the listed papers (label 1) and of the papers excluded as irrelevant (label 0).
+  """
+  with open_text(LIST_FILE) as file:
+    positives = [row['title'] for row in csv.DictReader(file) if row.get('title')]
+  with open(IRRELEVANT_FILE, encoding='utf-8') as file:
+    negatives = [html.unescape(line.strip()) for line in file if line.strip()]
+  return positives + negatives, [1] * len(positives) + [0] * len(negatives)
+
+
+class Triage:
+  def __init__(self):
+    self.vectorizer = None
+    self.model = None
+
+  @traced('triage.train')
+  def train(self, texts=None, labels=None) -> 'Triage':
+    if texts is None:
+      texts, labels = training_set()
+    self.vectorizer = TfIdf().fit(texts)
+    self.model = LogisticRegression().fit(self.vectorizer.transform(texts), labels)
+    print('[triage] trained on {} relevant and {} irrelevant titles ({} terms)'.format(
+      sum(labels), len(labels) - sum(labels), len(self.vectorizer.vocabulary)))
+    return self
+
+  def score(self, titles) -> list:
+    """
+    Relevance score (0..1) of each title.
+    """
+    count('triage_scored', len(titles))
+    return [float(p) for p in self.model.predict(self.vectorizer.transform(titles))]
+
+  def rank(self, papers) -> list:
+    """
+    Add a score to each paper dict and return them sorted by descending score.
+    """
+    for paper, score in zip(papers, self.score([p.get('title', '') for p in papers])):
+      paper[SCORE_FIELD] = '{:.3f}'.format(score)
+    return sorted(papers, key=lambda p: float(p[SCORE_FIELD]), reverse=True)
+
+
+def evaluate(folds=5) -> float:
+  """
+  Cross-validated accuracy of the triage model on the training set.
+  """
+  import numpy as np
+  texts, labels = training_set()
+  order = np.random.default_rng(0).permutation(len(texts))
+  correct = 0
+  for k in range(folds):
+    test = set(order[k::folds].tolist())
+    train = [i for i in range(len(texts)) if i not in test]
+    triage = Triage().train([texts[i] for i in train], [labels[i] for i in train])
+    scores = triage.score([texts[i] for i in sorted(test)])
+    correct += sum((s >= 0.5) == (labels[i] == 1) for s, i in zip(scores, sorted(test)))
+  accuracy = correct / len(texts)
+  print('[triage] {}-fold cross-validated accuracy: {:.3f}'.format(folds, accuracy))
+  return accuracy
+
+
+def triage_file(filename=CANDIDATE_FILE) -> list:
+  """
+  Score the candidates in a CSV file (e.g. data/add.csv) and rewrite it sorted by score.
+  """
+  with open_text(filename) as file:
+    reader = csv.DictReader(file)
+    fields = [f for f in reader.fieldnames if f != SCORE_FIELD]
+    papers = list(reader)
+  ranked = Triage().train().rank(papers)
+  write_csv(filename, [SCORE_FIELD] + fields, ranked)
+  return ranked
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Score and sort candidate papers by relevance.')
+  parser.add_argument('filename', nargs='?', default=CANDIDATE_FILE)
+  parser.add_argument('--evaluate', action='store_true', help='print the cross-validated accuracy instead')
+  args = parser.parse_args()
+  if args.evaluate:
+    evaluate()
+  else:
+    triage_file(args.filename)
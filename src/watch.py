@@ -0,0 +1,154 @@
+"""
+Watch the data files and templates and rebuild the site when they change.
+* data/list.csv, data/scholar.csv, data/merge_decisions.csv, the templates in pages/ and
+  components/_sidebar.html are watched with inotify (Linux, through ctypes) or, where it
+  is not available, by polling their modification times
+* Bursts of saves (e.g. an editor writing a backup and then the file) are debounced into a
+  single rebuild
+* The Pipeline stays in memory between rebuilds: only the pages that depend on the changed
+  files are regenerated, and the corpus and author clusters are reused when their input
+  did not change
+
+Usage: python src/watch.py [--poll] [--debounce 0.3]  (or: python src/sar.py watch)
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+import traceback
+from pipeline import PAGES_OF, Pipeline
+
+WATCHED = sorted(PAGES_OF)
+
+# inotify(7) event masks
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+  """
+  Watch the directories of the given files (editors often replace a file by renaming a
+  temporary file over it) and report changes of the given files only.
+  """
+  def __init__(self, files):
+    self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    self.fd = self.libc.inotify_init1(IN_NONBLOCK)
+    if self.fd < 0:
+      raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    self.files = {os.path.normpath(f) for f in files}
+    self.dirs = {}
+    for directory in sorted({os.path.dirname(f) or '.' for f in self.files}):
+      wd = self.libc.inotify_add_watch(self.fd, directory.encode(),
+                                       IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY)
+      if wd < 0:
+        raise OSError(ctypes.get_errno(), 'inotify_add_watch failed for ' + directory)
+      self.dirs[wd] = directory
+
+  def wait(self, timeout=None) -> set:
+    """
+    Block until at least one watched file changed or the timeout (seconds) expired.
+    Return the changed files.
+    """
+    if not select.select([self.fd], [], [], timeout)[0]:
+      return set()
+    changed = set()
+    data = os.read(self.fd, 64 * 1024)
+    pos = 0
+    while pos < len(data):
+      wd, mask, cookie, length = EVENT.unpack_from(data, pos)
+      name = data[pos + EVENT.size:pos + EVENT.size + length].rstrip(b'\0').decode()
+      pos += EVENT.size + length
+      path = os.path.normpath(os.path.join(self.dirs.get(wd, ''), name))
+      if path in self.files:
+        changed.add(path)
+    return changed
+
+
+class PollingWatcher:
+  """
+  Fallback that compares modification time and size of the files every interval seconds.
+  """
+  def __init__(self, files, interval=0.5):
+    self.files = [os.path.normpath(f) for f in files]
+    self.interval = interval
+    self.state = {f: self.stat(f) for f in self.files}
+
+  @staticmethod
+  def stat(filename):
+    try:
+      st = os.stat(filename)
+      return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+      return None
+
+  def wait(self, timeout=None) -> set:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+      changed = set()
+      for f in self.files:
+        st = self.stat(f)
+        if st != self.state[f]:
+          self.state[f] = st
+          changed.add(f)
+      if changed or (deadline is not None and time.monotonic() >= deadline):
+        return changed
+      time.sleep(self.interval if deadline is None else max(0, min(self.interval, deadline - time.monotonic())))
+
+
+def make_watcher(files, poll=False):
+  if not poll:
+    try:
+      return InotifyWatcher(files)
+    except (OSError, AttributeError) as e:
+      print('[watch] inotify not available ({}), polling instead'.format(e))
+  return PollingWatcher(files)
+
+
+def debounced(watcher, delay):
+  """
+  Yield sets of changed files; changes less than delay seconds apart are merged.
+  """
+  while True:
+    changed = watcher.wait()
+    while changed:
+      more = watcher.wait(delay)
+      if not more:
+        break
+      changed |= more
+    if changed:
+      yield changed
+
+
+def watch(poll=False, delay=0.3) -> None:
+  # start watching before the first build, so edits made during it are not missed
+  watcher = make_watcher(WATCHED, poll)
+  pipeline = Pipeline()
+  pipeline.run()
+  print('[watch] watching {} files ({}); press Ctrl+C to stop'.format(len(WATCHED), type(watcher).__name__))
+  for changed in debounced(watcher, delay):
+    print('[watch] changed: ' + ', '.join(sorted(changed)))
+    try:
+      pipeline.update(changed)
+    except Exception:
+      # a half-edited CSV file must not end the session; the next save rebuilds again
+      traceback.print_exc()
+      print('[watch] rebuild failed, waiting for the next change')
+
+
+if __name__ == '__main__':
+  import argparse
+  parser = argparse.ArgumentParser(description='Rebuild the site when data files or templates change.')
+  parser.add_argument('--poll', action='store_true', help='poll modification times instead of using inotify')
+  parser.add_argument('--debounce', type=float, default=0.3, help='seconds of quiet before a rebuild')
+  args = parser.parse_args()
+  try:
+    watch(args.poll, args.debounce)
+  except KeyboardInterrupt:
+    pass
@@ -0,0 +1,58 @@
+import json
+import pytest
+from authors import AuthorShards
+from generate_coauthor_preview import author_lists, choose_canonical, cluster_authors
+from merge_decisions import MergeDecisions
+from papers import PaperCorpus
+
+HEADER = ['doi', 'title', 'year', 'author']
+
+
+def build(rows):
+  corpus = PaperCorpus.from_rows(HEADER, rows)
+  decisions = MergeDecisions('merge_decisions.csv', 'merge_cache.csv')
+  _, mapping = choose_canonical(cluster_authors(author_lists(corpus.column('author')), decisions), decisions)
+  shards = AuthorShards(corpus, [('Other', 'other')] * len(corpus.column('doi')), mapping)
+  return shards, shards.write(workers=1)
+
+
+def shard(name):
+  index = json.load(open('assets/authors/index.json', encoding='utf-8'))
+  cid = next(a['id'] for a in index if a['name'] == name)
+  return json.load(open('assets/authors/{}.json'.format(cid), encoding='utf-8'))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+
+
+def test_unchanged_shards_are_skipped():
+  rows = [['10.1/a', 'A', '2020', 'Xan Alpha'], ['10.1/b', 'B', '2021', 'Xan Alpha; Ynes Beta']]
+  build(rows)
+  _, result = build(rows)
+  assert result == {'written': 0, 'unchanged': 2, 'removed': 0}
+
+
+def test_renumbered_coauthor_rewrites_shard():
+  build([['10.1/a', 'A', '2020', 'Xan Alpha'], ['10.1/b', 'B', '2021', 'Xan Alpha; Ynes Beta']])
+  assert shard('Xan Alpha')['coauthors'] == [{'id': 2, 'name': 'Ynes Beta', 'count': 1}]
+  # a paper inserted between them gives Zed Gamma id 2 and Ynes Beta id 3, while the
+  # papers of Xan Alpha stay the same
+  build([['10.1/a', 'A', '2020', 'Xan Alpha'], ['10.1/z', 'Z', '2022', 'Zed Gamma'],
+         ['10.1/b', 'B', '2021', 'Xan Alpha; Ynes Beta']])
+  xan = shard('Xan Alpha')
+  assert xan['id'] == 1
+  assert xan['coauthors'] == [{'id': 3, 'name': 'Ynes Beta', 'count': 1}]
+  assert shard('Ynes Beta')['coauthors'] == [{'id': 1, 'name': 'Xan Alpha', 'count': 1}]
+
+
+def test_unchanged_merge_cache_is_not_saved(monkeypatch):
+  rows = [['10.1/a', 'A', '2020', 'Xan Alpha'], ['10.1/b', 'B', '2021', 'X. Alpha; Ynes Beta']]
+  build(rows)
+  with open('merge_cache.csv', encoding='utf-8') as file:
+    assert 'X. Alpha' in file.read()
+  saves = []
+  monkeypatch.setattr(MergeDecisions, 'save', lambda self, store=None: saves.append(self))
+  build(rows)
+  assert saves == []
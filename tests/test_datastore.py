@@ -0,0 +1,32 @@
+import pytest
+import datastore
+from datastore import DataStore, read_text
+
+
+def test_commit_failure_restores_files_and_backups(tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  (tmp_path / 'a.csv').write_text('id\n1\n', encoding='utf-8')
+  (tmp_path / 'b.csv').write_text('id\n2\n', encoding='utf-8')
+  (tmp_path / 'b.csv.bak').write_text('id\n0\n', encoding='utf-8')
+
+  atomic_write = datastore.atomic_write
+
+  def failing_write(filename, text):
+    if filename == 'c.csv':
+      raise OSError('disk full')
+    atomic_write(filename, text)
+
+  monkeypatch.setattr(datastore, 'atomic_write', failing_write)
+  store = DataStore()
+  store.stage('a.csv', ['id'], [['10']], key='id', backup=True)
+  store.stage('b.csv', ['id'], [['20']], key='id', backup=True)
+  store.stage('c.csv', ['id'], [['30']], key='id')
+  with pytest.raises(OSError):
+    store.commit()
+
+  assert read_text('a.csv') == 'id\n1\n'
+  assert read_text('b.csv') == 'id\n2\n'
+  # a backup created by the failed commit is removed, an existing one is restored
+  assert not (tmp_path / 'a.csv.bak').exists()
+  assert read_text('b.csv.bak') == 'id\n0\n'
+  assert not (tmp_path / 'c.csv').exists()
@@ -0,0 +1,72 @@
+import os
+import pytest
+from dblp_dump import DBLPStore
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'dblp.xml')
+LIST_CSV = '''doi,title,type,year,author,booktitle,repo_venue_tags
+10.1/a,A,journal,2020,X,IEEE Transactions on Dependable and Secure Computing,TDSC
+10.1/b,B,journal,2021,Y,IEEE Transactions on Dependable and Secure Computing,TDSC
+10.1/c,C,article,2019,Z,IEEE Trans. Dependable Secur. Comput.,TDSC
+10.1/d,D,inproceedings,2019,Z,ISSRE,ISSRE
+'''
+
+
+@pytest.fixture
+def store(tmp_path):
+  list_file = tmp_path / 'list.csv'
+  list_file.write_text(LIST_CSV, encoding='utf-8')
+  store = DBLPStore(str(tmp_path / 'dblp.sqlite'), list_file=str(list_file))
+  store.counts = store.ingest(FIXTURE)
+  yield store
+  store.close()
+
+
+def test_ingest_counts(store):
+  # the www record is not stored, the proceedings record only resolves crossrefs
+  assert store.counts == {'article': 2, 'inproceedings': 1, 'phdthesis': 1, 'proceedings': 1}
+  assert len(store) == 4
+
+
+def test_search(store):
+  keys = [hit['@id'] for hit in store.search('software aging')]
+  assert keys == ['journals/tdsc/MullerC21', 'phd/Smith18']   # most recent first
+  assert [hit['@id'] for hit in store.search('rejuv')] == ['journals/jss/CottaT20', 'conf/issre/GrottkeT19', 'phd/Smith18']
+  assert store.search('') == []
+
+
+def test_entities_and_markup(store):
+  hit, = store.search('android')
+  info = hit['info']
+  assert info['title'] == 'Software Aging in Android Systems: a Measurement Study.'
+  # entities resolved, homonym number dropped
+  assert info['authors'] == {'author': [{'text': 'Jürgen Müller'}, {'text': 'Wei Li'}]}
+  assert info['doi'] == '10.1109/TDSC.2021.0001'
+
+
+def test_find_title(store):
+  hits = store.find_title('Software aging in Android systems:  a measurement study')
+  assert [hit['@id'] for hit in hits] == ['journals/tdsc/MullerC21']
+  assert store.find_title('no such paper') == []
+
+
+def test_venue_names(store):
+  # curated journal names come from type article and type journal rows
+  assert store.venue_names() == {'TDSC': 'IEEE Transactions on Dependable and Secure Computing'}
+
+
+def test_paper(store):
+  article = store.paper('journals/tdsc/MullerC21')
+  assert article == {
+    'type': 'article', 'title': 'Software Aging in Android Systems: a Measurement Study',
+    'author': 'Jürgen Müller, Wei Li', 'booktitle': 'IEEE Transactions on Dependable and Secure Computing',
+    'abbr': 'TDSC', 'vol': '18', 'no': '1', 'pages': '101-115', 'year': '2021',
+    'doi': '10.1109/TDSC.2021.0001', 'field': '', 'tag': ''}
+  # no curated name for JSS: the journal name of the dump
+  assert store.paper('journals/jss/CottaT20')['booktitle'] == 'J. Syst. Softw.'
+  # the booktitle of a proceedings paper is the title of its crossref
+  paper = store.paper('conf/issre/GrottkeT19')
+  assert paper['booktitle'].startswith('30th IEEE International Symposium on Software Reliability Engineering')
+  assert paper['abbr'] == 'ISSRE'
+  thesis = store.paper('phd/Smith18')
+  assert (thesis['type'], thesis['booktitle'], thesis['abbr']) == ('phdthesis', 'University of Examples', '')
+  assert store.paper('journals/tdsc/Missing') is None
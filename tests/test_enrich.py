@@ -0,0 +1,139 @@
+import csv
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from database import AFFILIATION_FIELDS
+from enrich import EnrichmentClient, Enricher, ResponseCache
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'enrich')
+LIST_FIELDS = ['doi', 'title', 'abstract', 'volume', 'issue', 'pages', 'publisher']
+PAPERS = [
+  # missing abstract and volume, no affiliation rows
+  {'doi': '10.1000/a', 'title': 'A', 'abstract': '', 'volume': '', 'issue': '3', 'pages': '100-110', 'publisher': 'Elsevier BV'},
+  # missing pages (only OpenAlex has them), no affiliation rows
+  {'doi': '10.1000/B', 'title': 'B', 'abstract': 'Kept.', 'volume': '4', 'issue': '2', 'pages': '', 'publisher': 'IEEE'},
+  # complete, but its affiliation row has no OpenAlex work id; unknown to Crossref
+  {'doi': '10.1000/c', 'title': 'C', 'abstract': 'Known paper.', 'volume': '7', 'issue': '1', 'pages': '1-2', 'publisher': 'ACM'},
+  # complete and affiliated: not looked up
+  {'doi': '10.1000/d', 'title': 'D', 'abstract': 'Done.', 'volume': '1', 'issue': '1', 'pages': '3-4', 'publisher': 'ACM'},
+]
+AFFILIATIONS = [
+  {'doi': '10.1000/c', 'openalex_work_id': '', 'author_name': 'Carla Dias', 'institution_id': 'https://ror.org/0zzz',
+   'source': 'crossref+ror', 'confidence': 'medium', 'review_status': 'accepted'},
+  {'doi': '10.1000/d', 'openalex_work_id': 'W400', 'author_name': 'Dan Eng', 'institution_id': 'https://ror.org/0yyy',
+   'source': 'crossref+ror', 'confidence': 'medium', 'review_status': 'accepted'},
+]
+
+
+def load(name):
+  with open(os.path.join(FIXTURES, name), encoding='utf-8') as file:
+    return json.load(file)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+  """
+  Serve the recorded responses for /crossref/works and /openalex/works, keeping only
+  the records of the DOIs in the filter (as the services do).
+  """
+  def do_GET(self):
+    url = urlparse(self.path)
+    params = {k: v[0] for k, v in parse_qs(url.query).items()}
+    source = url.path.split('/')[1]
+    if source == 'crossref':
+      dois = [d[len('doi:'):] for d in params['filter'].split(',')]
+      body = load('crossref.json')
+      body['message']['items'] = [i for i in body['message']['items'] if i['DOI'] in dois]
+    else:
+      dois = params['filter'][len('doi:'):].split('|')
+      body = load('openalex.json')
+      body['results'] = [w for w in body['results'] if w['doi'][len('https://doi.org/'):] in dois]
+    self.server.requests.append((source, dois, params))
+    data = json.dumps(body).encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def log_message(self, *args):
+    pass
+
+
+@pytest.fixture
+def stub():
+  server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+  server.requests = []
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  yield server
+  server.shutdown()
+  server.server_close()
+
+
+def write_rows(filename, fields, rows):
+  with open(filename, 'w', encoding='utf-8', newline='') as file:
+    writer = csv.DictWriter(file, fields)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def read_rows(filename):
+  with open(filename, encoding='utf-8', newline='') as file:
+    return list(csv.DictReader(file))
+
+
+@pytest.fixture
+def enricher(stub, tmp_path, monkeypatch):
+  monkeypatch.chdir(tmp_path)
+  os.mkdir('data')
+  write_rows('data/list.csv', LIST_FIELDS, PAPERS)
+  write_rows('data/paper_affiliations.csv', AFFILIATION_FIELDS, AFFILIATIONS)
+  base = 'http://127.0.0.1:{}'.format(stub.server_address[1])
+  client = EnrichmentClient(base + '/crossref/works', base + '/openalex/works', mailto='test@example.org',
+                            cache=ResponseCache(str(tmp_path / 'cache.sqlite')), rate=0, workers=2, batch=2)
+  return Enricher(client)
+
+
+def test_batching(enricher, stub):
+  enricher.run(write=False)
+  for source in ['crossref', 'openalex']:
+    batches = [dois for s, dois, _ in stub.requests if s == source]
+    # three DOIs to look up (d is complete and affiliated) in batches of two
+    assert len(batches) == 2
+    assert sorted(d for batch in batches for d in batch) == ['10.1000/a', '10.1000/b', '10.1000/c']
+  assert all(params['mailto'] == 'test@example.org' for _, _, params in stub.requests)
+
+
+def test_cache_hits(enricher, stub):
+  first = enricher.run(write=False)
+  requests = len(stub.requests)
+  # the second run is answered from the cache, including the DOI Crossref does not know
+  assert enricher.run(write=False) == first
+  assert len(stub.requests) == requests == 4
+
+
+def test_merge(enricher):
+  changes = enricher.run(write=True)
+  assert changes == {'fields': 3, 'affiliations': 2, 'work_ids': 1}
+
+  papers = {p['doi']: p for p in read_rows('data/list.csv')}
+  # Crossref first (JATS title and markup removed), existing values kept
+  assert papers['10.1000/a']['abstract'] == 'Aging of long-running software & its rejuvenation.'
+  assert papers['10.1000/a']['volume'] == '12'
+  assert papers['10.1000/B']['pages'] == '5-9'          # from OpenAlex
+  assert papers['10.1000/B']['abstract'] == 'Kept.'
+  assert papers['10.1000/d'] == PAPERS[3]
+
+  rows = read_rows('data/paper_affiliations.csv')
+  assert [(r['doi'], r['openalex_work_id'], r['author_name']) for r in rows] == [
+    ('10.1000/c', 'W300', 'Carla Dias'), ('10.1000/d', 'W400', 'Dan Eng'),
+    ('10.1000/a', 'W100', 'Ana Silva'), ('10.1000/b', 'W200', 'Bo Chen')]
+  a, b = rows[2], rows[3]
+  # Crossref authors with a ROR id, otherwise the OpenAlex authorships
+  assert (a['institution_id'], a['raw_affiliation'], a['source'], a['review_status']) == (
+    'https://ror.org/0abcde123', 'University of X', 'crossref+ror', 'pending')
+  assert (b['institution_id'], b['openalex_author_id'], b['raw_affiliation'], b['source']) == (
+    'https://ror.org/0fghij456', 'A2', 'University of Y, Somewhere', 'openalex')